@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+高德地图API本地模拟服务
+实现 travel_analyzer 使用的地理编码和驾车路径规划接口，数据来自 amap_fixtures.json
+（默认行程每一段的策略0路线，往返行程的去程和返程分开记录），fixtures 中没有的路段才按直线距离合成，
+可注入延迟、错误率和QPS限制，用于离线运行和压测
+
+注意：fixtures 不是高德API的真实录制，而是离线整理合成的响应：各段路线按沿途公路里程和
+通行时间拼接（Day 6、Day 9 直接使用行程中记录的高德参考距离和时间），折线只包含途经点，
+来源说明见文件中的 _meta 字段。需要真实数据时用真实Key重新请求后替换
+
+使用方法：
+    python amap_mock_server.py --port 8765 --latency 80 --error-rate 0.02 --qps 50
+    export AMAP_API_BASE_URL=http://127.0.0.1:8765/v3/direction/driving
+    export AMAP_GEOCODE_URL=http://127.0.0.1:8765/v3/geocode/geo
+    export AMAP_API_KEY=mock
+    python travel_analyzer.py
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "amap_fixtures.json")
+
+GEOCODE_PATH = "/v3/geocode/geo"
+DRIVING_PATH = "/v3/direction/driving"
+
+# fixtures 中没有的路段用于合成路线的模型：公路绕行系数和平均车速
+ROAD_FACTOR = 1.35
+AVERAGE_SPEED_KMH = 55
+# 不同策略对距离和时间的影响（近似）
+STRATEGY_FACTORS = {
+    "0": (1.0, 1.0),    # 速度优先
+    "2": (0.95, 1.08),  # 距离优先
+    "3": (1.05, 1.05),  # 不走高速
+}
+
+
+def haversine_km(a, b):
+    """
+    计算两个 "经度,纬度" 坐标之间的大圆距离（公里）
+    """
+    lng1, lat1 = map(math.radians, map(float, a.split(',')))
+    lng2, lat2 = map(math.radians, map(float, b.split(',')))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+
+def is_coordinate(value):
+    parts = value.split(',')
+    if len(parts) != 2:
+        return False
+    try:
+        float(parts[0])
+        float(parts[1])
+        return True
+    except ValueError:
+        return False
+
+
+def driving_key(origin, destination, waypoints, strategy):
+    return f"{origin}|{destination}|{waypoints}|{strategy}"
+
+
+class MockAmap:
+    """
+    模拟服务的状态：fixtures、故障注入参数和请求统计
+    """
+
+    def __init__(self, fixtures, latency_ms=0, jitter_ms=0, error_rate=0.0, qps=0, seed=None):
+        self.geocodes = fixtures.get("geocodes", {})
+        self.driving = fixtures.get("driving", {})
+        self.meta = fixtures.get("_meta", {})
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.qps = qps
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = 0
+        self.window_count = 0
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "synthesized": 0}
+
+    def _throttled(self):
+        if not self.qps:
+            return False
+        with self.lock:
+            now = int(time.time())
+            if now != self.window_start:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            return self.window_count > self.qps
+
+    def handle(self, path, params):
+        """
+        处理一次请求
+
+        Returns:
+            dict: 与高德API格式一致的响应
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            delay = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self.random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        if self._throttled():
+            with self.lock:
+                self.stats["throttled"] += 1
+            return {"status": "0", "info": "CUQPS_HAS_EXCEEDED_THE_LIMIT", "infocode": "10021"}
+        if failed:
+            with self.lock:
+                self.stats["errors"] += 1
+            return {"status": "0", "info": "UNKNOWN_ERROR", "infocode": "20003"}
+
+        if path == GEOCODE_PATH:
+            return self.geocode(params.get("address", ""))
+        if path == DRIVING_PATH:
+            return self.route(params.get("origin", ""), params.get("destination", ""),
+                              params.get("waypoints", ""), params.get("strategy", "0"))
+        return {"status": "0", "info": "INVALID_REQUEST", "infocode": "20000"}
+
+    def resolve(self, value):
+        if is_coordinate(value):
+            return value
+        return self.geocodes.get(value)
+
+    def geocode(self, address):
+        location = self.geocodes.get(address)
+        if not location:
+            return {"status": "1", "info": "OK", "infocode": "10000", "count": "0", "geocodes": []}
+        return {
+            "status": "1", "info": "OK", "infocode": "10000", "count": "1",
+            "geocodes": [{"formatted_address": address, "location": location, "level": "兴趣点"}]
+        }
+
+    def route(self, origin, destination, waypoints, strategy):
+        key = driving_key(origin, destination, waypoints, strategy)
+        if key in self.driving:
+            return self.driving[key]
+
+        # fixtures 中没有的路段（其他行程或策略）按直线距离合成
+        points = [origin] + [wp for wp in waypoints.split('|') if wp] + [destination]
+        coords = [self.resolve(p) for p in points]
+        if not all(coords):
+            return {"status": "0", "info": "INVALID_PARAMS", "infocode": "20000"}
+        with self.lock:
+            self.stats["synthesized"] += 1
+
+        distance_factor, duration_factor = STRATEGY_FACTORS.get(strategy, (1.0, 1.0))
+        steps = []
+        total_km = 0.0
+        for a, b in zip(coords, coords[1:]):
+            km = haversine_km(a, b) * ROAD_FACTOR * distance_factor
+            total_km += km
+            steps.append({
+                "distance": str(round(km * 1000)),
+                "duration": str(round(km / AVERAGE_SPEED_KMH * 3600 * duration_factor)),
+                "polyline": interpolate_polyline(a, b)
+            })
+        duration = total_km / AVERAGE_SPEED_KMH * 3600 * duration_factor
+        return {
+            "status": "1", "info": "OK", "infocode": "10000", "count": "1",
+            "route": {
+                "origin": coords[0],
+                "destination": coords[-1],
+                "paths": [{
+                    "distance": str(round(total_km * 1000)),
+                    "duration": str(round(duration)),
+                    "strategy": strategy,
+                    "steps": steps
+                }]
+            }
+        }
+
+
+def interpolate_polyline(a, b, segments=20):
+    """
+    在两点之间插值生成高德格式的折线 "lng,lat;lng,lat;..."
+    """
+    lng1, lat1 = map(float, a.split(','))
+    lng2, lat2 = map(float, b.split(','))
+    points = []
+    for i in range(segments + 1):
+        t = i / segments
+        points.append(f"{lng1 + (lng2 - lng1) * t:.6f},{lat1 + (lat2 - lat1) * t:.6f}")
+    return ";".join(points)
+
+
+def load_fixtures(fixtures_file=FIXTURES_FILE):
+    if not os.path.exists(fixtures_file):
+        return {}
+    with open(fixtures_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+            body = json.dumps(mock.handle(parts.path, params), ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json;charset=UTF-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # 压测时不输出每条请求日志
+
+    return Handler
+
+
+def start_server(host="127.0.0.1", port=8765, fixtures_file=FIXTURES_FILE, **options):
+    """
+    在后台线程中启动模拟服务
+
+    Returns:
+        tuple: (server, mock)，调用 server.shutdown() 停止服务
+    """
+    mock = MockAmap(load_fixtures(fixtures_file), **options)
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, mock
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="高德地图API本地模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=FIXTURES_FILE, help="响应数据文件（fixtures）")
+    parser.add_argument("--latency", type=float, default=0, help="每个请求的固定延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=0, help="延迟抖动范围（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回错误的概率（0-1）")
+    parser.add_argument("--qps", type=int, default=0, help="每秒请求上限，0表示不限制")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，保证故障注入可复现")
+    args = parser.parse_args(argv)
+
+    server, mock = start_server(args.host, args.port, args.fixtures,
+                                latency_ms=args.latency, jitter_ms=args.jitter,
+                                error_rate=args.error_rate, qps=args.qps, seed=args.seed)
+    base = f"http://{args.host}:{args.port}"
+    print("🗺️  高德地图API模拟服务已启动")
+    print(f"  AMAP_GEOCODE_URL={base}{GEOCODE_PATH}")
+    print(f"  AMAP_API_BASE_URL={base}{DRIVING_PATH}")
+    if mock.meta.get("synthesized"):
+        print("⚠️  fixtures 为离线合成数据，不是高德API的真实响应")
+    print("按 Ctrl+C 停止")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\n请求统计: {mock.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API调用统计工具
+记录每次高德API和爬虫请求的耗时、HTTP状态、infocode、接收字节数，
+以及缓存命中率和固定等待时间，运行结束后输出汇总并导出
+Prometheus文本格式和JSON文件
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+
+from tracing import span
+
+# 延迟直方图的桶边界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRIC_PREFIX = "tibet_travel"
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """
+    线程安全的统计数据容器
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.latencies = defaultdict(list)          # endpoint -> [秒]
+            self.statuses = defaultdict(int)            # (endpoint, HTTP状态) -> 次数
+            self.infocodes = defaultdict(int)           # (endpoint, infocode) -> 次数
+            self.errors = defaultdict(int)              # (endpoint, 异常类型) -> 次数
+            self.bytes_received = defaultdict(int)      # endpoint -> 字节数
+            self.cache = defaultdict(lambda: [0, 0])    # 缓存名 -> [命中, 未命中]
+            self.sleeps = defaultdict(float)            # 原因 -> 秒
+
+    def observe_request(self, endpoint, seconds, status=None, size=0, error=None):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if status is not None:
+                self.statuses[(endpoint, status)] += 1
+            if error is not None:
+                self.errors[(endpoint, error)] += 1
+            self.bytes_received[endpoint] += size
+
+    def observe_infocode(self, endpoint, infocode):
+        with self.lock:
+            self.infocodes[(endpoint, str(infocode or "unknown"))] += 1
+
+    def observe_cache(self, name, hit):
+        with self.lock:
+            self.cache[name][0 if hit else 1] += 1
+
+    def observe_sleep(self, reason, seconds):
+        with self.lock:
+            self.sleeps[reason] += seconds
+
+    def snapshot(self):
+        """
+        汇总当前统计数据
+
+        Returns:
+            dict: 可直接序列化为JSON的统计结果
+        """
+        with self.lock:
+            endpoints = {}
+            for endpoint, values in self.latencies.items():
+                ordered = sorted(values)
+                endpoints[endpoint] = {
+                    "count": len(ordered),
+                    "total_seconds": round(sum(ordered), 6),
+                    "p50": round(_percentile(ordered, 0.5), 6),
+                    "p95": round(_percentile(ordered, 0.95), 6),
+                    "p99": round(_percentile(ordered, 0.99), 6),
+                    "max": round(ordered[-1], 6) if ordered else 0.0,
+                    "bytes_received": self.bytes_received[endpoint],
+                    "status": {str(s): n for (e, s), n in self.statuses.items() if e == endpoint},
+                    "infocode": {c: n for (e, c), n in self.infocodes.items() if e == endpoint},
+                    "errors": {err: n for (e, err), n in self.errors.items() if e == endpoint},
+                }
+            caches = {}
+            for name, (hits, misses) in self.cache.items():
+                total = hits + misses
+                caches[name] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": round(hits / total, 4) if total else 0.0
+                }
+            return {
+                "endpoints": endpoints,
+                "caches": caches,
+                "sleep_seconds": {reason: round(s, 3) for reason, s in self.sleeps.items()}
+            }
+
+    def to_prometheus(self):
+        """
+        导出为 Prometheus 文本格式
+        """
+        lines = []
+        with self.lock:
+            name = f"{METRIC_PREFIX}_request_duration_seconds"
+            lines.append(f"# HELP {name} API请求耗时")
+            lines.append(f"# TYPE {name} histogram")
+            for endpoint, values in sorted(self.latencies.items()):
+                for bound in LATENCY_BUCKETS:
+                    count = sum(1 for v in values if v <= bound)
+                    lines.append(f"{name}_bucket{_labels(endpoint=endpoint, le=bound)} {count}")
+                lines.append(f"{name}_bucket{_labels(endpoint=endpoint, le='+Inf')} {len(values)}")
+                lines.append(f"{name}_sum{_labels(endpoint=endpoint)} {sum(values):.6f}")
+                lines.append(f"{name}_count{_labels(endpoint=endpoint)} {len(values)}")
+
+            counters = [
+                ("requests_total", "按HTTP状态统计的请求数",
+                 [(_labels(endpoint=e, status=s), n) for (e, s), n in self.statuses.items()]),
+                ("infocode_total", "按高德infocode统计的响应数",
+                 [(_labels(endpoint=e, infocode=c), n) for (e, c), n in self.infocodes.items()]),
+                ("request_errors_total", "请求异常数",
+                 [(_labels(endpoint=e, error=err), n) for (e, err), n in self.errors.items()]),
+                ("response_bytes_total", "接收字节数",
+                 [(_labels(endpoint=e), n) for e, n in self.bytes_received.items()]),
+                ("cache_requests_total", "缓存查询次数",
+                 [(_labels(cache=c, result=r), v[i]) for c, v in self.cache.items()
+                  for i, r in enumerate(("hit", "miss"))]),
+                ("sleep_seconds_total", "主动等待时间",
+                 [(_labels(reason=r), round(s, 3)) for r, s in self.sleeps.items()]),
+            ]
+            for suffix, help_text, samples in counters:
+                metric = f"{METRIC_PREFIX}_{suffix}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in sorted(samples):
+                    lines.append(f"{metric}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self, prefix="api_metrics"):
+        """
+        写出 <prefix>.prom 和 <prefix>.json
+
+        Returns:
+            tuple: (prom文件路径, json文件路径)
+        """
+        prom_file = f"{prefix}.prom"
+        json_file = f"{prefix}.json"
+        with open(prom_file, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        return prom_file, json_file
+
+    def print_summary(self):
+        snapshot = self.snapshot()
+        if not snapshot["endpoints"] and not snapshot["sleep_seconds"]:
+            return
+        print("📈 API调用统计:")
+        for endpoint, stats in sorted(snapshot["endpoints"].items()):
+            print(f"  {endpoint}: {stats['count']} 次, 总耗时 {stats['total_seconds']:.2f} 秒, "
+                  f"p50 {stats['p50'] * 1000:.0f} ms, p99 {stats['p99'] * 1000:.0f} ms, "
+                  f"接收 {stats['bytes_received'] / 1024:.1f} KB")
+            if stats["infocode"]:
+                print(f"    infocode: {stats['infocode']}")
+            if stats["errors"]:
+                print(f"    异常: {stats['errors']}")
+        for name, stats in sorted(snapshot["caches"].items()):
+            print(f"  缓存 {name}: 命中率 {stats['hit_ratio']:.0%} ({stats['hits']}/{stats['hits'] + stats['misses']})")
+        for reason, seconds in sorted(snapshot["sleep_seconds"].items()):
+            print(f"  等待 {reason}: {seconds:.1f} 秒")
+        print()
+
+
+METRICS = MetricsRegistry()
+
+
+def instrumented_get(endpoint, get, url, **kwargs):
+    """
+    发送GET请求并记录耗时、状态码和接收字节数
+
+    Args:
+        endpoint: 统计用的接口名称，例如 "amap_geocode"
+        get: 实际发送请求的函数（requests.get 或 session.get）
+        url: 请求地址
+        **kwargs: 透传给 get 的参数
+
+    Returns:
+        requests.Response
+    """
+    start = time.perf_counter()
+    try:
+        with span(endpoint, "http"):
+            response = get(url, **kwargs)
+    except Exception as e:
+        METRICS.observe_request(endpoint, time.perf_counter() - start, error=type(e).__name__)
+        raise
+    content = getattr(response, "content", b"") if not kwargs.get("stream") else b""
+    METRICS.observe_request(endpoint, time.perf_counter() - start,
+                            status=getattr(response, "status_code", None),
+                            size=len(content or b""))
+    return response
+
+
+def timed_sleep(seconds, reason):
+    """
+    等待并记录等待时间
+    """
+    METRICS.observe_sleep(reason, seconds)
+    with span(f"sleep {reason}", "wait"):
+        time.sleep(seconds)
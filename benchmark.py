@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+覆盖行程分析、可行性分析、HTML报告生成和图库补丁，
+结果追加到 benchmark_history.json，与上一次同一模式（--quick 或完整）的记录对比以发现性能回退
+
+使用方法：
+    python benchmark.py            # 运行全部基准
+    python benchmark.py --quick    # 只跑小规模，用于快速检查
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import travel_analyzer
+import generate_html_report
+import update_xhs_images
+import fetch_xhs_images
+import image_placeholders
+import delay_simulation
+import risk_scoring
+import road_graph
+import stop_finder
+import call_planner
+import closures
+import elevation
+import estimator
+import key_pool
+import route_map
+import scenarios
+from amap_mock_server import MockAmap, load_fixtures
+from reconciliation import Reconciler
+
+HISTORY_FILE = "benchmark_history.json"
+REGRESSION_THRESHOLD = 1.2  # 比上次慢20%以上视为回退
+
+
+class StubResponse:
+    """
+    模拟 requests.Response，只实现 travel_analyzer 用到的方法
+    """
+
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+        self.content = json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class StubAmapBackend:
+    """
+    进程内的高德API替身：复用 amap_mock_server 的逻辑，但不经过网络
+    """
+
+    def __init__(self):
+        self.mock = MockAmap(load_fixtures())
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        path = urlsplit(url).path
+        params = {k: str(v) for k, v in (params or {}).items()}
+        return StubResponse(self.mock.handle(path, params))
+
+
+@contextlib.contextmanager
+def stubbed_amap():
+    """
+    在上下文内把 travel_analyzer 发出的网络请求（requests.get）、Key 池和校正缓存替换为本地替身
+    """
+    backend = StubAmapBackend()
+    saved = (requests.get, travel_analyzer.AMAP_API_KEY, travel_analyzer.AMAP_API_KEYS,
+             travel_analyzer.RECONCILER, key_pool._POOL)
+    requests.get = backend.get
+    travel_analyzer.AMAP_API_KEY = "benchmark"
+    travel_analyzer.AMAP_API_KEYS = []
+    travel_analyzer.RECONCILER = Reconciler(cache_file=None)  # 不读写校正缓存文件
+    key_pool._POOL = key_pool.KeyPool(["benchmark"], state_file=None, qps=0)  # 不限制QPS，不读写用量文件
+    try:
+        yield backend
+    finally:
+        (requests.get, travel_analyzer.AMAP_API_KEY, travel_analyzer.AMAP_API_KEYS,
+         travel_analyzer.RECONCILER, key_pool._POOL) = saved
+
+
+@contextlib.contextmanager
+def patched(module, name, value):
+    saved = getattr(module, name)
+    setattr(module, name, value)
+    try:
+        yield
+    finally:
+        setattr(module, name, saved)
+
+
+def make_itinerary(n_days):
+    """
+    重复基础行程，生成 n_days 天的合成行程
+    """
+    base = travel_analyzer.ITINERARY
+    itinerary = []
+    for i in range(n_days):
+        item = dict(base[i % len(base)])
+        item["day"] = i + 1
+        itinerary.append(item)
+    return itinerary
+
+
+def make_results(n_days):
+    """
+    生成 n_days 条合成分析结果（与 analyze_itinerary 的返回格式一致）
+    """
+    results = []
+    for i in range(n_days):
+        item = travel_analyzer.ITINERARY[i % len(travel_analyzer.ITINERARY)]
+        actual_time = item["estimated_time"] * (0.8 + (i % 7) * 0.07)
+        actual_distance = item["estimated_distance"] * (0.9 + (i % 5) * 0.05)
+        results.append({
+            "日期": item["date"],
+            "星期": item["weekday"],
+            "行程": item["route"],
+            "起点": item["origin"],
+            "终点": item["destination"],
+            "估算距离(km)": item["estimated_distance"],
+            "实际距离(km)": round(actual_distance, 1),
+            "距离差异(km)": round(actual_distance - item["estimated_distance"], 1),
+            "估算时间(小时)": item["estimated_time"],
+            "实际时间(小时)": round(actual_time, 1),
+            "实际时间(分钟)": round(actual_time * 60, 1),
+            "时间差异(小时)": round(actual_time - item["estimated_time"], 1),
+            "活动安排": item["activities"],
+            "住宿": item["accommodation"],
+            "风险提示": item.get("risk", "")
+        })
+    return results
+
+
+def make_gallery_page(n_attractions):
+    """
+    生成包含 n_attractions 个景点图库的合成页面
+    """
+    blocks = []
+    for i in range(n_attractions):
+        items = "\n".join(f'''                                    <div class="image-item" data-label="冬季实景">
+                                        <img src="https://example.com/{i}/{j}.jpg" alt="景点{i}冬季{j}" loading="lazy">
+                                    </div>''' for j in range(5))
+        blocks.append(f'''                        <div class="attraction-item">
+                            <h4>{i + 1}. 景点{i:04d}（新疆）</h4>
+                            <div class="gallery-label">小红书冬季实景图片（5张）</div>
+                            <div class="image-gallery">
+                                <div class="image-slider">
+{items}
+                                </div>
+                                <div class="image-note">💡 提示：点击图片可跳转到小红书查看真实冬季实景图片</div>
+                            </div>
+                            <p><strong>位置：</strong>示例位置</p>
+                        </div>''')
+    return "<html><body>\n" + "\n".join(blocks) + "\n</body></html>\n"
+
+
+def make_images_config(n_attractions):
+    return {f"景点{i:04d}": [f"https://sns-img-qc.xhscdn.com/bench/{i}/{j}" for j in range(5)]
+            for i in range(n_attractions)}
+
+
+def measure(func, repeat, setup=None):
+    """
+    运行 func repeat 次，返回耗时统计（秒）；setup 在每次运行前调用，不计入耗时
+    """
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "repeat": repeat
+    }
+
+
+def fresh_reconciler():
+    # 校正缓存在内存中累积，每次运行前换新，避免后几次直接命中前一次的结果
+    travel_analyzer.RECONCILER = Reconciler(cache_file=None)
+
+
+def bench_analyze_itinerary(n_days, repeat):
+    itinerary = make_itinerary(n_days)
+    with stubbed_amap(), patched(travel_analyzer, "ITINERARY", itinerary):
+        return measure(travel_analyzer.analyze_itinerary, repeat, fresh_reconciler)
+
+
+def bench_feasibility_analysis(n_days, repeat):
+    results = make_results(n_days)
+    return measure(lambda: travel_analyzer.feasibility_analysis(results), repeat)
+
+
+def bench_generate_html(n_days, repeat):
+    results = make_results(n_days)
+    return measure(lambda: generate_html_report.generate_html(results), repeat)
+
+
+def bench_simulate_delays(n_days, trials, repeat):
+    itinerary = make_itinerary(n_days)
+    results = make_results(n_days)
+    return measure(lambda: delay_simulation.simulate_delays(itinerary, results, trials, seed=0), repeat)
+
+
+def bench_score_catalog(n_itineraries, repeat):
+    catalog = [make_results(9) for _ in range(n_itineraries)]
+    model = risk_scoring.RiskModel()
+    return measure(lambda: risk_scoring.score_catalog(catalog, model), repeat)
+
+
+def bench_local_route(n_queries, repeat):
+    # 预计算在计时之外完成，也不写入缓存文件
+    graph = road_graph.RoadGraph.load()
+    router = road_graph.LocalRouter(graph, road_graph.ContractionHierarchy.build(graph))
+    days = [travel_analyzer.ITINERARY[i % len(travel_analyzer.ITINERARY)] for i in range(n_queries)]
+    return measure(lambda: [router.route(d["origin"], d["destination"], d.get("waypoints")) for d in days], repeat)
+
+
+def bench_split_long_days(n_days, repeat):
+    # 按 6 小时上限，大部分天都需要拆分
+    graph = road_graph.RoadGraph.load()
+    router = road_graph.LocalRouter(graph, road_graph.ContractionHierarchy.build(graph))
+    itinerary = make_itinerary(n_days)
+    results = make_results(n_days)
+    return measure(lambda: stop_finder.split_long_days(results, itinerary, 6, router), repeat)
+
+
+def bench_closure_check(n_routes, repeat):
+    # 路线几何形状预先规划好，只计量封路检查本身
+    graph = road_graph.RoadGraph.load()
+    router = road_graph.LocalRouter(graph, road_graph.ContractionHierarchy.build(graph))
+    index = closures.ClosureIndex.load()
+    routes = [(router.route_path(d["origin"], d["destination"], d.get("waypoints")), d["date"])
+              for d in make_itinerary(n_routes)]
+    return measure(lambda: [index.check(points, day) for points, day in routes], repeat)
+
+
+def bench_elevation(n_days, repeat):
+    # 行程范围内的 SRTM 3" 瓦片，用稀疏文件代替真实数据（只计量内存映射和插值）
+    graph = road_graph.RoadGraph.load()
+    router = road_graph.LocalRouter(graph, road_graph.ContractionHierarchy.build(graph))
+    itinerary = make_itinerary(n_days)
+    results = make_results(n_days)
+    with tempfile.TemporaryDirectory() as directory:
+        for lat in range(28, 32):
+            for lng in range(88, 97):
+                with open(os.path.join(directory, f"N{lat:02d}E{lng:03d}.hgt"), "wb") as f:
+                    f.truncate(1201 * 1201 * 2)
+        dem = elevation.DemReader(directory)
+        return measure(lambda: elevation.attach_elevation(results, itinerary, dem, router), repeat)
+
+
+def bench_offline_estimate(n_days, repeat):
+    itinerary = make_itinerary(n_days)
+    model = estimator.Estimator()
+    return measure(lambda: model.estimate_days(itinerary), repeat)
+
+
+def bench_call_plan(n_days, repeat):
+    itinerary = make_itinerary(n_days)
+    with stubbed_amap():
+        return measure(lambda: call_planner.plan_calls([("bench", itinerary)], budget=n_days), repeat)
+
+
+def bench_route_strategies(n_days, repeat):
+    # 每段路线同时请求三个策略，按风险最低选择（包括折线简化、封路检查和风险评分）
+    itinerary = make_itinerary(n_days)
+    with stubbed_amap(), patched(travel_analyzer, "ROUTE_STRATEGIES", ["0", "2", "3"]), \
+            patched(travel_analyzer, "ROUTE_POLICY", "least_risk"), patched(travel_analyzer, "ITINERARY", itinerary):
+        return measure(travel_analyzer.analyze_itinerary, repeat, fresh_reconciler)
+
+
+def bench_route_map(n_points, repeat):
+    # 模拟 OSM 路网精度的一天路线：沿正弦曲线每 100 米一个点
+    points = [[91.0 + i * 0.001, 29.6 + 0.3 * math.sin(i / 200)] for i in range(n_points)]
+    return measure(lambda: route_map.encode_tiers(points), repeat)
+
+
+def bench_scenarios(n_scenarios, repeat):
+    # 每个方案改变一天的住宿地，其余天与基础行程相同，应命中路段缓存
+    places = ["定日", "萨迦县", "江孜县", "拉孜县"]
+    changes = [{"name": f"s{i}", "changes": [{"op": "sleep_at", "day": 7, "place": places[i % len(places)]}]}
+               for i in range(n_scenarios)]
+    with stubbed_amap():
+        return measure(lambda: scenarios.evaluate_scenarios(changes, trials=2000), repeat)
+
+
+def bench_gallery_patch(module, func_name, n_attractions, repeat):
+    page = make_gallery_page(n_attractions)
+    images_config = make_images_config(n_attractions)
+    func = getattr(module, func_name)
+    # 不下载图片，只计量页面生成和补丁
+    with tempfile.TemporaryDirectory() as tmp, patched(image_placeholders, "build_image_metas", lambda urls: {}):
+        html_file = os.path.join(tmp, "page.html")
+
+        def run():
+            with open(html_file, 'w', encoding='utf-8') as f:
+                f.write(page)
+            func(html_file, images_config)
+
+        return measure(run, repeat)
+
+
+def benchmark_cases(quick=False):
+    """
+    返回所有基准用例：[(名称, 可调用对象), ...]
+    """
+    day_sizes = [9, 90] if quick else [9, 90, 900]
+    result_sizes = [9, 900] if quick else [9, 900, 9000]
+    page_sizes = [10, 50] if quick else [10, 50, 200]
+    repeat = 3 if quick else 5
+
+    cases = []
+    for n in day_sizes:
+        cases.append((f"analyze_itinerary[{n}d]", lambda n=n: bench_analyze_itinerary(n, repeat)))
+    for n in result_sizes:
+        cases.append((f"feasibility_analysis[{n}d]", lambda n=n: bench_feasibility_analysis(n, repeat)))
+    for n in result_sizes:
+        cases.append((f"generate_html[{n}d]", lambda n=n: bench_generate_html(n, repeat)))
+    cases.append(("simulate_delays[9d x 100k]", lambda: bench_simulate_delays(9, 100_000, repeat)))
+    for n in [10, 1000]:
+        cases.append((f"score_catalog[{n}i]", lambda n=n: bench_score_catalog(n, repeat)))
+    for n in [9, 900]:
+        cases.append((f"local_route[{n}q]", lambda n=n: bench_local_route(n, repeat)))
+    for n in [9, 90]:
+        cases.append((f"split_long_days[{n}d]", lambda n=n: bench_split_long_days(n, repeat)))
+    for n in [9, 900]:
+        cases.append((f"closure_check[{n}r]", lambda n=n: bench_closure_check(n, repeat)))
+    for n in [9, 90]:
+        cases.append((f"elevation[{n}d]", lambda n=n: bench_elevation(n, repeat)))
+    for n in [9, 900]:
+        cases.append((f"offline_estimate[{n}d]", lambda n=n: bench_offline_estimate(n, repeat)))
+    for n in [9, 900]:
+        cases.append((f"call_plan[{n}d]", lambda n=n: bench_call_plan(n, repeat)))
+    for n in [9, 90]:
+        cases.append((f"route_strategies[{n}d]", lambda n=n: bench_route_strategies(n, repeat)))
+    for n in [1000, 20000]:
+        cases.append((f"route_map_tiers[{n}p]", lambda n=n: bench_route_map(n, repeat)))
+    for n in [3, 12]:
+        cases.append((f"scenarios[{n}s]", lambda n=n: bench_scenarios(n, repeat)))
+    for n in page_sizes:
+        cases.append((f"update_xhs_images[{n}a]",
+                      lambda n=n: bench_gallery_patch(update_xhs_images, "update_html_with_images", n, repeat)))
+        cases.append((f"fetch_xhs_images[{n}a]",
+                      lambda n=n: bench_gallery_patch(fetch_xhs_images, "update_html_file", n, repeat)))
+    return cases
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def load_history(history_file=HISTORY_FILE):
+    if not os.path.exists(history_file):
+        return []
+    with open(history_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(history, history_file=HISTORY_FILE):
+    with open(history_file, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="性能基准测试")
+    parser.add_argument("--quick", action="store_true", help="只运行小规模用例")
+    parser.add_argument("--history", default=HISTORY_FILE, help="历史记录文件")
+    parser.add_argument("--no-save", action="store_true", help="不写入历史记录")
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    # 只与同一模式的上一次记录对比，--quick 和完整运行的规模和重复次数不同
+    previous = next((entry["results"] for entry in reversed(history) if entry.get("quick") == args.quick), {})
+
+    print("=" * 80)
+    print("性能基准测试")
+    print("=" * 80)
+
+    results = {}
+    regressions = []
+    for name, case in benchmark_cases(args.quick):
+        stats = case()
+        results[name] = stats
+        line = f"  {name:<32} median {stats['median'] * 1000:10.2f} ms   min {stats['min'] * 1000:10.2f} ms"
+        if name in previous and previous[name]["median"] > 0:
+            ratio = stats["median"] / previous[name]["median"]
+            line += f"   ({ratio:.2f}x)"
+            if ratio > REGRESSION_THRESHOLD:
+                regressions.append((name, ratio))
+        print(line)
+
+    if not args.no_save:
+        history.append({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "quick": args.quick,
+            "results": results
+        })
+        save_history(history, args.history)
+        print(f"\n结果已追加到 {args.history}")
+
+    if regressions:
+        print("\n⚠️  性能回退:")
+        for name, ratio in regressions:
+            print(f"  • {name}: 比上次慢 {ratio:.2f} 倍")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API调用计划（dry-run）
+不访问网络，按 analyze_itinerary 的逻辑（单程/往返、途经点、预定义坐标）逐天展开要发出的请求：
+离线地名库能解析的地点不需要地理编码，校正缓存中已有的天、预筛选跳过的天和重复的天不需要调用API。
+输出每个接口的调用次数、按配置的QPS和历史延迟估算的耗时，以及与今天剩余配额的比较。
+
+指定预算时按优先级选择要调用API的天：离线估算接近可行性判断阈值（或无法估算）的天优先，
+每天按最坏情况（包括数据异常时的重试）计算，保证实际调用次数不超过预算；放不进预算的天推迟，运行时暂用离线估算，结果不写入校正缓存，下次运行时再调用API
+
+使用方法：
+    python call_planner.py a.json b.json            # 只输出计划
+    python call_planner.py a.json --budget 200      # 按预算选择要调用API的天
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import travel_analyzer
+from estimator import get_estimator, precision_reasons
+from gazetteer import get_gazetteer
+from key_pool import KEY_QPS, get_key_pool
+from reconciliation import day_key, geocode_variants, is_coordinate, is_fresh
+
+DEFAULT_LATENCY = 0.3       # 没有历史调用统计时每次请求的估计耗时（秒）
+METRICS_FILE = "api_metrics.json"
+ENDPOINTS = ("amap_geocode", "amap_driving")
+
+
+def _replay(item, gazetteer, calls, resolve=None, strategies=1):
+    """
+    按 route_day 的逻辑重放一天的请求，把API调用次数计入 calls；
+    resolve 为校正重试时的地点解析函数（同 Reconciler._resolver），strategies 为每段路线请求的路线策略数
+    """
+    def geocode(name):
+        # 同 get_location_coordinate：坐标和离线地名库中的地点不请求API，且API结果不缓存
+        if is_coordinate(name):
+            return name
+        location = gazetteer.lookup(name)
+        if not location:
+            calls["amap_geocode"] += 1
+        return location or name
+
+    def route(origin, destination, waypoints=None):
+        # 同 get_driving_route：先对起点、终点和途经点做地理编码，再按每个路线策略各请求一次
+        for name in [origin, destination] + list(waypoints or []):
+            geocode(resolve(name) if resolve else name)
+        calls["amap_driving"] += strategies
+        return {"distance_km": 0.0, "duration_hours": 0.0, "duration_minutes": 0.0, "unresolved": []}
+
+    travel_analyzer.route_day(item, route, geocode)
+
+
+def day_calls(item, gazetteer=None, strategies=1):
+    """
+    展开一天会发出的API请求，strategies 为每段路线请求的路线策略数
+
+    Returns:
+        dict: {"amap_geocode": 次数, "amap_driving": 次数, "retry": 数据异常重试时最多增加的次数}
+    """
+    gazetteer = gazetteer or get_gazetteer()
+    calls = {"amap_geocode": 0, "amap_driving": 0}
+    _replay(item, gazetteer, calls, strategies=strategies)
+
+    # 校正重试的最坏情况：API地理编码全部失败，每个地点依次尝试所有地名变体，再重新规划
+    retry = {"amap_geocode": 0, "amap_driving": 0}
+    known = dict(zip(item.get("waypoints") or [], item.get("waypoint_coords") or []))
+
+    def resolve(name):
+        if is_coordinate(name):
+            return name
+        if name not in known:
+            known[name] = name
+            for query in geocode_variants(name) + [name]:
+                location = gazetteer.lookup(query)
+                if location:
+                    known[name] = location
+                    break
+                retry["amap_geocode"] += 1
+        return known[name]
+
+    _replay(item, gazetteer, retry, resolve, strategies)
+    calls["retry"] = sum(retry.values())
+    return calls
+
+
+def load_latencies(metrics_file=METRICS_FILE):
+    """
+    上次运行记录的各接口 p50 延迟（秒），没有记录时使用 DEFAULT_LATENCY
+    """
+    latencies = dict.fromkeys(ENDPOINTS, DEFAULT_LATENCY)
+    if os.path.exists(metrics_file):
+        with open(metrics_file, 'r', encoding='utf-8') as f:
+            endpoints = json.load(f).get("endpoints", {})
+        for endpoint in ENDPOINTS:
+            if endpoints.get(endpoint, {}).get("p50"):
+                latencies[endpoint] = endpoints[endpoint]["p50"]
+    return latencies
+
+
+def plan_calls(itineraries, budget=None, router=None, prefilter=None, strategies=None):
+    """
+    为一组行程生成API调用计划
+
+    Args:
+        itineraries: [(名称, 行程), ...]
+        budget: 调用次数预算（None 表示不限制）
+        router: 路线规划后端名称（默认 ROUTING_BACKEND）；未配置API Key 时也按高德后端计划
+        prefilter: 是否按离线估算预筛选（默认 PREFILTER）
+        strategies: 高德路线策略列表（默认 ROUTE_STRATEGIES）
+
+    Returns:
+        dict: 计划，"deferred" 为每个行程中推迟的天的下标集合
+    """
+    router = router or travel_analyzer.ROUTING_BACKEND
+    prefilter = travel_analyzer.PREFILTER if prefilter is None else prefilter
+    strategies = list(strategies or travel_analyzer.ROUTE_STRATEGIES)
+    remote = router == "amap"
+    cache = travel_analyzer.reconciler_for(router).cache
+    gazetteer = get_gazetteer()
+    estimator = get_estimator()
+
+    units = {}  # day_key -> 需要调用API的一天（重复的天只调用一次，之后命中校正缓存）
+    counts = {"days": 0, "cached": 0, "prefiltered": 0, "duplicate": 0, "local": 0}
+    for source, (name, itinerary) in enumerate(itineraries):
+        for index, (item, estimate) in enumerate(zip(itinerary, estimator.estimate_days(itinerary))):
+            counts["days"] += 1
+            key = day_key(item)
+            if not remote:
+                counts["local"] += 1
+            elif key in cache and is_fresh(cache[key]) and not travel_analyzer.strategies_missing(
+                    dict(cache[key]["result"], source=cache[key]["source"]), strategies):
+                counts["cached"] += 1
+            elif key in units:
+                counts["duplicate"] += 1
+                units[key]["days"].append((source, index))
+            elif prefilter and estimate and not precision_reasons(item, estimate):
+                counts["prefiltered"] += 1
+            else:
+                units[key] = dict(day_calls(item, gazetteer, len(strategies)), label=f"{name} Day {item['day']}",
+                                  days=[(source, index)],
+                                  critical=estimate is None or bool(precision_reasons(item, estimate)))
+
+    # 接近判断阈值的天优先，其余按行程顺序；放不进预算的天推迟，继续尝试后面更小的
+    planned, deferred, used = [], [], 0
+    for unit in sorted(units.values(), key=lambda unit: not unit["critical"]):
+        cost = unit["amap_geocode"] + unit["amap_driving"] + unit["retry"]
+        if budget is None or used + cost <= budget:
+            planned.append(unit)
+            used += cost
+        else:
+            deferred.append(unit)
+
+    totals = {endpoint: sum(unit[endpoint] for unit in planned) for endpoint in ENDPOINTS}
+    keys = travel_analyzer.api_keys()
+    pool = get_key_pool(keys)
+    rate = KEY_QPS * len(pool.keys)
+    latencies = load_latencies()
+    # 逐天顺序分析：每次请求至少等待一次往返，Key 池轮换时请求间隔为 1 / (QPS × Key 数)；
+    # 一段路线的各个策略同时请求，只等待一次往返（但仍受QPS限制）
+    interval = 1 / rate if rate else 0
+    per_leg = len(strategies)
+    sequential = (totals["amap_geocode"] * max(latencies["amap_geocode"], interval)
+                  + totals["amap_driving"] / per_leg * max(latencies["amap_driving"], per_leg * interval))
+    deferred_days = [set() for _ in itineraries]
+    for unit in deferred:
+        for source, index in unit["days"]:
+            deferred_days[source].add(index)
+    return {
+        "router": router,
+        "strategies": strategies,
+        "counts": dict(counts, api=len(units)),
+        "calls": totals,
+        "total": sum(totals.values()),
+        "retry": sum(unit["retry"] for unit in planned),
+        "planned": planned,
+        "deferred_units": deferred,
+        "deferred": deferred_days,
+        "budget": budget,
+        "keys": len(pool.keys),
+        "rate": rate,
+        "latencies": latencies,
+        "sequential_seconds": sequential,
+        "parallel_seconds": sum(totals.values()) / rate if rate else 0.0,
+        "remaining_quota": sum(row["quota"] - row["count"] for row in pool.status() if not row["parked_until"])
+    }
+
+
+def print_plan(plan):
+    counts = plan["counts"]
+    print("=" * 80)
+    print("📋 API调用计划（不访问网络）")
+    print("=" * 80)
+    if plan["router"] != "amap":
+        print(f"  路线规划后端 {plan['router']} 不调用API，共 {counts['days']} 天")
+        print("=" * 80)
+        return
+    print(f"  共 {counts['days']} 天: 已缓存 {counts['cached']} 天，预筛选跳过 {counts['prefiltered']} 天，"
+          f"重复 {counts['duplicate']} 天，需要调用API {counts['api']} 天")
+    for endpoint in ENDPOINTS:
+        print(f"  {endpoint}: {plan['calls'][endpoint]} 次（p50 延迟 {plan['latencies'][endpoint]:.2f} 秒）")
+    if len(plan["strategies"]) > 1:
+        print(f"  每段路线同时请求 {len(plan['strategies'])} 个路线策略")
+    print(f"  合计 {plan['total']} 次，数据异常需要重试时最多再增加 {plan['retry']} 次")
+    print(f"  预计耗时: 逐天顺序分析约 {plan['sequential_seconds']:.0f} 秒，"
+          f"并发时QPS下限约 {plan['parallel_seconds']:.0f} 秒（{plan['keys']} 个 Key × {KEY_QPS:g} QPS）")
+    print(f"  今天剩余配额: {plan['remaining_quota']} 次")
+    if plan["total"] + plan["retry"] > plan["remaining_quota"]:
+        print(f"  ⚠️  最坏情况下会超出今天的剩余配额，建议用 --budget 限制调用次数")
+
+    if plan["budget"] is not None:
+        print()
+        print(f"💰 预算 {plan['budget']} 次（按含重试的最坏情况计算）: 调用API {len(plan['planned'])} 天，"
+              f"推迟 {len(plan['deferred_units'])} 天")
+        for unit in plan["deferred_units"]:
+            cost = unit["amap_geocode"] + unit["amap_driving"] + unit["retry"]
+            mark = "（接近判断阈值）" if unit["critical"] else ""
+            print(f"  ⏸️  {unit['label']}: {cost} 次{mark}")
+    print("=" * 80)
+
+
+def load_itineraries(paths):
+    itineraries = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            itineraries.append((os.path.splitext(os.path.basename(path))[0], json.load(f)))
+    return itineraries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API调用计划（不访问网络）")
+    parser.add_argument("itineraries", nargs="*", help="行程JSON文件（默认使用 travel_analyzer.ITINERARY）")
+    parser.add_argument("--budget", type=int, help="调用次数预算，超出的天推迟")
+    parser.add_argument("--router", choices=["amap", "local", "offline"], help="路线规划后端（默认 ROUTING_BACKEND）")
+    parser.add_argument("--prefilter", action="store_true", default=None, help="按离线估算预筛选")
+    args = parser.parse_args(argv)
+
+    itineraries = load_itineraries(args.itineraries) or [("行程", travel_analyzer.ITINERARY)]
+    print_plan(plan_calls(itineraries, args.budget, args.router, args.prefilter))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+封路与季节性通行限制
+closures.json 中的封路数据（道路走向的折线或区域多边形，带有效日期）按外包矩形建立 R 树，
+每天的路线几何形状（本地路网规划的路线）先用 R 树筛出可能相交的封路，再沿路线按1公里取样，
+统计落在封路缓冲区或区域内的里程，超过阈值时认为当天受影响：
+- restricted: 可能临时管制，写入风险提示
+- closed: 禁止通行，在路网中去掉受影响的路段重新规划绕行路线
+
+使用方法：
+    python closures.py 2024-12-23 林芝八一镇 墨脱县城 --via 色季拉山口 波密县城
+"""
+
+import argparse
+import json
+import math
+import os
+from datetime import date as Date
+
+import numpy as np
+
+CLOSURES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "closures.json")
+DEFAULT_BUFFER_KM = 5     # 折线两侧的默认匹配宽度（封路数据的走向是近似值）
+MIN_OVERLAP_KM = 3        # 路线与封路重合至少这么长才算受影响，避免在路口附近擦边误报
+SAMPLE_KM = 1             # 沿路线取样的间距
+NODE_CAPACITY = 8         # R 树每个节点最多的子节点数
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG = 111.320  # 赤道处，需要乘以 cos(纬度)
+
+SEVERITY_LABELS = {"closed": "封闭", "restricted": "管制"}
+
+
+def bbox_union(boxes):
+    boxes = list(boxes)
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def bbox_intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def expand_bbox(bbox, km):
+    """
+    外包矩形 (最小经度, 最小纬度, 最大经度, 最大纬度) 向外扩展 km 公里
+    """
+    dlat = km / KM_PER_DEG_LAT
+    dlng = km / (KM_PER_DEG_LNG * math.cos(math.radians(max(abs(bbox[1]), abs(bbox[3])))))
+    return (bbox[0] - dlng, bbox[1] - dlat, bbox[2] + dlng, bbox[3] + dlat)
+
+
+class RTree:
+    """
+    静态 R 树，用 STR（Sort-Tile-Recursive）方法批量构建，节点为 (外包矩形, 子节点列表, 是否叶子)，
+    叶子节点的子节点为 (外包矩形, 条目索引)
+    """
+
+    def __init__(self, boxes, capacity=NODE_CAPACITY):
+        self.capacity = capacity
+        level = [(bbox, i) for i, bbox in enumerate(boxes)]
+        self.root = None
+        leaf = True
+        while level:
+            nodes = [(bbox_union(b for b, _ in group), group, leaf) for group in self._tile(level)]
+            leaf = False
+            if len(nodes) == 1:
+                self.root = nodes[0]
+                break
+            level = [(node[0], node) for node in nodes]
+
+    def _tile(self, entries):
+        # 先按中心经度分成若干竖条，每条内再按中心纬度排序后按容量切分
+        count = math.ceil(len(entries) / self.capacity)
+        per_slice = math.ceil(math.sqrt(count)) * self.capacity
+        entries = sorted(entries, key=lambda e: e[0][0] + e[0][2])
+        groups = []
+        for start in range(0, len(entries), per_slice):
+            strip = sorted(entries[start:start + per_slice], key=lambda e: e[0][1] + e[0][3])
+            groups += [strip[i:i + self.capacity] for i in range(0, len(strip), self.capacity)]
+        return groups
+
+    def query(self, bbox):
+        """
+        Returns:
+            list: 外包矩形与 bbox 相交的条目索引
+        """
+        found = []
+        stack = [self.root] if self.root and bbox_intersects(self.root[0], bbox) else []
+        while stack:
+            _, children, leaf = stack.pop()
+            for child_bbox, child in children:
+                if bbox_intersects(child_bbox, bbox):
+                    if leaf:
+                        found.append(child)
+                    else:
+                        stack.append(child)
+        return found
+
+
+def parse_date(value):
+    return value if isinstance(value, Date) else Date.fromisoformat(str(value)[:10])
+
+
+def active_on(closure, day):
+    """
+    封路在某天是否有效。"MM-DD" 为每年重复的季节性限制（起始晚于结束时跨年），
+    "YYYY-MM-DD" 为具体日期；没有 valid 字段时全年有效
+    """
+    day = parse_date(day)
+    ranges = closure.get("valid")
+    if not ranges:
+        return True
+    for span in ranges:
+        start, end = span["from"], span["to"]
+        if len(start) == 5:
+            today = day.strftime("%m-%d")
+            if (start <= today <= end) if start <= end else (today >= start or today <= end):
+                return True
+        elif parse_date(start) <= day <= parse_date(end):
+            return True
+    return False
+
+
+class Closure:
+    """
+    一条封路数据及其在局部平面坐标（公里）下的几何形状
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.id = data["id"]
+        self.name = data["name"]
+        self.severity = data.get("severity", "restricted")
+        self.polygon = data.get("geometry", "line") == "polygon"
+        self.buffer_km = data.get("buffer_km", 0 if self.polygon else DEFAULT_BUFFER_KM)
+        coords = np.asarray(data["coordinates"], dtype=float)
+        self.bbox = (coords[:, 0].min(), coords[:, 1].min(), coords[:, 0].max(), coords[:, 1].max())
+        self.search_bbox = expand_bbox(self.bbox, self.buffer_km)
+        self.lng_scale = KM_PER_DEG_LNG * math.cos(math.radians((self.bbox[1] + self.bbox[3]) / 2))
+        self.xy = self.project(coords)
+        if self.polygon and len(self.xy) and (self.xy[0] != self.xy[-1]).any():
+            self.xy = np.vstack([self.xy, self.xy[:1]])
+
+    def project(self, lnglat):
+        return np.column_stack([lnglat[:, 0] * self.lng_scale, lnglat[:, 1] * KM_PER_DEG_LAT])
+
+    def distance_km(self, points):
+        """
+        点（局部平面坐标）到折线或多边形边界的最短距离
+        """
+        a, b = self.xy[:-1], self.xy[1:]
+        ab = b - a
+        length2 = np.maximum((ab ** 2).sum(axis=1), 1e-12)
+        ap = points[:, None, :] - a[None, :, :]
+        t = np.clip((ap * ab[None]).sum(axis=2) / length2, 0.0, 1.0)
+        nearest = a[None] + t[:, :, None] * ab[None]
+        return np.sqrt(((points[:, None, :] - nearest) ** 2).sum(axis=2)).min(axis=1)
+
+    def contains(self, points):
+        """
+        射线法判断点是否在多边形内
+        """
+        x, y = points[:, 0:1], points[:, 1:2]
+        x1, y1 = self.xy[:-1, 0], self.xy[:-1, 1]
+        x2, y2 = self.xy[1:, 0], self.xy[1:, 1]
+        straddle = (y1 > y) != (y2 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cross_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        return ((straddle & (x < cross_x)).sum(axis=1) % 2) == 1
+
+    def overlap_km(self, lnglat, weights):
+        """
+        取样点中落在缓冲区或区域内的里程之和
+        """
+        points = self.project(lnglat)
+        hit = self.distance_km(points) <= self.buffer_km if len(self.xy) > 1 else np.zeros(len(points), bool)
+        if self.polygon:
+            hit |= self.contains(points)
+        return float(weights[hit].sum())
+
+
+class ClosureIndex:
+    """
+    封路数据的空间索引
+    """
+
+    def __init__(self, closures):
+        self.closures = [Closure(data) for data in closures]
+        self.tree = RTree([closure.search_bbox for closure in self.closures])
+
+    @classmethod
+    def load(cls, path=CLOSURES_FILE):
+        """
+        读取封路数据文件，文件不存在时提示并返回空索引
+        """
+        if not os.path.exists(path):
+            print(f"⚠️  封路数据文件不存在: {path}，不检查封路")
+            return cls([])
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f).get("closures", []))
+
+    def __len__(self):
+        return len(self.closures)
+
+    def candidates(self, bbox, day, ids=None):
+        return [self.closures[i] for i in sorted(self.tree.query(bbox))
+                if active_on(self.closures[i].data, day) and (ids is None or self.closures[i].id in ids)]
+
+    def check(self, points, day, min_overlap_km=MIN_OVERLAP_KM, ids=None):
+        """
+        检查路线在某天是否经过有效的封路
+
+        Args:
+            points: 沿路线的点 [(经度, 纬度, ...)]，例如 road_graph.LocalRouter.route_path 的返回值
+            day: 日期（"YYYY-MM-DD" 或 date）
+
+        Returns:
+            list: [{"id", "name", "severity", "note", "overlap_km"}]
+        """
+        if len(points) < 2 or not self.closures:
+            return []
+        coords = np.asarray([point[:2] for point in points], dtype=float)
+        route_bbox = (coords[:, 0].min(), coords[:, 1].min(), coords[:, 0].max(), coords[:, 1].max())
+        candidates = self.candidates(route_bbox, day, ids)
+        if not candidates:
+            return []
+
+        start, end = coords[:-1], coords[1:]
+        seg_min, seg_max = np.minimum(start, end), np.maximum(start, end)
+        mid_lat = np.radians((start[:, 1] + end[:, 1]) / 2)
+        seg_km = np.hypot((end[:, 0] - start[:, 0]) * KM_PER_DEG_LNG * np.cos(mid_lat),
+                          (end[:, 1] - start[:, 1]) * KM_PER_DEG_LAT)
+        hits = []
+        for closure in candidates:
+            lo, hi = closure.search_bbox[:2], closure.search_bbox[2:]
+            near = np.flatnonzero((seg_max >= lo).all(axis=1) & (seg_min <= hi).all(axis=1) & (seg_km > 0))
+            if not len(near):
+                continue
+            # 每段按里程等分，取各小段的中点，权重为小段长度
+            steps = np.maximum(1, np.ceil(seg_km[near] / SAMPLE_KM)).astype(int)
+            owner = np.repeat(near, steps)
+            offset = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+            t = ((offset + 0.5) / np.repeat(steps, steps))[:, None]
+            samples = start[owner] + (end[owner] - start[owner]) * t
+            weights = np.repeat(seg_km[near] / steps, steps)
+            overlap = closure.overlap_km(samples, weights)
+            if overlap >= min_overlap_km:
+                hits.append({
+                    "id": closure.id,
+                    "name": closure.name,
+                    "severity": closure.severity,
+                    "note": closure.data.get("note", ""),
+                    "overlap_km": round(overlap, 1)
+                })
+        return hits
+
+    def blocked_edges(self, router, day, ids=None):
+        """
+        路网中被有效封路（默认只看 severity 为 closed 的）覆盖的边，边较短时重合一半即算覆盖
+
+        Returns:
+            set: {(起点节点, 终点节点)}，双向都包含
+        """
+        if ids is None:
+            ids = {closure.id for closure in self.closures if closure.severity == "closed"}
+        graph = router.graph
+        coords = graph.coords.tolist()
+        lengths = graph.length_km.tolist()
+        blocked = set()
+        for e, (u, v) in enumerate(zip(graph.sources().tolist(), graph.targets.tolist())):
+            if (u, v) in blocked:
+                continue
+            threshold = min(MIN_OVERLAP_KM, lengths[e] / 2)
+            if self.check([coords[u], coords[v]], day, threshold, ids):
+                blocked.update({(u, v), (v, u)})
+        return blocked
+
+
+_INDEX = None
+
+
+def get_closure_index():
+    """
+    第一次使用时才读取封路数据并建立索引
+    """
+    global _INDEX
+    if _INDEX is None:
+        _INDEX = ClosureIndex.load()
+    return _INDEX
+
+
+def describe(hit):
+    """
+    封路命中 -> 风险提示文字，例如 "扎墨公路通行风险"、"喀纳斯、禾木景区封闭"
+    """
+    return f"{hit['name']}封闭" if hit["severity"] == "closed" else f"{hit['name']}通行风险"
+
+
+def attach_closures(results, itinerary, index=None, router=None, log=print):
+    """
+    用当天的日期检查每天的路线，写入结果的 "封路信息" 字段，并把受影响的封路追加到风险提示。
+    对禁止通行的封路重新规划绕行路线，写入 "绕行方案"（无法绕行时为 None），
+    并按绕行路线与原路线的比例调整实际距离和时间（原值保留在 "原始距离(km)"、"原始时间(小时)"）
+
+    Returns:
+        list: 受影响的天 [(天, 封路信息)]
+    """
+    index = index or get_closure_index()
+    affected = []
+    for day, (result, item) in enumerate(zip(results, itinerary), 1):
+        result["封路信息"] = []
+        if not any(active_on(closure.data, item["date"]) for closure in index.closures):
+            continue  # 当天没有有效的封路，不需要规划路线
+        if router is None:
+            from road_graph import get_router
+            try:
+                router = get_router()
+            except OSError:
+                log(f"  ⚠️  无法读取本地路网，跳过封路检查")
+                for rest in results[day:]:
+                    rest["封路信息"] = []
+                return affected
+        points = router.route_path(item["origin"], item["destination"], item.get("waypoints"))
+        if not points:
+            continue
+        hits = index.check(points, item["date"])
+        if not hits:
+            continue
+        result["封路信息"] = hits
+        affected.append((day, hits))
+        notes = [describe(hit) for hit in hits if describe(hit) not in result["风险提示"]]
+        result["风险提示"] = "；".join(filter(None, [result["风险提示"]] + notes))
+        for hit in hits:
+            note = f"（{hit['note']}）" if hit["note"] else ""
+            log(f"  🚧 Day {day} ({item['date']}): {describe(hit)}，重合约 {hit['overlap_km']:.0f} km{note}")
+
+        closed = [hit["id"] for hit in hits if hit["severity"] == "closed"]
+        if not closed:
+            continue
+        blocked = index.blocked_edges(router, item["date"], set(closed))
+        detour = router.route_avoiding(item["origin"], item["destination"], item.get("waypoints"), blocked)
+        original = router.route(item["origin"], item["destination"], item.get("waypoints"))
+        if detour is None or original is None or not original["duration_minutes"]:
+            result["绕行方案"] = None
+            log(f"     ✗ 无法绕行")
+            continue
+        time_ratio = detour["duration_minutes"] / original["duration_minutes"]
+        distance_ratio = detour["distance_km"] / original["distance_km"] if original["distance_km"] else 1.0
+        result["原始距离(km)"] = result["实际距离(km)"]
+        result["原始时间(小时)"] = result["实际时间(小时)"]
+        result["实际距离(km)"] = round(result["实际距离(km)"] * distance_ratio, 1)
+        result["实际时间(分钟)"] = round(result["实际时间(分钟)"] * time_ratio, 1)
+        result["实际时间(小时)"] = round(result["实际时间(分钟)"] / 60, 1)
+        result["距离差异(km)"] = round(result["实际距离(km)"] - result["估算距离(km)"], 1)
+        result["时间差异(小时)"] = round(result["实际时间(小时)"] - result["估算时间(小时)"], 1)
+        names = router.graph.names
+        via = [names[node] for node in detour["nodes"] if names[node]]
+        result["绕行方案"] = {
+            "closures": closed,
+            "via": via,
+            "extra_km": round(result["实际距离(km)"] - result["原始距离(km)"], 1),
+            "extra_hours": round(result["实际时间(小时)"] - result["原始时间(小时)"], 1)
+        }
+        log(f"     ↪ 绕行 {' → '.join(via)}，多 {result['绕行方案']['extra_km']:.0f} km、"
+            f"{result['绕行方案']['extra_hours']:.1f} 小时")
+    return affected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查路线在指定日期是否经过封路")
+    parser.add_argument("date", help="日期，格式 YYYY-MM-DD")
+    parser.add_argument("origin", help="起点（地名或 \"经度,纬度\"）")
+    parser.add_argument("destination", help="终点")
+    parser.add_argument("--via", nargs="*", default=[], help="途经点")
+    args = parser.parse_args(argv)
+
+    from road_graph import get_router
+    index = get_closure_index()
+    router = get_router()
+    print(f"🚧 封路数据共 {len(index)} 条")
+    points = router.route_path(args.origin, args.destination, args.via)
+    if not points:
+        print("  ✗ 路线规划失败")
+        return 1
+    hits = index.check(points, args.date)
+    if not hits:
+        print("  ✓ 路线未经过有效的封路")
+    for hit in hits:
+        print(f"  {SEVERITY_LABELS.get(hit['severity'], hit['severity'])} {hit['name']}，"
+              f"重合约 {hit['overlap_km']:.0f} km：{hit['note']}")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+冬季延误蒙特卡洛模拟
+按天对行车时间抽样：天气（相邻天相关）、垭口封路等待、高海拔降速和沿途停留，
+用 NumPy 向量化一次计算全部试验，得到每天天黑后才到达和赶不上截止时间（如航班）的概率
+
+模型参数是根据往年冬季路况的经验估计，可按出发前的实时路况调整 PASSES 中的封路概率
+"""
+
+import math
+from datetime import date as Date
+from collections import namedtuple
+
+import numpy as np
+
+from gazetteer import get_gazetteer
+
+DEFAULT_TRIALS = 100_000
+DEFAULT_SEED = 20241222  # 报告使用固定种子，保证每次生成的概率一致
+DEFAULT_DEPART = "08:30"
+CHECKIN_HOURS = 1.5      # 航班起飞前需要到达机场的时间
+TIMEZONE_HOURS = 8       # 行程时间均按北京时间
+DEFAULT_LOCATION = (29.660361, 91.132212)  # 拉萨，地点未知时用于计算日出日落
+
+# 天气：对数正态的行车时间系数，相邻天按 AR(1) 相关（一场降雪往往影响连续几天）
+WEATHER_MEAN = 0.05
+WEATHER_SIGMA = 0.12
+WEATHER_CORRELATION = 0.6
+
+# 高海拔：最高点超过 4000 米后每千米降速比例
+ALTITUDE_BASELINE = 4000
+ALTITUDE_SLOWDOWN = 0.06
+DEFAULT_ALTITUDE = 3700
+
+# 沿途停留（用餐、休息、拍照），伽马分布
+STOP_SHAPE = 2.0
+STOP_HOURS_BASE = 0.75
+STOP_HOURS_PER_WAYPOINT = 0.5
+
+# 冬季垭口：海拔、单日封路（或交通管制）概率、平均等待小时数
+# requires 中任意一组关键词全部出现在当天路线中即认为经过该垭口
+PASSES = {
+    "色季拉山口": {"altitude": 4728, "closure_prob": 0.08, "mean_delay_hours": 2.0,
+                  "requires": [["色季拉山口"], ["林芝", "波密"]]},
+    "嘎隆拉隧道": {"altitude": 3700, "closure_prob": 0.10, "mean_delay_hours": 3.0,
+                  "requires": [["墨脱"]]},
+    "米拉山口": {"altitude": 5013, "closure_prob": 0.05, "mean_delay_hours": 1.5,
+                "requires": [["米拉山口"], ["林芝", "拉萨"]]},
+    "岗巴拉山口": {"altitude": 4990, "closure_prob": 0.04, "mean_delay_hours": 1.5,
+                  "requires": [["岗巴拉山口"], ["羊卓雍措"]]},
+    "卡若拉山口": {"altitude": 5039, "closure_prob": 0.04, "mean_delay_hours": 1.5,
+                  "requires": [["卡若拉"]]},
+    "嘉措拉山口": {"altitude": 5248, "closure_prob": 0.06, "mean_delay_hours": 2.0,
+                  "requires": [["嘉措拉山口"], ["佩枯措"]]},
+    "那根拉山口": {"altitude": 5190, "closure_prob": 0.07, "mean_delay_hours": 2.0,
+                  "requires": [["那根拉山口"], ["纳木措"]]},
+}
+
+DayProfile = namedtuple("DayProfile", "passes altitude stop_hours depart deadline sunset")
+
+
+def parse_clock(value):
+    """
+    "HH:MM" -> 小时数（浮点）
+    """
+    hours, minutes = value.split(':')
+    return int(hours) + int(minutes) / 60
+
+
+def format_clock(hours):
+    minutes = int(round(hours * 60))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def sun_times(day, lat, lng, tz=TIMEZONE_HOURS):
+    """
+    计算日出、日落时间（NOAA近似公式，误差在几分钟内）
+
+    Args:
+        day: "YYYY-MM-DD"
+        lat, lng: 纬度、经度
+        tz: 时区（小时）
+
+    Returns:
+        tuple: (日出小时数, 日落小时数)，当地时区
+    """
+    n = Date.fromisoformat(day).timetuple().tm_yday
+    g = 2 * math.pi / 365 * (n - 1)
+    eqtime = 229.18 * (0.000075 + 0.001868 * math.cos(g) - 0.032077 * math.sin(g)
+                       - 0.014615 * math.cos(2 * g) - 0.040849 * math.sin(2 * g))
+    decl = (0.006918 - 0.399912 * math.cos(g) + 0.070257 * math.sin(g) - 0.006758 * math.cos(2 * g)
+            + 0.000907 * math.sin(2 * g) - 0.002697 * math.cos(3 * g) + 0.00148 * math.sin(3 * g))
+    phi = math.radians(lat)
+    cos_ha = math.cos(math.radians(90.833)) / (math.cos(phi) * math.cos(decl)) - math.tan(phi) * math.tan(decl)
+    ha = math.degrees(math.acos(max(-1.0, min(1.0, cos_ha))))
+    sunrise = (720 - 4 * (lng + ha) - eqtime) / 60 + tz
+    sunset = (720 - 4 * (lng - ha) - eqtime) / 60 + tz
+    return sunrise, sunset
+
+
+def route_passes(item):
+    """
+    返回当天经过的冬季垭口名称列表
+    """
+    text = " ".join([item.get("route", ""), item.get("origin", ""), item.get("destination", "")]
+                    + list(item.get("waypoints") or []))
+    return [name for name, info in PASSES.items()
+            if any(all(word in text for word in group) for group in info["requires"])]
+
+
+def day_profile(item, coords):
+    passes = route_passes(item)
+    altitude = max([PASSES[name]["altitude"] for name in passes] + [DEFAULT_ALTITUDE])
+    stop_hours = item.get("stop_hours",
+                          STOP_HOURS_BASE + STOP_HOURS_PER_WAYPOINT * len(item.get("waypoints") or []))
+    depart = parse_clock(item.get("depart", DEFAULT_DEPART))
+
+    deadline = None
+    if item.get("deadline"):
+        deadline = parse_clock(item["deadline"])
+    elif item.get("flight_time"):
+        deadline = parse_clock(item["flight_time"]) - CHECKIN_HOURS
+
+    # 以终点计算日落；往返行程的终点就是起点
+    lat, lng = DEFAULT_LOCATION
+    location = coords.get(item.get("destination", ""))
+    if location:
+        lng, lat = map(float, location.split(','))
+    _, sunset = sun_times(item["date"], lat, lng)
+    return DayProfile(passes, altitude, stop_hours, depart, deadline, sunset)
+
+
+def simulate_delays(itinerary, results, trials=DEFAULT_TRIALS, seed=None, coords=None):
+    """
+    模拟整个行程的每日实际耗时
+
+    Args:
+        itinerary: 行程定义，格式同 travel_analyzer.ITINERARY
+        results: analyze_itinerary() 的返回值，以其中的实际时间为无延误基准
+        trials: 试验次数
+        seed: 随机种子
+        coords: 地点名称 -> "经度,纬度"，用于计算日落（默认查询离线地名库）
+
+    Returns:
+        list: 每天一个字典，包含耗时分位数、天黑后到达概率和误过截止时间概率
+    """
+    if coords is None:
+        coords = get_gazetteer()
+    rng = np.random.default_rng(seed)
+    profiles = [day_profile(item, coords) for item in itinerary]
+    n_days = len(profiles)
+    base = np.array([r["实际时间(小时)"] for r in results], dtype=float)
+
+    # 天气：AR(1) 相关的标准正态序列 -> 对数正态系数
+    noise = rng.standard_normal((trials, n_days))
+    for d in range(1, n_days):
+        noise[:, d] = WEATHER_CORRELATION * noise[:, d - 1] + math.sqrt(1 - WEATHER_CORRELATION ** 2) * noise[:, d]
+    factor = np.exp(WEATHER_MEAN + WEATHER_SIGMA * noise)
+
+    # 高海拔降速，个体差异用截断正态表示
+    excess_km = np.array([max(0, p.altitude - ALTITUDE_BASELINE) / 1000 for p in profiles])
+    factor *= 1 + ALTITUDE_SLOWDOWN * excess_km * np.maximum(0, 1 + 0.5 * rng.standard_normal((trials, n_days)))
+    hours = base * factor
+
+    # 垭口封路：只对 (天, 垭口) 实际出现的组合抽样
+    pairs = [(d, name) for d, p in enumerate(profiles) for name in p.passes]
+    if pairs:
+        prob = np.array([PASSES[name]["closure_prob"] for _, name in pairs])
+        mean = np.array([PASSES[name]["mean_delay_hours"] for _, name in pairs])
+        closed = rng.random((trials, len(pairs))) < prob
+        waits = closed * rng.exponential(1.0, (trials, len(pairs))) * mean
+        day_of_pair = np.zeros((len(pairs), n_days))
+        day_of_pair[np.arange(len(pairs)), [d for d, _ in pairs]] = 1
+        hours += waits @ day_of_pair
+
+    # 沿途停留
+    stop_mean = np.array([p.stop_hours for p in profiles], dtype=float)
+    hours += rng.gamma(STOP_SHAPE, 1.0, (trials, n_days)) * (stop_mean / STOP_SHAPE)
+
+    depart = np.array([p.depart for p in profiles])
+    sunset = np.array([p.sunset for p in profiles])
+    arrival = depart + hours
+    after_sunset = (arrival > sunset).mean(axis=0)
+    p50, p90 = np.percentile(hours, [50, 90], axis=0)
+
+    days = []
+    for d, p in enumerate(profiles):
+        days.append({
+            "day": itinerary[d]["day"],
+            "passes": p.passes,
+            "p50_hours": round(float(p50[d]), 2),
+            "p90_hours": round(float(p90[d]), 2),
+            "buffer_hours": round(float(p90[d] - base[d]), 2),
+            "sunset": format_clock(p.sunset),
+            "p_after_sunset": round(float(after_sunset[d]), 4),
+            "deadline": format_clock(p.deadline) if p.deadline is not None else None,
+            "p_miss_deadline": (round(float((arrival[:, d] > p.deadline).mean()), 4)
+                                if p.deadline is not None else None)
+        })
+    return days
+
+
+def attach_delay_risk(results, itinerary, trials=DEFAULT_TRIALS, seed=DEFAULT_SEED, coords=None):
+    """
+    运行模拟，把计算出的风险指标写入每天的分析结果
+
+    Returns:
+        list: 原 results（已添加 "P50时间(小时)"、"P90时间(小时)"、"缓冲时间(小时)"、
+              "日落时间"、"天黑后到达概率"、"截止时间"、"误机概率" 字段）
+    """
+    for result, day in zip(results, simulate_delays(itinerary, results, trials, seed, coords)):
+        result["P50时间(小时)"] = day["p50_hours"]
+        result["P90时间(小时)"] = day["p90_hours"]
+        result["缓冲时间(小时)"] = day["buffer_hours"]
+        result["日落时间"] = day["sunset"]
+        result["天黑后到达概率"] = day["p_after_sunset"]
+        result["截止时间"] = day["deadline"]
+        result["误机概率"] = day["p_miss_deadline"]
+    return results
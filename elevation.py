@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+海拔剖面与高海拔暴露
+从本地 DEM 目录（默认 dem/，可用 DEM_DIR 环境变量指定）读取 SRTM .hgt 或 GeoTIFF 高程数据。
+西藏全境的数据有数 GB，而每天的路线只经过其中很窄的一条走廊，所以数据文件用内存映射打开，
+沿路线取样后一次性向量化做双线性插值，只有实际用到的页面才会从磁盘读入
+
+每天新增的结果列：
+- 最高海拔(m)：路线上的最高点（通常是垭口）
+- 4500米以上时间(小时)：按实际行车时间折算
+- 住宿海拔(m)：当天终点（住宿地）的海拔
+- 海拔剖面：[[里程km, 海拔m]]，每 PROFILE_KM 公里一个点，供报告绘图
+
+路线几何形状来自本地路网（road_graph.py），骨架路网的边是直线，剖面只是近似；
+换用 OSM 路网后会沿实际道路取样
+
+使用方法：
+    python elevation.py 拉萨市 日喀则市 --via 羊卓雍措景区
+"""
+
+import argparse
+import glob
+import math
+import os
+import re
+import struct
+
+import numpy as np
+
+DEM_DIR = os.environ.get("DEM_DIR", "dem")
+SAMPLE_KM = 0.5              # 沿路线取样的间距，SRTM 3 弧秒约 90 米，0.5 公里足以捕捉垭口
+PROFILE_KM = 5               # 结果中保存的剖面间距
+HIGH_ALTITUDE_M = 4500       # 统计高海拔暴露时间的海拔线
+SLEEP_ALTITUDE_LIMIT = 4000  # 住宿海拔超过该值时提示高原反应风险
+SLEEP_GAIN_LIMIT = 500       # 住宿海拔比前一晚升高超过该值时提示（3000米以上的常用适应标准）
+
+HGT_NAME = re.compile(r"^([NS])(\d{2})([EW])(\d{3})\.hgt$", re.IGNORECASE)
+HGT_NODATA = -32768
+
+# TIFF 标签
+TIFF_TYPES = {1: "B", 2: "s", 3: "H", 4: "I", 5: "II", 6: "b", 8: "h", 9: "i", 11: "f", 12: "d"}
+TAG_WIDTH, TAG_HEIGHT, TAG_BITS, TAG_COMPRESSION = 256, 257, 258, 259
+TAG_STRIP_OFFSETS, TAG_SAMPLES, TAG_STRIP_BYTES = 273, 277, 279
+TAG_TILE_WIDTH, TAG_SAMPLE_FORMAT = 322, 339
+TAG_PIXEL_SCALE, TAG_TIEPOINT, TAG_GEOKEYS, TAG_NODATA = 33550, 33922, 34735, 42113
+GEOKEY_RASTER_TYPE, RASTER_PIXEL_IS_POINT = 1025, 2
+SAMPLE_KINDS = {1: "u", 2: "i", 3: "f"}
+
+
+class DemTile:
+    """
+    一块规则格网高程数据：data 为内存映射的 (行, 列) 数组，第 0 行在北边
+
+    point 为 True 时格网值位于像元角点（SRTM），否则位于像元中心（GeoTIFF 默认）
+    """
+
+    def __init__(self, path, west, north, dx, dy, rows, cols, dtype, offset, nodata, point):
+        self.path = path
+        self.west, self.north, self.dx, self.dy = west, north, dx, dy
+        self.rows, self.cols = rows, cols
+        self.dtype, self.offset, self.nodata = dtype, offset, nodata
+        self.shift = 0.0 if point else 0.5
+        span = 0 if point else 1
+        self.bounds = (west, north - (rows - 1 + span) * dy, west + (cols - 1 + span) * dx, north)
+        self._data = None
+
+    @property
+    def data(self):
+        # 第一次取样时才映射文件，只扫描目录不占用文件句柄
+        if self._data is None:
+            self._data = np.memmap(self.path, dtype=self.dtype, mode="r", offset=self.offset,
+                                   shape=(self.rows, self.cols))
+        return self._data
+
+    def contains(self, lngs, lats):
+        west, south, east, north = self.bounds
+        return (lngs >= west) & (lngs <= east) & (lats >= south) & (lats <= north)
+
+    def sample(self, lngs, lats):
+        """
+        双线性插值，四个相邻格网点中有无效值时返回 NaN
+        """
+        col = np.clip((lngs - self.west) / self.dx - self.shift, 0, self.cols - 1)
+        row = np.clip((self.north - lats) / self.dy - self.shift, 0, self.rows - 1)
+        c0 = np.minimum(col.astype(int), self.cols - 2)
+        r0 = np.minimum(row.astype(int), self.rows - 2)
+        fc, fr = col - c0, row - r0
+        data = self.data
+        corners = np.stack([data[r0, c0], data[r0, c0 + 1], data[r0 + 1, c0], data[r0 + 1, c0 + 1]]).astype(float)
+        if self.nodata is not None:
+            corners[corners == self.nodata] = np.nan
+        top = corners[0] * (1 - fc) + corners[1] * fc
+        bottom = corners[2] * (1 - fc) + corners[3] * fc
+        return top * (1 - fr) + bottom * fr
+
+
+def open_hgt(path):
+    """
+    SRTM .hgt：文件名为西南角坐标（如 N29E091.hgt），大端 int16，1201² (3") 或 3601² (1")
+    """
+    match = HGT_NAME.match(os.path.basename(path))
+    if not match:
+        raise ValueError(f"无法从文件名识别 SRTM 瓦片坐标: {path}")
+    ns, lat, ew, lng = match.groups()
+    south = int(lat) * (1 if ns.upper() == "N" else -1)
+    west = int(lng) * (1 if ew.upper() == "E" else -1)
+    size = math.isqrt(os.path.getsize(path) // 2)
+    if size * size * 2 != os.path.getsize(path):
+        raise ValueError(f"SRTM 文件大小不是正方形格网: {path}")
+    step = 1 / (size - 1)
+    return DemTile(path, west, south + 1, step, step, size, size, ">i2", 0, HGT_NODATA, True)
+
+
+def read_tiff_tags(f):
+    """
+    读取 TIFF 第一个 IFD 的全部标签
+
+    Returns:
+        tuple: (字节序 "<" 或 ">", {标签: 值元组})
+    """
+    order = {b"II": "<", b"MM": ">"}.get(f.read(2))
+    if order is None:
+        raise ValueError("不是 TIFF 文件")
+    magic, ifd = struct.unpack(order + "HI", f.read(6))
+    if magic != 42:
+        raise ValueError("不支持 BigTIFF，请用 gdal_translate 转换为普通 TIFF")
+    f.seek(ifd)
+    (count,) = struct.unpack(order + "H", f.read(2))
+    tags = {}
+    for tag, kind, n, raw in [struct.unpack(order + "HHI4s", f.read(12)) for _ in range(count)]:
+        fmt = TIFF_TYPES.get(kind)
+        if fmt is None:
+            continue
+        size = struct.calcsize(order + fmt) * n
+        if size > 4:
+            position = f.tell()
+            f.seek(struct.unpack(order + "I", raw)[0])
+            raw = f.read(size)
+            f.seek(position)
+        if kind == 2:
+            tags[tag] = (raw[:n].rstrip(b"\0").decode("ascii", "replace"),)
+        else:
+            tags[tag] = struct.unpack(order + fmt * n, raw[:size])
+    return order, tags
+
+
+def open_geotiff(path):
+    """
+    单波段、未压缩、按条带连续存放的 GeoTIFF（经纬度坐标）。其他格式可以先转换：
+        gdal_translate -co COMPRESS=NONE -co TILED=NO in.tif out.tif
+    """
+    with open(path, "rb") as f:
+        order, tags = read_tiff_tags(f)
+
+    def tag(key, default=None):
+        return tags.get(key, (default,))[0]
+
+    if tag(TAG_COMPRESSION, 1) != 1 or TAG_TILE_WIDTH in tags or tag(TAG_SAMPLES, 1) != 1:
+        raise ValueError(f"只支持单波段、未压缩、按条带存放的 GeoTIFF: {path}")
+    if TAG_PIXEL_SCALE not in tags or TAG_TIEPOINT not in tags:
+        raise ValueError(f"GeoTIFF 缺少坐标信息: {path}")
+    cols, rows = tag(TAG_WIDTH), tag(TAG_HEIGHT)
+    dtype = np.dtype(f"{order}{SAMPLE_KINDS[tag(TAG_SAMPLE_FORMAT, 1)]}{tag(TAG_BITS) // 8}")
+    offsets, counts = tags[TAG_STRIP_OFFSETS], tags.get(TAG_STRIP_BYTES, ())
+    # 条带首尾相接时，整幅影像就是文件中的一段连续数组，可以直接内存映射
+    if any(offset != offsets[0] + sum(counts[:i]) for i, offset in enumerate(offsets)):
+        raise ValueError(f"GeoTIFF 条带不连续，无法内存映射: {path}")
+
+    sx, sy = tags[TAG_PIXEL_SCALE][:2]
+    i, j, _, x, y, _ = tags[TAG_TIEPOINT][:6]
+    geokeys = tags.get(TAG_GEOKEYS, ())
+    point = any(geokeys[k] == GEOKEY_RASTER_TYPE and geokeys[k + 3] == RASTER_PIXEL_IS_POINT
+                for k in range(4, len(geokeys) - 3, 4))
+    nodata = float(tag(TAG_NODATA)) if TAG_NODATA in tags else None
+    return DemTile(path, x - i * sx, y + j * sy, sx, sy, rows, cols, dtype, offsets[0], nodata, point)
+
+
+class DemReader:
+    """
+    DEM 目录的瓦片索引：.hgt 按文件名定位，GeoTIFF 读取文件头得到范围
+    """
+
+    def __init__(self, directory=DEM_DIR):
+        self.directory = directory
+        self.hgt = {}
+        self.tiffs = []
+        for path in sorted(glob.glob(os.path.join(directory, "*"))):
+            name = path.lower()
+            if name.endswith(".hgt"):
+                tile = open_hgt(path)
+                self.hgt[(round(tile.bounds[1]), round(tile.bounds[0]))] = tile
+            elif name.endswith((".tif", ".tiff")):
+                self.tiffs.append(open_geotiff(path))
+
+    def __len__(self):
+        return len(self.hgt) + len(self.tiffs)
+
+    def sample(self, lngs, lats):
+        """
+        批量查询海拔（米），没有数据覆盖的点为 NaN
+        """
+        lngs = np.asarray(lngs, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        result = np.full(lngs.shape, np.nan)
+        if self.hgt:
+            keys = np.column_stack([np.floor(lats), np.floor(lngs)]).astype(int)
+            for south, west in np.unique(keys, axis=0).tolist():
+                tile = self.hgt.get((south, west))
+                if tile is not None:
+                    mask = (keys[:, 0] == south) & (keys[:, 1] == west)
+                    result[mask] = tile.sample(lngs[mask], lats[mask])
+        for tile in self.tiffs:
+            mask = np.isnan(result) & tile.contains(lngs, lats)
+            if mask.any():
+                result[mask] = tile.sample(lngs[mask], lats[mask])
+        return result
+
+
+_DEM = None
+
+
+def get_dem():
+    """
+    第一次使用时才扫描 DEM 目录
+    """
+    global _DEM
+    if _DEM is None:
+        _DEM = DemReader()
+    return _DEM
+
+
+def route_profile(points, dem, step_km=SAMPLE_KM):
+    """
+    沿路线按固定里程取样海拔
+
+    Args:
+        points: road_graph.LocalRouter.route_path 的返回值 [(经度, 纬度, 累计秒, 累计公里)]
+
+    Returns:
+        tuple: (里程, 累计秒, 海拔) 三个等长数组
+    """
+    lng, lat, seconds, km = (np.array(column, dtype=float) for column in zip(*points))
+    count = max(2, math.ceil(km[-1] / step_km) + 1)
+    position = np.linspace(0, km[-1], count)
+    return (position, np.interp(position, km, seconds),
+            dem.sample(np.interp(position, km, lng), np.interp(position, km, lat)))
+
+
+def day_altitude(item, hours, dem, router):
+    """
+    计算一天的海拔指标，路线无法规划或没有 DEM 覆盖时返回 None
+
+    Args:
+        hours: 当天的实际行车时间，高海拔时间按路网时间中所占比例折算
+    """
+    points = router.route_path(item["origin"], item["destination"], item.get("waypoints"))
+    if not points:
+        return None
+    km, seconds, elevation = route_profile(points, dem)
+    if np.isnan(elevation).all():
+        return None
+    # 每小段用两端海拔的平均值判断是否在海拔线以上
+    middle = (elevation[:-1] + elevation[1:]) / 2
+    duration = np.diff(seconds)
+    share = duration[middle >= HIGH_ALTITUDE_M].sum() / duration.sum() if duration.sum() else 0.0
+    sleep = dem.sample([points[-1][0]], [points[-1][1]])[0]
+    step = max(1, round(PROFILE_KM / (km[1] - km[0]))) if len(km) > 1 and km[1] else 1
+    profile = [[round(float(k), 1), int(round(e))] for k, e in zip(km[::step], elevation[::step])
+               if not math.isnan(e)]
+    return {
+        "最高海拔(m)": int(round(np.nanmax(elevation))),
+        "4500米以上时间(小时)": round(float(share * hours), 1),
+        "住宿海拔(m)": None if math.isnan(sleep) else int(round(sleep)),
+        "海拔剖面": profile
+    }
+
+
+def attach_elevation(results, itinerary, dem=None, router=None, log=print):
+    """
+    为每天写入海拔指标（见模块说明），没有 DEM 覆盖的天不写入
+
+    Returns:
+        int: 写入了海拔指标的天数
+    """
+    dem = dem or get_dem()
+    if not len(dem):
+        log(f"  ⚠️  未找到 DEM 数据（{DEM_DIR}/ 目录），跳过海拔分析")
+        return 0
+    if router is None:
+        from road_graph import get_router
+        router = get_router()
+    count = 0
+    for result, item in zip(results, itinerary):
+        metrics = day_altitude(item, result["实际时间(小时)"], dem, router)
+        if metrics:
+            result.update(metrics)
+            count += 1
+    return count
+
+
+def altitude_warnings(results):
+    """
+    住宿海拔过高或比前一晚升高过多的天
+
+    Returns:
+        list: [(天, 说明)]
+    """
+    warnings = []
+    previous = None
+    for day, result in enumerate(results, 1):
+        sleep = result.get("住宿海拔(m)")
+        if sleep is None:
+            previous = None
+            continue
+        if sleep >= SLEEP_ALTITUDE_LIMIT:
+            warnings.append((day, f"住宿海拔 {sleep} 米，夜间高原反应风险较大"))
+        elif previous is not None and sleep - previous > SLEEP_GAIN_LIMIT and sleep >= 3000:
+            warnings.append((day, f"住宿海拔比前一晚升高 {sleep - previous} 米，超过每天 {SLEEP_GAIN_LIMIT} 米的适应标准"))
+        previous = sleep
+    return warnings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询路线的海拔剖面")
+    parser.add_argument("origin", help="起点（地名或 \"经度,纬度\"）")
+    parser.add_argument("destination", help="终点")
+    parser.add_argument("--via", nargs="*", default=[], help="途经点")
+    parser.add_argument("--dem", default=DEM_DIR, help="DEM 目录（.hgt 或 GeoTIFF）")
+    args = parser.parse_args(argv)
+
+    from road_graph import get_router
+    dem = DemReader(args.dem)
+    print(f"🏔️  DEM 瓦片: {len(dem)} 个")
+    router = get_router()
+    points = router.route_path(args.origin, args.destination, args.via)
+    if not points:
+        print("  ✗ 路线规划失败")
+        return 1
+    metrics = day_altitude({"origin": args.origin, "destination": args.destination, "waypoints": args.via},
+                           points[-1][2] / 3600, dem, router)
+    if metrics is None:
+        print("  ✗ 路线不在 DEM 覆盖范围内")
+        return 1
+    print(f"  最高海拔: {metrics['最高海拔(m)']} 米")
+    print(f"  {HIGH_ALTITUDE_M}米以上: {metrics['4500米以上时间(小时)']} 小时")
+    print(f"  终点海拔: {metrics['住宿海拔(m)']} 米")
+    for km, meters in metrics["海拔剖面"]:
+        print(f"  {km:7.1f} km  {meters:5d} m")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线估算模型
+不访问网络，按坐标间的大圆距离乘以分区的道路弯曲系数得到行驶距离，再除以分区平均车速得到时间。
+整个行程的所有路段一次性向量化计算，几百天的行程也在毫秒内完成。用途：
+- 未配置高德API Key 时代替高德后端（也可以用 --router offline 选择）
+- 预筛选（--prefilter）：估算结果的误差范围不会改变可行性判断时直接使用估算值，
+  只对接近判断阈值或有航班截止时间的天调用高德API
+
+分区系数可以用已缓存的高德结果拟合，写入本模块所在目录的 estimate_model.json 后自动使用：
+    python estimator.py --fit
+    python estimator.py 拉萨市 日喀则市 --via 羊卓雍措景区
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from gazetteer import EARTH_RADIUS_KM, get_gazetteer
+from reconciliation import RECONCILE_CACHE_FILE, is_coordinate, load_cache
+
+ESTIMATE_MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "estimate_model.json")
+
+# 分区：(名称, 经度范围, 纬度范围, 默认系数)，按顺序匹配路段中点，都不匹配时使用 DEFAULT_REGION
+# winding: 道路距离 / 大圆距离；speed_kmh: 平均车速；relative_error: 时间估算的相对误差（约一个标准差）
+REGIONS = (
+    ("藏东南", (93.0, 99.0), (27.0, 31.5), {"winding": 1.25, "speed_kmh": 45, "relative_error": 0.25}),
+    ("藏中西", (78.0, 93.0), (27.0, 36.0), {"winding": 1.38, "speed_kmh": 65, "relative_error": 0.2}),
+    ("新疆北部", (73.0, 96.0), (40.0, 50.0), {"winding": 1.3, "speed_kmh": 70, "relative_error": 0.2}),
+)
+DEFAULT_REGION = {"winding": 1.35, "speed_kmh": 55, "relative_error": 0.3}
+MIN_FIT_SAMPLES = 2  # 分区内样本少于该数时保留默认系数
+
+# 预筛选：估算时间的误差范围跨过这些阈值时，结果会影响可行性判断，需要调用API
+# （长途驾驶日和严重疲劳驾驶，见 travel_analyzer.assess_feasibility）
+DECISION_HOURS = (8, 10)
+
+
+def haversine(lng1, lat1, lng2, lat2):
+    """
+    向量化的大圆距离（公里），参数为角度数组
+    """
+    lng1, lat1, lng2, lat2 = map(np.radians, (lng1, lat1, lng2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+
+def day_stops(item):
+    """
+    一天依次经过的地点，往返行程的处理与 travel_analyzer.route_day 一致
+    """
+    waypoints = item.get("waypoints") or []
+    if item["origin"] != item["destination"] or not waypoints:
+        return [item["origin"]] + waypoints + [item["destination"]]
+    return [item["origin"]] + (item.get("waypoint_coords") or waypoints) + [item["origin"]]
+
+
+class Estimator:
+    """
+    分区道路系数和车速模型
+    """
+
+    def __init__(self, regions=None, gazetteer=None):
+        self.regions = [(name, lngs, lats, dict(params)) for name, lngs, lats, params in REGIONS]
+        for name, params in (regions or {}).items():
+            for region in self.regions:
+                if region[0] == name:
+                    region[3].update(params)
+        self.default = dict(DEFAULT_REGION, **(regions or {}).get("默认", {}))
+        table = [region[3] for region in self.regions] + [self.default]
+        self.winding = np.array([params["winding"] for params in table])
+        self.speed = np.array([params["speed_kmh"] for params in table])
+        self.error = np.array([params["relative_error"] for params in table])
+        self.gazetteer = gazetteer or get_gazetteer()
+        self.locations = {}  # 地名查询结果，批量估算时同一地点反复出现
+
+    @classmethod
+    def load(cls, path=ESTIMATE_MODEL_FILE):
+        """
+        读取拟合的分区系数，文件不存在时使用默认系数
+        """
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f).get("regions", {}))
+
+    def region_index(self, lngs, lats):
+        """
+        每个点所在的分区序号，不在任何分区内的为 len(REGIONS)（默认系数）
+        """
+        index = np.full(np.shape(lngs), len(self.regions))
+        for i in reversed(range(len(self.regions))):
+            _, (west, east), (south, north), _ = self.regions[i]
+            index[(lngs >= west) & (lngs < east) & (lats >= south) & (lats < north)] = i
+        return index
+
+    def legs(self, start, end):
+        """
+        批量估算路段
+
+        Args:
+            start, end: (n, 2) 的 [经度, 纬度] 数组
+
+        Returns:
+            tuple: (道路距离公里, 小时, 时间的相对误差) 三个数组
+        """
+        start = np.asarray(start, dtype=float).reshape(-1, 2)
+        end = np.asarray(end, dtype=float).reshape(-1, 2)
+        great_circle = haversine(start[:, 0], start[:, 1], end[:, 0], end[:, 1])
+        region = self.region_index((start[:, 0] + end[:, 0]) / 2, (start[:, 1] + end[:, 1]) / 2)
+        km = great_circle * self.winding[region]
+        return km, km / self.speed[region], self.error[region]
+
+    def geocode(self, name):
+        if is_coordinate(name):
+            return name
+        if name not in self.locations:
+            self.locations[name] = self.gazetteer.lookup(name)
+        return self.locations[name]
+
+    def _locate(self, names):
+        locations = [self.geocode(name) for name in names]
+        if None in locations:
+            return None
+        return [tuple(map(float, location.split(','))) for location in locations]
+
+    def route(self, origin, destination, waypoints=None):
+        """
+        估算路线，参数和返回值同 travel_analyzer.get_driving_route，有地点无法定位时返回 None
+        """
+        return self.estimate_chains([[origin] + list(waypoints or []) + [destination]])[0]
+
+    def estimate_chains(self, chains):
+        """
+        一次性估算多条路线（每条为依次经过的地点列表）
+
+        Returns:
+            list: 每条路线的结果（格式同 route()，另有 "relative_error"），无法定位的为 None
+        """
+        located = [self._locate(names) for names in chains]
+        starts, ends, owners = [], [], []
+        for i, points in enumerate(located):
+            if points:
+                starts += points[:-1]
+                ends += points[1:]
+                owners += [i] * (len(points) - 1)
+        results = [None] * len(chains)
+        km, hours, error = self.legs(starts, ends)
+        owners = np.array(owners, dtype=int)
+        total_km = np.bincount(owners, km, len(chains))
+        total_hours = np.bincount(owners, hours, len(chains))
+        # 各路段的误差按时间加权平均
+        weighted_error = np.bincount(owners, hours * error, len(chains))
+        for i, points in enumerate(located):
+            if points:
+                error_i = weighted_error[i] / total_hours[i] if total_hours[i] else 0.0
+                results[i] = self._result(total_km[i], total_hours[i], error_i)
+        return results
+
+    def estimate_days(self, itinerary):
+        """
+        估算整个行程，每天一个结果（格式同 estimate_chains）
+        """
+        return self.estimate_chains([day_stops(item) for item in itinerary])
+
+    @staticmethod
+    def _result(km, hours, error):
+        minutes = float(hours) * 60
+        return {
+            "distance_km": round(float(km), 1),
+            "duration_minutes": round(minutes, 1),
+            "duration_hours": round(minutes / 60, 1),
+            "unresolved": [],
+            "relative_error": round(float(error), 2)
+        }
+
+
+_ESTIMATOR = None
+
+
+def get_estimator():
+    """
+    第一次使用时才读取模型文件
+    """
+    global _ESTIMATOR
+    if _ESTIMATOR is None:
+        _ESTIMATOR = Estimator.load()
+    return _ESTIMATOR
+
+
+def precision_reasons(item, estimate, decision_hours=DECISION_HOURS):
+    """
+    判断一天是否需要调用API取得精确结果
+
+    Returns:
+        list: 需要调用API的原因，空列表表示估算值足够
+    """
+    if estimate is None:
+        return ["地点无法离线定位"]
+    reasons = []
+    if item.get("deadline") or item.get("flight_time"):
+        reasons.append("有航班或截止时间")
+    hours = estimate["duration_hours"]
+    margin = hours * estimate["relative_error"]
+    for threshold in decision_hours:
+        if hours - margin < threshold <= hours + margin:
+            reasons.append(f"估算 {hours:.1f}±{margin:.1f} 小时跨过 {threshold} 小时")
+    return reasons
+
+
+def calibration_samples(itinerary, cache_file=RECONCILE_CACHE_FILE, estimator=None):
+    """
+    收集拟合样本：校正缓存中来自高德API的结果，以及行程中抄自高德地图显示的参考数据
+
+    Returns:
+        list: [(分区序号, 大圆距离公里, 道路距离公里, 小时)]，按大圆距离最长的路段归入分区
+    """
+    estimator = estimator or Estimator()
+    observations = []
+    for key, entry in load_cache(cache_file).items():
+        if not entry["source"].startswith("api"):
+            continue
+        origin, destination, waypoints, waypoint_coords = json.loads(key)[:4]
+        item = {"origin": origin, "destination": destination, "waypoints": waypoints,
+                "waypoint_coords": waypoint_coords}
+        observations.append((day_stops(item), entry["result"]["distance_km"], entry["result"]["duration_hours"]))
+    for item in itinerary:
+        if item.get("reference") == "amap":
+            observations.append((day_stops(item), item["estimated_distance"], item["estimated_time"]))
+
+    samples = []
+    for names, road_km, hours in observations:
+        points = estimator._locate(names)
+        if not points or not hours:
+            continue
+        start, end = np.array(points[:-1]), np.array(points[1:])
+        great_circle = haversine(start[:, 0], start[:, 1], end[:, 0], end[:, 1])
+        regions = estimator.region_index((start[:, 0] + end[:, 0]) / 2, (start[:, 1] + end[:, 1]) / 2)
+        if great_circle.sum() > 0:
+            samples.append((int(regions[great_circle.argmax()]), float(great_circle.sum()), road_km, hours))
+    return samples
+
+
+def fit(samples, estimator=None):
+    """
+    按分区拟合道路弯曲系数（距离加权）、平均车速和相对误差
+
+    Returns:
+        dict: {分区名称: 系数}，样本不足的分区不输出
+    """
+    estimator = estimator or Estimator()
+    names = [region[0] for region in estimator.regions] + ["默认"]
+    fitted = {}
+    for index, name in enumerate(names):
+        rows = np.array([sample[1:] for sample in samples if sample[0] == index])
+        if len(rows) < MIN_FIT_SAMPLES:
+            continue
+        great_circle, road_km, hours = rows.T
+        winding = road_km.sum() / great_circle.sum()
+        speed = road_km.sum() / hours.sum()
+        predicted = great_circle * winding / speed
+        fitted[name] = {
+            "winding": round(float(winding), 3),
+            "speed_kmh": round(float(speed), 1),
+            "relative_error": round(float(np.sqrt(np.mean((predicted / hours - 1) ** 2))), 3),
+            "samples": len(rows)
+        }
+    return fitted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线估算行车距离和时间")
+    parser.add_argument("origin", nargs="?", help="起点（地名或 \"经度,纬度\"）")
+    parser.add_argument("destination", nargs="?", help="终点")
+    parser.add_argument("--via", nargs="*", default=[], help="途经点")
+    parser.add_argument("--fit", action="store_true", help=f"用已缓存的高德结果拟合分区系数，写入 {ESTIMATE_MODEL_FILE}")
+    args = parser.parse_args(argv)
+
+    if args.fit:
+        from travel_analyzer import ITINERARY
+        samples = calibration_samples(ITINERARY)
+        fitted = fit(samples)
+        print(f"📐 拟合样本 {len(samples)} 个")
+        for name, params in fitted.items():
+            print(f"  {name}: 弯曲系数 {params['winding']}, 车速 {params['speed_kmh']} km/h, "
+                  f"相对误差 {params['relative_error']:.0%}（{params['samples']} 个样本）")
+        if not fitted:
+            print(f"  ⚠️  各分区样本都少于 {MIN_FIT_SAMPLES} 个，保留默认系数")
+            return 1
+        with open(ESTIMATE_MODEL_FILE, 'w', encoding='utf-8') as f:
+            json.dump({"regions": fitted}, f, ensure_ascii=False, indent=2)
+        print(f"✅ 已写入 {ESTIMATE_MODEL_FILE}")
+        return 0
+
+    if not (args.origin and args.destination):
+        parser.error("需要起点和终点，或使用 --fit")
+    result = get_estimator().route(args.origin, args.destination, args.via)
+    if result is None:
+        print("  ✗ 有地点不在离线地名库中")
+        return 1
+    print(f"  {result['distance_km']} km, {result['duration_hours']} 小时"
+          f"（±{result['relative_error']:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行程可行性本地服务
+常驻进程，在内存中保持地理编码和路段结果缓存，避免每次咨询都冷启动Python、
+重新调用高德API。已缓存路段的查询在事件循环内直接返回；未缓存的请求在短时间窗口内
+合并批量查询，相同的地点和路段只查询一次
+
+接口：
+    GET  /health                                   缓存规模和批量统计
+    GET  /metrics                                  Prometheus 文本格式的调用统计
+    GET  /leg?origin=A&destination=B&waypoints=C|D 单个路段
+    POST /legs         {"legs": [{"origin": ..., "destination": ..., "waypoints": [...]}]}
+    POST /analyze      行程JSON（格式同 ITINERARY，省略则使用默认行程），返回每日结果
+    POST /feasibility  同上，额外返回可行性评估（问题和建议）
+
+使用方法：
+    python feasibility_service.py --port 8790
+    curl 'http://127.0.0.1:8790/leg?origin=林芝八一镇&destination=拉萨市'
+    curl -X POST --data-binary @itinerary.json http://127.0.0.1:8790/feasibility
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+import travel_analyzer
+from api_metrics import METRICS
+from delay_simulation import DEFAULT_SEED, attach_delay_risk
+from gazetteer import get_gazetteer
+from reconciliation import is_coordinate
+from routing import backend_names
+
+BATCH_WINDOW_MS = 5      # 冷请求合并窗口
+MAX_CONCURRENCY = 4      # 每个API Key 同时进行的高德API请求数，避免触发QPS限制
+MAX_BODY_BYTES = 1024 * 1024
+SIMULATION_TRIALS = 20_000  # 服务中每次请求都要模拟，次数少一些以保持低延迟
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    """
+    请求参数错误，返回给客户端的状态码和信息
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def leg_key(origin, destination, waypoints=None):
+    return f"{origin}|{destination}|{'|'.join(waypoints or [])}"
+
+
+class Batcher:
+    """
+    合并短时间窗口内的冷请求：同一个键只查询一次（包括正在查询中的），
+    不同的键在线程池中并发查询，并发数受 max_concurrency 限制
+    """
+
+    def __init__(self, fetch, executor, window_ms=BATCH_WINDOW_MS, max_concurrency=MAX_CONCURRENCY):
+        self.fetch = fetch
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.pending = {}    # 键 -> (参数, future)，等待下一次批量查询
+        self.inflight = {}   # 键 -> future，正在查询
+        self.flush_handle = None
+        self.batches = 0
+        self.fetched = 0
+        self.coalesced = 0
+
+    def submit(self, key, *args):
+        """
+        提交一次查询
+
+        Returns:
+            asyncio.Future: 查询结果
+        """
+        if key in self.inflight:
+            self.coalesced += 1
+            return self.inflight[key]
+        if key in self.pending:
+            self.coalesced += 1
+            return self.pending[key][1]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending[key] = (args, future)
+        if self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self):
+        batch, self.pending, self.flush_handle = self.pending, {}, None
+        self.batches += 1
+        for key, (args, future) in batch.items():
+            self.inflight[key] = future
+            asyncio.ensure_future(self._run(key, args, future))
+
+    async def _run(self, key, args, future):
+        try:
+            async with self.semaphore:
+                self.fetched += 1
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, self.fetch, *args)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+        finally:
+            self.inflight.pop(key, None)
+
+    def stats(self):
+        return {"batches": self.batches, "fetched": self.fetched, "coalesced": self.coalesced}
+
+
+class FeasibilityService:
+    """
+    服务状态：地理编码缓存、路段缓存和两个批量查询器
+
+    必须在事件循环中创建。每日分析复用 travel_analyzer.analyze_day，
+    在单独的线程池中运行，通过 route_sync/geocode_sync 回到事件循环查询缓存
+    """
+
+    def __init__(self, window_ms=BATCH_WINDOW_MS, max_concurrency=MAX_CONCURRENCY, trials=SIMULATION_TRIALS,
+                 router=None):
+        self.loop = asyncio.get_running_loop()
+        self.trials = trials
+        self.backend = travel_analyzer.active_backend(router)
+        self.reconciler = travel_analyzer.reconciler_for(self.backend.name)
+        if self.backend.remote:
+            max_concurrency *= len(travel_analyzer.api_keys())  # 并发数按 Key 池中的 Key 数量增加
+        self.fetch_executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="amap")
+        self.day_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="day")
+        self.geocodes = {}   # 地点名称 -> 坐标
+        self.legs = {}       # leg_key -> 路线规划后端 route() 的返回值
+        self.geocoder = Batcher(self.backend.geocode, self.fetch_executor, window_ms, max_concurrency)
+        self.router = Batcher(self.backend.route, self.fetch_executor, window_ms, max_concurrency)
+
+    def close(self):
+        self.day_executor.shutdown(wait=False)
+        self.fetch_executor.shutdown(wait=False)
+
+    async def geocode(self, name):
+        if name in self.geocodes:
+            METRICS.observe_cache("service_geocode", True)
+            return self.geocodes[name]
+        METRICS.observe_cache("service_geocode", False)
+        coord = get_gazetteer().lookup(name)  # 离线地名库在事件循环内直接查询
+        if coord:
+            self.geocodes[name] = coord
+            return coord
+        coord = await self.geocoder.submit(name, name)
+        if coord:
+            self.geocodes[name] = coord
+        return coord
+
+    async def leg(self, origin, destination, waypoints=None):
+        """
+        查询一个路段
+
+        Returns:
+            tuple: (路段结果或None, 是否命中缓存)
+        """
+        key = leg_key(origin, destination, waypoints)
+        if key in self.legs:
+            METRICS.observe_cache("service_leg", True)
+            return self.legs[key], True
+        METRICS.observe_cache("service_leg", False)
+
+        names = [origin, destination] + list(waypoints or [])
+        coords = await asyncio.gather(*(self.geocode(name) for name in names))
+        coords = [coord or name for coord, name in zip(coords, names)]
+        # 按坐标合并：不同名称指向同一地点时只查询一次
+        result = await self.router.submit(leg_key(coords[0], coords[1], coords[2:]),
+                                          coords[0], coords[1], coords[2:] or None)
+        if result:
+            self.legs[key] = result
+        return result, False
+
+    def route_sync(self, origin, destination, waypoints=None):
+        return asyncio.run_coroutine_threadsafe(self.leg(origin, destination, waypoints), self.loop).result()[0]
+
+    def geocode_sync(self, name):
+        return asyncio.run_coroutine_threadsafe(self.geocode(name), self.loop).result()
+
+    def _analyze_day(self, item):
+        result, _ = travel_analyzer.analyze_day(item, route=self.route_sync, geocode=self.geocode_sync,
+                                                log=lambda *args: None, reconciler=self.reconciler,
+                                                backend=self.backend)
+        return result
+
+    async def analyze(self, itinerary, simulate=True):
+        """
+        并发分析所有天数，返回结果列表（格式同 analyze_itinerary），默认附带延误模拟指标
+        """
+        days = [self.loop.run_in_executor(self.day_executor, self._analyze_day, item) for item in itinerary]
+        results = list(await asyncio.gather(*days))
+        if simulate:
+            await self.loop.run_in_executor(self.day_executor, attach_delay_risk, results, itinerary,
+                                            self.trials, DEFAULT_SEED)
+        return results
+
+    def health(self):
+        return {
+            "status": "ok",
+            "router": self.backend.name,
+            "geocodes": len(self.geocodes),
+            "legs": len(self.legs),
+            "geocode_batches": self.geocoder.stats(),
+            "route_batches": self.router.stats(),
+            "caches": METRICS.snapshot()["caches"]
+        }
+
+
+def parse_itinerary(body):
+    """
+    解析请求体中的行程，支持行程列表或 {"itinerary": [...]}，为空时使用默认行程
+    """
+    if not body.strip():
+        return travel_analyzer.ITINERARY
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise RequestError(400, "请求体不是合法的JSON")
+    if isinstance(data, dict):
+        data = data.get("itinerary")
+    if not isinstance(data, list) or not data:
+        raise RequestError(400, "缺少行程数据")
+    required = ("day", "date", "weekday", "route", "origin", "destination",
+                "estimated_distance", "estimated_time", "activities", "accommodation")
+    for index, item in enumerate(data, 1):
+        if not isinstance(item, dict):
+            raise RequestError(400, f"第 {index} 天应为对象")
+        missing = [field for field in required if field not in item]
+        if missing:
+            raise RequestError(400, f"Day {item.get('day', '?')} 缺少字段: {', '.join(missing)}")
+        label = f"Day {item['day']}"
+        for field in ("estimated_distance", "estimated_time"):
+            if isinstance(item[field], bool) or not isinstance(item[field], (int, float)):
+                raise RequestError(400, f"{label} 的 {field} 应为数字")
+            if item[field] <= 0:
+                raise RequestError(400, f"{label} 的 {field} 应大于0")
+        for field in ("origin", "destination"):
+            if not isinstance(item[field], str) or not item[field]:
+                raise RequestError(400, f"{label} 的 {field} 应为地点名称或坐标")
+        waypoints = item.get("waypoints")
+        if waypoints is not None and (not isinstance(waypoints, list)
+                                      or not all(isinstance(wp, str) and wp for wp in waypoints)):
+            raise RequestError(400, f"{label} 的 waypoints 应为地点列表")
+        coords = item.get("waypoint_coords")
+        if coords is not None and (not isinstance(coords, list)
+                                   or not all(isinstance(c, str) and is_coordinate(c) for c in coords)):
+            raise RequestError(400, f"{label} 的 waypoint_coords 应为 \"经度,纬度\" 坐标列表")
+        try:
+            date.fromisoformat(str(item["date"]))
+        except ValueError:
+            raise RequestError(400, f"{label} 的日期应为 YYYY-MM-DD")
+    return data
+
+
+def split_waypoints(value):
+    if isinstance(value, list):
+        return value
+    return [wp for wp in (value or "").split('|') if wp]
+
+
+async def dispatch(service, method, target, body):
+    """
+    处理一次请求
+
+    Returns:
+        tuple: (HTTP状态码, 响应对象)，响应对象为 str 时按纯文本返回
+    """
+    parts = urlsplit(target)
+    path = parts.path.rstrip('/') or '/'
+    allowed = {"/health": "GET", "/metrics": "GET", "/leg": "GET",
+               "/legs": "POST", "/analyze": "POST", "/feasibility": "POST"}
+    if path not in allowed:
+        raise RequestError(404, f"未知接口: {path}")
+    if method != allowed[path]:
+        raise RequestError(405, f"{path} 只支持 {allowed[path]}")
+
+    if path == "/health":
+        return 200, service.health()
+    if path == "/metrics":
+        return 200, METRICS.to_prometheus()
+
+    if path == "/leg":
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if not params.get("origin") or not params.get("destination"):
+            raise RequestError(400, "缺少 origin 或 destination 参数")
+        result, cached = await service.leg(params["origin"], params["destination"],
+                                           split_waypoints(params.get("waypoints")))
+        return 200, {"leg": result, "cached": cached}
+
+    if path == "/legs":
+        try:
+            legs = json.loads(body or b"{}").get("legs")
+        except (ValueError, AttributeError):
+            raise RequestError(400, "请求体应为 {\"legs\": [...]}")
+        if not isinstance(legs, list):
+            raise RequestError(400, "请求体应为 {\"legs\": [...]}")
+        for leg in legs:
+            if not isinstance(leg, dict) or not leg.get("origin") or not leg.get("destination"):
+                raise RequestError(400, "每个路段都需要 origin 和 destination")
+        found = await asyncio.gather(*(service.leg(leg["origin"], leg["destination"],
+                                                   split_waypoints(leg.get("waypoints")))
+                                       for leg in legs))
+        return 200, {"legs": [{"leg": result, "cached": cached} for result, cached in found]}
+
+    itinerary = parse_itinerary(body.decode('utf-8'))
+    results = await service.analyze(itinerary)
+    if path == "/analyze":
+        return 200, {"results": results}
+    return 200, {"results": results, "feasibility": travel_analyzer.assess_feasibility(results)}
+
+
+async def handle_connection(service, reader, writer):
+    """
+    HTTP/1.1 连接处理，支持 keep-alive 以降低重复查询的延迟
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            # 按字节拆分：浏览器和curl可能直接发送未转义的UTF-8地名
+            method, target, version = (part.decode('utf-8', 'replace') for part in request_line.split())
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            start = time.perf_counter()
+            length = int(headers.get('content-length') or 0)
+            try:
+                if length > MAX_BODY_BYTES:
+                    raise RequestError(413, "请求体过大")
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await dispatch(service, method, target, body)
+            except RequestError as e:
+                status, payload = e.status, {"error": str(e)}
+            except Exception as e:
+                status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+            if isinstance(payload, str):
+                data = payload.encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            else:
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                content_type = 'application/json; charset=utf-8'
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+            await writer.drain()
+            endpoint = urlsplit(target).path.strip('/').replace('/', '_') or 'root'
+            METRICS.observe_request(f"service_{endpoint}", time.perf_counter() - start, status=status)
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, warm=True, warm_files=(), window_ms=BATCH_WINDOW_MS, max_concurrency=MAX_CONCURRENCY,
+                trials=SIMULATION_TRIALS, router=None):
+    service = FeasibilityService(window_ms, max_concurrency, trials, router)
+    if warm:
+        itineraries = [travel_analyzer.ITINERARY]
+        for path in warm_files:
+            with open(path, 'r', encoding='utf-8') as f:
+                itineraries.append(parse_itinerary(f.read()))
+        start = time.perf_counter()
+        for itinerary in itineraries:
+            await service.analyze(itinerary, simulate=False)
+        print(f"🔥 缓存预热完成: {len(service.geocodes)} 个地点, {len(service.legs)} 个路段, "
+              f"耗时 {time.perf_counter() - start:.2f} 秒")
+
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f"🚦 行程可行性服务已启动: http://{host}:{port}")
+    print("按 Ctrl+C 停止")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="行程可行性本地服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--no-warm", action="store_true", help="启动时不预热默认行程的路段缓存")
+    parser.add_argument("--warm", nargs="*", default=[], metavar="ITINERARY.json",
+                        help="额外预热的行程JSON文件")
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW_MS,
+                        help="冷请求合并窗口（毫秒）")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="每个API Key 同时进行的高德API请求数")
+    parser.add_argument("--trials", type=int, default=SIMULATION_TRIALS, help="每次请求的延误模拟试验次数")
+    parser.add_argument("--router", choices=backend_names(), default=travel_analyzer.ROUTING_BACKEND,
+                        help="路线规划后端：amap（高德地图API）或 local（本地路网）")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, warm=not args.no_warm, warm_files=args.warm,
+                          window_ms=args.batch_window, max_concurrency=args.max_concurrency,
+                          trials=args.trials, router=args.router))
+    except KeyboardInterrupt:
+        print()
+        METRICS.print_summary()
+
+
+if __name__ == "__main__":
+    main()
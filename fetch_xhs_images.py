@@ -4,13 +4,19 @@
 小红书图片获取工具 - 使用第三方API服务
 """
 
+import argparse
 import requests
 import json
 import re
-import time
+import sys
 from urllib.parse import quote
 import os
 
+from api_metrics import METRICS, instrumented_get, timed_sleep
+from html_patcher import patch_html_file
+from image_validator import filter_valid_images
+from profiling import Profiler, add_profile_arguments, profiler_from_args
+
 # 使用第三方API服务获取小红书图片
 # 注意：这些API可能需要付费或有限制，请根据实际情况调整
 
@@ -31,7 +37,7 @@ class XHSImageFetcher:
         # 方法1: 使用小红书搜索页面的图片（需要解析HTML）
         try:
             search_url = f"https://www.xiaohongshu.com/search_result?keyword={quote(keyword)}"
-            response = self.session.get(search_url, timeout=10)
+            response = instrumented_get("xhs_search_page", self.session.get, search_url, timeout=10)
             
             if response.status_code == 200:
                 # 从HTML中提取图片URL
@@ -95,13 +101,16 @@ class XHSImageFetcher:
             for keyword in keywords:
                 images = self.get_images_from_api(keyword, max_images=3)
                 all_images.extend(images)
-                time.sleep(1)
+                timed_sleep(1, "xhs_throttle")
             
-            # 去重并限制为5张
-            results[attraction] = list(dict.fromkeys(all_images))[:5]
-            print(f"  获取到 {len(results[attraction])} 张图片")
+            results[attraction] = all_images
+            print(f"  获取到 {len(all_images)} 张图片")
         
-        return results
+        # 去重和占位图依赖 Pillow，用到时才导入，没有安装 Pillow 时手动配置流程仍可使用
+        from image_dedup import dedupe_images
+
+        # 跨景点、跨关键词去重（同一照片的不同域名和尺寸只保留一张），并限制为5张
+        return dedupe_images(results, max_images=5)
 
 
 def update_html_file(html_file, images_dict):
@@ -109,50 +118,58 @@ def update_html_file(html_file, images_dict):
     更新HTML文件中的图片
     由于小红书图片有防盗链，使用图片代理服务
     """
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
     # 图片代理服务（避免防盗链）
     proxy_services = [
         "https://images.weserv.nl/?url=",  # weserv.nl
         "https://api.52vmy.cn/api/img?url=",  # 备用代理
     ]
     
+    from image_placeholders import build_image_metas, placeholder_attrs
+
+    # 预先并发获取所有图片的原始尺寸和模糊占位图
+    metas = build_image_metas([
+        proxy_services[0] + quote(img_url, safe='')
+        for images in images_dict.values()
+        for img_url in images[:5]
+    ])
+    
+    galleries = {}
     for attraction, images in images_dict.items():
         if not images:
             continue
         
-        # 查找图片区域
-        # 匹配模式：找到景点标题后的第一个image-slider
-        pattern = rf'(<h4>.*?{re.escape(attraction)}.*?</h4>.*?<div class="image-slider">)(.*?)(</div>)'
-        
-        def replace_images(match):
-            header = match.group(1)
-            old_content = match.group(2)
-            footer = match.group(3)
-            
-            # 构建新的图片HTML
-            new_images = []
-            for i, img_url in enumerate(images[:5], 1):
-                # 使用代理服务
-                proxy_url = proxy_services[0] + quote(img_url, safe='')
-                xhs_keyword = quote(f"{attraction} 冬季", safe='')
-                new_images.append(f'''
-                                    <div class="image-item" data-label="冬季实景" onclick="window.open('https://www.xiaohongshu.com/search_result?keyword={xhs_keyword}', '_blank')">
-                                        <img src="{proxy_url}" alt="{attraction}冬季{i}" loading="lazy" onerror="this.onerror=null; this.src='https://via.placeholder.com/800x600/667eea/ffffff?text=图片加载失败，点击查看小红书'">
+        # 构建新的图片HTML
+        new_images = []
+        for i, img_url in enumerate(images[:5], 1):
+            # 使用代理服务
+            proxy_url = proxy_services[0] + quote(img_url, safe='')
+            xhs_keyword = quote(f"{attraction} 冬季", safe='')
+            new_images.append(f'''                                    <div class="image-item" data-label="冬季实景" onclick="window.open('https://www.xiaohongshu.com/search_result?keyword={xhs_keyword}', '_blank')">
+                                        <img src="{proxy_url}" alt="{attraction}冬季{i}" loading="lazy"{placeholder_attrs(metas.get(proxy_url))} onerror="this.onerror=null; this.src='https://via.placeholder.com/800x600/667eea/ffffff?text=图片加载失败，点击查看小红书'">
                                     </div>''')
-            
-            return header + '\n'.join(new_images) + footer
         
-        content = re.sub(pattern, replace_images, content, flags=re.DOTALL)
+        galleries[attraction] = '\n'.join(new_images)
+    
+    # 一次扫描页面，替换所有景点的图片区域并保存文件
+    updated = patch_html_file(html_file, galleries)
+    for attraction in updated:
         print(f"已更新 {attraction} 的图片")
     
-    # 保存文件
-    with open(html_file, 'w', encoding='utf-8') as f:
-        f.write(content)
     print("\nHTML文件已更新！")
 
 
+def validate_images(images_dict):
+    """
+    剔除失效图片；配置了图片但全部检查失败的景点单独提示并移除，保持页面上原有的图片
+    """
+    filtered = filter_valid_images(images_dict)
+    for attraction, images in images_dict.items():
+        if not filtered.get(attraction) and any(images):
+            print(f"  ❌ {attraction}: 所有图片均无效，保持原有图片")
+            filtered.pop(attraction, None)
+    return filtered
+
+
 def manual_image_input():
     """
     手动输入图片URL的方法
@@ -191,7 +208,15 @@ def manual_image_input():
     print("请编辑此文件，填入实际的图片URL，然后重新运行脚本")
 
 
-if __name__ == "__main__":
+def main(profiler=None):
+    """
+    主函数
+    
+    Args:
+        profiler: profiling.Profiler，启用时按阶段剖析（可选）
+    """
+    profiler = profiler or Profiler("fetch_xhs_images")
+    
     print("=" * 60)
     print("小红书图片获取工具")
     print("=" * 60)
@@ -205,15 +230,19 @@ if __name__ == "__main__":
         with open(config_file, 'r', encoding='utf-8') as f:
             images_dict = json.load(f)
         
-        # 更新HTML
-        update_html_file(html_file, images_dict)
+        # 剔除失效图片后更新HTML
+        with profiler.phase("validate"):
+            images_dict = validate_images(images_dict)
+        with profiler.phase("update"):
+            update_html_file(html_file, images_dict)
     else:
         print("\n未找到配置文件，尝试自动获取...")
         print("注意：由于小红书反爬虫机制，自动获取可能失败")
         print("建议使用手动配置方法（见下方）\n")
         
         fetcher = XHSImageFetcher()
-        images_dict = fetcher.fetch_all_images()
+        with profiler.phase("fetch"):
+            images_dict = fetcher.fetch_all_images()
         
         # 保存结果
         output_file = "xhs_images_auto.json"
@@ -221,9 +250,24 @@ if __name__ == "__main__":
             json.dump(images_dict, f, ensure_ascii=False, indent=2)
         print(f"\n自动获取结果已保存到 {output_file}")
         
-        # 如果获取到图片，更新HTML
+        # 如果获取到可用图片，更新HTML
+        with profiler.phase("validate"):
+            images_dict = validate_images(images_dict)
         if any(images_dict.values()):
-            update_html_file(html_file, images_dict)
+            with profiler.phase("update"):
+                update_html_file(html_file, images_dict)
         else:
             print("\n自动获取失败，请使用手动方法")
             manual_image_input()
+    
+    # 请求统计
+    METRICS.print_summary()
+    METRICS.write_reports()
+    profiler.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="小红书图片获取工具")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    sys.exit(main(profiler_from_args(args, "fetch_xhs_images")))
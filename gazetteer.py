@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线地名库
+从随项目附带的 gazetteer.json 建立索引，地理编码先查本地，命中时不需要请求高德API：
+- 文本索引：名称和别名归一化后精确匹配，其次是唯一的前缀匹配，最后按字符二元组做模糊匹配
+  （可以识别 "纳木错"/"纳木措"、"羊湖"、省略 "景区" 等写法）
+- 空间索引：坐标转换为单位球面上的三维点建立 KD 树，用于查询最近地点和一定半径内的地点
+
+使用方法：
+    python gazetteer.py 羊湖 纳木错
+    python gazetteer.py --near 91.13,29.66 --radius 50
+"""
+
+import argparse
+import bisect
+import json
+import math
+import os
+import re
+from difflib import SequenceMatcher
+
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.json")
+EARTH_RADIUS_KM = 6371.0
+
+FUZZY_THRESHOLD = 0.8   # 模糊匹配的最低相似度，过低容易把不同地点混在一起
+
+# 归一化时去掉的省份前缀和统一的异体写法
+REGION_PREFIXES = ("西藏自治区", "新疆维吾尔自治区", "西藏", "新疆")
+CHAR_VARIANTS = str.maketrans({"错": "措"})
+# 另外按去掉后缀的名称建立索引，"纳木措" 可以匹配到 "纳木措国家风景区"
+NAME_SUFFIXES = ("国家风景区", "风景区", "景区", "观景台", "县城")
+PUNCTUATION = re.compile(r"[\s·•,，.。()（）\-]+")
+
+
+def normalize(name):
+    """
+    地名归一化：去掉空白、标点和省份前缀，统一异体字
+    """
+    name = PUNCTUATION.sub("", str(name)).translate(CHAR_VARIANTS)
+    for prefix in REGION_PREFIXES:
+        if name.startswith(prefix) and len(name) > len(prefix):
+            name = name[len(prefix):]
+            break
+    return name
+
+
+def strip_suffix(name):
+    for suffix in NAME_SUFFIXES:
+        if name.endswith(suffix) and len(name) > len(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+
+def to_xyz(location):
+    """
+    "经度,纬度" -> 单位球面上的三维坐标（弦长与大圆距离单调对应）
+    """
+    lng, lat = map(math.radians, map(float, location.split(',')))
+    return (math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+
+class KDTree:
+    """
+    三维点的静态 KD 树，节点为 (点, 地点索引, 分割轴, 左子树, 右子树)
+    """
+
+    def __init__(self, points):
+        self.root = self._build(list(points), 0)
+
+    def _build(self, items, depth):
+        if not items:
+            return None
+        axis = depth % 3
+        items.sort(key=lambda item: item[0][axis])
+        mid = len(items) // 2
+        point, index = items[mid]
+        return (point, index, axis,
+                self._build(items[:mid], depth + 1), self._build(items[mid + 1:], depth + 1))
+
+    def nearest(self, target, k=1):
+        """
+        Returns:
+            list: [(弦长, 地点索引)]，按距离从近到远
+        """
+        best = []
+
+        def visit(node):
+            if node is None:
+                return
+            point, index, axis, left, right = node
+            dist = math.dist(point, target)
+            if len(best) < k or dist < best[-1][0]:
+                bisect.insort(best, (dist, index))
+                del best[k:]
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(best) < k or abs(diff) < best[-1][0]:
+                visit(far)
+
+        visit(self.root)
+        return best
+
+    def within(self, target, radius):
+        found = []
+
+        def visit(node):
+            if node is None:
+                return
+            point, index, axis, left, right = node
+            dist = math.dist(point, target)
+            if dist <= radius:
+                found.append((dist, index))
+            diff = target[axis] - point[axis]
+            if diff - radius <= 0:
+                visit(left)
+            if diff + radius >= 0:
+                visit(right)
+
+        visit(self.root)
+        return sorted(found)
+
+
+class Gazetteer:
+    """
+    地名库及其文本、空间索引
+    """
+
+    def __init__(self, places):
+        self.places = places
+        self.exact = {}
+        # 优先级：名称 > 别名 > 去掉后缀的名称和别名，同一个键先到先得
+        name_keys = [[normalize(place["name"])] for place in places]
+        alias_keys = [[normalize(alias) for alias in place.get("aliases", [])] for place in places]
+        stripped_keys = [[strip_suffix(key) for key in names + aliases]
+                         for names, aliases in zip(name_keys, alias_keys)]
+        for tier in (name_keys, alias_keys, stripped_keys):
+            for index, keys in enumerate(tier):
+                for key in keys:
+                    self.exact.setdefault(key, index)
+
+        self.sorted_keys = sorted(self.exact)
+        self.grams = {}
+        for key, index in self.exact.items():
+            for gram in bigrams(key):
+                self.grams.setdefault(gram, set()).add(key)
+        self.tree = KDTree((to_xyz(place["location"]), index) for index, place in enumerate(places))
+
+    @classmethod
+    def load(cls, path=GAZETTEER_FILE):
+        """
+        读取地名库文件，文件不存在时提示并返回空库
+        """
+        if not os.path.exists(path):
+            print(f"⚠️  地名库文件不存在: {path}，地点只能通过API地理编码")
+            return cls([])
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f).get("places", []))
+
+    def __len__(self):
+        return len(self.places)
+
+    def prefix(self, text):
+        """
+        返回名称或别名以 text 开头的地点（去重，按名称排序）
+        """
+        key = normalize(text)
+        start = bisect.bisect_left(self.sorted_keys, key)
+        indexes = set()
+        for candidate in self.sorted_keys[start:]:
+            if not candidate.startswith(key):
+                break
+            indexes.add(self.exact[candidate])
+        return [self.places[i] for i in sorted(indexes)]
+
+    def fuzzy(self, text, threshold=FUZZY_THRESHOLD):
+        """
+        模糊匹配，返回 (地点, 相似度)；没有足够相似的地点或最相似的不止一个时返回 (None, 相似度)
+        """
+        key = normalize(text)
+        candidates = set()
+        for gram in bigrams(key):
+            candidates |= self.grams.get(gram, set())
+        scored = sorted(((SequenceMatcher(None, key, c).ratio(), self.exact[c]) for c in candidates), reverse=True)
+        if not scored or scored[0][0] < threshold:
+            return None, scored[0][0] if scored else 0.0
+        best, index = scored[0]
+        if any(score == best and other != index for score, other in scored[1:]):
+            return None, best
+        return self.places[index], best
+
+    def find(self, name):
+        """
+        按名称查找地点：精确（含别名、去后缀）> 唯一前缀 > 模糊
+
+        Returns:
+            dict: 地点，找不到时返回 None
+        """
+        key = normalize(name)
+        index = self.exact.get(key)
+        if index is None:
+            index = self.exact.get(strip_suffix(key))
+        if index is not None:
+            return self.places[index]
+        matches = self.prefix(key) if len(key) >= 2 else []
+        if matches:
+            # 多个地点共用前缀时无法确定是哪一个，交给高德API
+            return matches[0] if len(matches) == 1 else None
+        place, _ = self.fuzzy(key)
+        return place
+
+    def lookup(self, name):
+        """
+        地理编码：返回 "经度,纬度"，找不到时返回 None
+        """
+        place = self.find(name)
+        return place["location"] if place else None
+
+    def get(self, name, default=None):
+        # 兼容按 dict 使用的地方（例如 delay_simulation 的 coords 参数）
+        return self.lookup(name) or default
+
+    def nearest(self, location, k=1):
+        """
+        返回离坐标最近的 k 个地点，[(地点, 距离公里)]
+        """
+        if not self.places:
+            return []
+        return [(self.places[i], chord_to_km(d)) for d, i in self.tree.nearest(to_xyz(location), k)]
+
+    def within(self, location, radius_km):
+        """
+        返回半径内的地点，[(地点, 距离公里)]，按距离排序
+        """
+        if not self.places:
+            return []
+        return [(self.places[i], chord_to_km(d)) for d, i in self.tree.within(to_xyz(location), km_to_chord(radius_km))]
+
+
+_GAZETTEER = None
+
+
+def get_gazetteer():
+    """
+    第一次使用时才读取地名库并建立索引
+    """
+    global _GAZETTEER
+    if _GAZETTEER is None:
+        _GAZETTEER = Gazetteer.load()
+    return _GAZETTEER
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询离线地名库")
+    parser.add_argument("names", nargs="*", help="要查询的地名")
+    parser.add_argument("--near", help="按坐标查询附近地点，格式 \"经度,纬度\"")
+    parser.add_argument("--radius", type=float, help="查询半径（公里），省略时只返回最近的5个地点")
+    args = parser.parse_args(argv)
+
+    gazetteer = get_gazetteer()
+    print(f"📍 地名库共 {len(gazetteer)} 个地点")
+    for name in args.names:
+        place = gazetteer.find(name)
+        if place:
+            print(f"  ✓ {name} -> {place['name']} ({place['location']}, {place['source']})")
+        else:
+            prefixed = "、".join(p["name"] for p in gazetteer.prefix(name)[:5])
+            print(f"  ✗ {name} 未找到" + (f"，候选: {prefixed}" if prefixed else ""))
+    if args.near:
+        if args.radius:
+            nearby = gazetteer.within(args.near, args.radius)
+        else:
+            nearby = gazetteer.nearest(args.near, 5)
+        for place, km in nearby:
+            print(f"  {km:7.1f} km  {place['name']} ({place['region']})")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -4,55 +4,106 @@
 生成HTML静态展示页面
 """
 
+import argparse
 import json
 import sys
 import os
 
 # 导入分析模块
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from travel_analyzer import analyze_itinerary
+from travel_analyzer import ITINERARY, analyze_itinerary, with_flight_time
+from closures import attach_closures
+from delay_simulation import attach_delay_risk
+from elevation import attach_elevation
+from route_map import MAP_STYLE, attach_route_maps, map_head, map_section
+from stop_finder import MAX_DRIVE_HOURS, format_split, split_long_days
+from risk_scoring import LEVEL_LABELS, score_results
+from profiling import Profiler, add_profile_arguments, profiler_from_args
+from tracing import span, export_if_enabled
 
-# 直接调用分析函数获取数据
-print("正在分析行程数据...")
-itinerary_data = analyze_itinerary()
 
-# 计算汇总统计
-summary_data = {
-    '总天数': len(itinerary_data),
-    '总估算距离(km)': sum(item['估算距离(km)'] for item in itinerary_data),
-    '总实际距离(km)': sum(item['实际距离(km)'] for item in itinerary_data),
-    '总估算时间(小时)': sum(item['估算时间(小时)'] for item in itinerary_data),
-    '总实际时间(小时)': sum(item['实际时间(小时)'] for item in itinerary_data),
-    '平均每日距离(km)': round(sum(item['实际距离(km)'] for item in itinerary_data) / len(itinerary_data), 1),
-    '平均每日时间(小时)': round(sum(item['实际时间(小时)'] for item in itinerary_data) / len(itinerary_data), 1),
-    '最长单日距离(km)': max(item['实际距离(km)'] for item in itinerary_data),
-    '最长单日时间(小时)': max(item['实际时间(小时)'] for item in itinerary_data),
-    '最短单日距离(km)': min(item['实际距离(km)'] for item in itinerary_data),
-    '最短单日时间(小时)': min(item['实际时间(小时)'] for item in itinerary_data)
+# 风险等级对应的图表颜色（与 .risk-high/.risk-medium/.risk-low 一致）
+RISK_COLORS = {
+    'high': 'rgba(255, 107, 107, 0.85)',
+    'medium': 'rgba(255, 217, 61, 0.85)',
+    'low': 'rgba(107, 207, 127, 0.85)'
 }
 
-# 准备图表数据
-days = [f"Day {i+1}" for i in range(len(itinerary_data))]
-distances = [item['实际距离(km)'] for item in itinerary_data]
-times = [item['实际时间(小时)'] for item in itinerary_data]
-estimated_times = [item['估算时间(小时)'] for item in itinerary_data]
-estimated_distances = [item['估算距离(km)'] for item in itinerary_data]
 
-# 转换为JSON字符串（用于JavaScript）
-days_json_str = json.dumps(days, ensure_ascii=False)
-distances_json_str = json.dumps(distances, ensure_ascii=False)
-times_json_str = json.dumps(times, ensure_ascii=False)
-estimated_times_json_str = json.dumps(estimated_times, ensure_ascii=False)
-estimated_distances_json_str = json.dumps(estimated_distances, ensure_ascii=False)
+def risk_badge_html(risk):
+    icon = '✓' if risk['level'] == 'low' else '⚠️'
+    return (f'<span class="risk-badge risk-{risk["level"]}" title="风险评分 {risk["score"]:.0f}/100">'
+            f'{icon} {LEVEL_LABELS[risk["level"]]} {risk["score"]:.0f}</span>')
 
-# 生成HTML
-html_content = f"""<!DOCTYPE html>
+
+def build_summary(itinerary_data):
+    """
+    计算汇总统计
+    """
+    summary_data = {
+        '总天数': len(itinerary_data),
+        '总估算距离(km)': sum(item['估算距离(km)'] for item in itinerary_data),
+        '总实际距离(km)': sum(item['实际距离(km)'] for item in itinerary_data),
+        '总估算时间(小时)': sum(item['估算时间(小时)'] for item in itinerary_data),
+        '总实际时间(小时)': sum(item['实际时间(小时)'] for item in itinerary_data),
+        '平均每日距离(km)': round(sum(item['实际距离(km)'] for item in itinerary_data) / len(itinerary_data), 1),
+        '平均每日时间(小时)': round(sum(item['实际时间(小时)'] for item in itinerary_data) / len(itinerary_data), 1),
+        '最长单日距离(km)': max(item['实际距离(km)'] for item in itinerary_data),
+        '最长单日时间(小时)': max(item['实际时间(小时)'] for item in itinerary_data),
+        '最短单日距离(km)': min(item['实际距离(km)'] for item in itinerary_data),
+        '最短单日时间(小时)': min(item['实际时间(小时)'] for item in itinerary_data)
+    }
+    return summary_data
+
+
+def generate_html(itinerary_data):
+    """
+    根据分析结果生成HTML报告内容
+    
+    Args:
+        itinerary_data: analyze_itinerary() 的返回值
+    
+    Returns:
+        str: 完整的HTML页面
+    """
+    summary_data = build_summary(itinerary_data)
+    risk_scores = score_results(itinerary_data)
+    simulated = all('P90时间(小时)' in item for item in itinerary_data)
+    simulation_header = """
+                            <th>延误模拟</th>""" if simulated else ""
+    routes_section = map_section(itinerary_data)
+    routes_head = map_head() if routes_section else ""
+    routes_style = MAP_STYLE if routes_section else ""
+    profiled = any('最高海拔(m)' in item for item in itinerary_data)
+    altitude_header = """
+                            <th>海拔</th>""" if profiled else ""
+
+    # 准备图表数据
+    days = [f"Day {i+1}" for i in range(len(itinerary_data))]
+    distances = [item['实际距离(km)'] for item in itinerary_data]
+    times = [item['实际时间(小时)'] for item in itinerary_data]
+    estimated_times = [item['估算时间(小时)'] for item in itinerary_data]
+    estimated_distances = [item['估算距离(km)'] for item in itinerary_data]
+    scores = [risk['score'] for risk in risk_scores]
+    risk_colors = [RISK_COLORS[risk['level']] for risk in risk_scores]
+
+    # 转换为JSON字符串（用于JavaScript）
+    days_json_str = json.dumps(days, ensure_ascii=False)
+    distances_json_str = json.dumps(distances, ensure_ascii=False)
+    times_json_str = json.dumps(times, ensure_ascii=False)
+    estimated_times_json_str = json.dumps(estimated_times, ensure_ascii=False)
+    estimated_distances_json_str = json.dumps(estimated_distances, ensure_ascii=False)
+    risk_scores_json_str = json.dumps(scores)
+    risk_colors_json_str = json.dumps(risk_colors)
+
+    # 生成HTML
+    html_content = f"""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>西藏9日冬季探险环线 - 行程分析报告</title>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js"></script>
+    <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js"></script>{routes_head}
     <style>
         * {{
             margin: 0;
@@ -290,7 +341,7 @@ html_content = f"""<!DOCTYPE html>
                 padding: 10px;
             }}
         }}
-    </style>
+{routes_style}    </style>
 </head>
 <body>
     <div class="container">
@@ -339,6 +390,7 @@ html_content = f"""<!DOCTYPE html>
                 </div>
             </div>
             
+{routes_section}
             <!-- 每日行程详情 -->
             <div class="section">
                 <h2 class="section-title">🗺️ 每日行程详情</h2>
@@ -352,27 +404,42 @@ html_content = f"""<!DOCTYPE html>
                             <th>时间差异</th>
                             <th>活动安排</th>
                             <th>住宿</th>
-                            <th>风险提示</th>
+                            <th>风险提示</th>{simulation_header}{altitude_header}
                         </tr>
                     </thead>
                     <tbody>
 """
 
-# 添加每日行程数据
-for item in itinerary_data:
-    time_diff = item['时间差异(小时)']
-    time_diff_class = 'difference-positive' if time_diff <= 0 else 'difference-negative'
-    time_diff_str = f"{time_diff:+.1f}" if time_diff != 0 else "0"
+    # 添加每日行程数据
+    for item, risk in zip(itinerary_data, risk_scores):
+        time_diff = item['时间差异(小时)']
+        time_diff_class = 'difference-positive' if time_diff <= 0 else 'difference-negative'
+        time_diff_str = f"{time_diff:+.1f}" if time_diff != 0 else "0"
     
-    risk_badge = ""
-    risk_text = item.get('风险提示', '') or ''
-    if risk_text and isinstance(risk_text, str):
-        if '误机' in risk_text or '通行风险' in risk_text or '超长' in risk_text or '15' in risk_text:
-            risk_badge = f'<span class="risk-badge risk-high">⚠️ 高风险</span>'
-        else:
-            risk_badge = f'<span class="risk-badge risk-medium">⚠️ 注意</span>'
+        risk_text = item.get('风险提示', '') or ''
+        risk_badge = risk_badge_html(risk)
     
-    html_content += f"""
+        simulation_cell = ""
+        if simulated:
+            simulation_text = (f"P90 {item['P90时间(小时)']:.1f} 小时<br>"
+                               f"<small>天黑后到达 {item['天黑后到达概率']:.0%}（日落 {item['日落时间']}）</small>")
+            if item['误机概率'] is not None:
+                simulation_text += f"<br><small>{item['截止时间']} 前未到达 {item['误机概率']:.0%}</small>"
+            simulation_cell = f"""
+                            <td>{simulation_text}</td>"""
+    
+        altitude_cell = ""
+        if profiled:
+            altitude_text = "无 DEM 数据"
+            if '最高海拔(m)' in item:
+                altitude_text = (f"最高 {item['最高海拔(m)']} 米<br>"
+                                 f"<small>4500米以上 {item['4500米以上时间(小时)']:.1f} 小时</small>")
+                if item['住宿海拔(m)'] is not None:
+                    altitude_text += f"<br><small>住宿 {item['住宿海拔(m)']} 米</small>"
+            altitude_cell = f"""
+                            <td>{altitude_text}</td>"""
+    
+        html_content += f"""
                         <tr>
                             <td><strong>{item['日期']}</strong><br><small>{item['星期']}</small></td>
                             <td>{item['行程']}</td>
@@ -381,11 +448,11 @@ for item in itinerary_data:
                             <td class="{time_diff_class}">{time_diff_str} 小时</td>
                             <td>{item['活动安排']}</td>
                             <td>{item['住宿']}</td>
-                            <td>{risk_text} {risk_badge}</td>
+                            <td>{risk_text} {risk_badge}</td>{simulation_cell}{altitude_cell}
                         </tr>
     """
 
-html_content += """
+    html_content += """
                     </tbody>
                 </table>
             </div>
@@ -396,19 +463,57 @@ html_content += """
                 <div class="recommendations">
 """
 
-# 添加风险分析
-risk_items = [item for item in itinerary_data if item.get('风险提示') and isinstance(item.get('风险提示'), str) and item['风险提示'].strip()]
-for item in risk_items:
-    html_content += f"""
-                    <div class="recommendation-item important">
-                        <div class="recommendation-title">Day {itinerary_data.index(item)+1} ({item['日期']} {item['星期']})</div>
+    # 添加风险分析：列出评分达到"注意"及以上的天
+    for day, (item, risk) in enumerate(zip(itinerary_data, risk_scores), 1):
+        if risk['level'] == 'low':
+            continue
+        risk_text = item.get('风险提示') if isinstance(item.get('风险提示'), str) else ''
+        factors = '、'.join(risk['factors']) or '综合因素'
+        risk_line = f"""
+                        <div><strong>风险:</strong> {risk_text}</div>""" if risk_text.strip() else ""
+        html_content += f"""
+                    <div class="recommendation-item {'important' if risk['level'] == 'high' else 'strong'}">
+                        <div class="recommendation-title">Day {day} ({item['日期']} {item['星期']}) {risk_badge_html(risk)}</div>
                         <div><strong>行程:</strong> {item['行程']}</div>
                         <div><strong>实际时间:</strong> {item['实际时间(小时)']:.1f} 小时</div>
-                        <div><strong>风险:</strong> {item['风险提示']}</div>
+                        <div><strong>主要因素:</strong> {factors}</div>{risk_line}
                     </div>
     """
 
-html_content += """
+    # 行车时间最长的一天，没有模拟结果或拆分方案时据此给出建议
+    longest_day, longest = max(enumerate(itinerary_data, 1), key=lambda pair: pair[1]['实际时间(小时)'])
+    longest_hours = longest['实际时间(小时)']
+
+    if simulated:
+        # 按模拟出的误机概率和P90缓冲时间给出建议
+        miss_days = [(i + 1, item) for i, item in enumerate(itinerary_data) if item['误机概率'] is not None]
+        miss_text = "，".join(f"Day {day}按当前安排有 {item['误机概率']:.0%} 的概率赶不上 {item['截止时间']}"
+                             for day, item in miss_days) or "可以避免最后一天的误机风险"
+        buffer_days = sorted(enumerate(itinerary_data, 1), key=lambda pair: -pair[1]['缓冲时间(小时)'])[:2]
+        buffer_text = "、".join(f"Day {day}约 {item['缓冲时间(小时)']:.1f} 小时" for day, item in buffer_days)
+        flight_advice = f"这是最重要的建议，{miss_text}"
+        buffer_advice = f"<strong>按模拟P90预留缓冲时间</strong> - 冬季天气、垭口管制和沿途停留需要额外时间，其中{buffer_text}"
+    else:
+        last_hours = itinerary_data[-1]['实际时间(小时)']
+        flight_advice = (f"这是最重要的建议，最后一天（Day {len(itinerary_data)}）需要行车 {last_hours:.1f} 小时，"
+                         f"改签后可以避免误机风险")
+        long_days = sorted(day for day, _ in sorted(enumerate(itinerary_data, 1),
+                                                    key=lambda pair: -pair[1]['实际时间(小时)'])[:2])
+        buffer_advice = (f"<strong>预留20-30%的缓冲时间</strong> - 特别是{'和'.join(f'Day {day}' for day in long_days)}，"
+                         f"冬季路况可能影响实际行驶时间")
+
+    # 有自动拆分方案时列出具体的住宿地点
+    split_plans = [(day, item["拆分建议"]) for day, item in enumerate(itinerary_data, 1) if item.get("拆分建议")]
+    if split_plans:
+        split_text = "；".join(f"Day {day}: {format_split(plan)}" for day, plan in split_plans)
+        split_advice = f"<strong>按沿途住宿地点拆分长途日</strong> - 每段不超过{split_plans[0][1]['limit_hours']:g}小时，{split_text}"
+    elif longest_hours > MAX_DRIVE_HOURS:
+        split_advice = (f"<strong>强烈建议将Day {longest_day}拆分为两天</strong> - "
+                        f"{longest_hours:.1f}小时的单日行程（{longest['行程']}）存在严重安全风险")
+    else:
+        split_advice = f"<strong>各天行车时间均不超过{MAX_DRIVE_HOURS:g}小时</strong> - 无需拆分行程"
+
+    html_content += f"""
                 </div>
             </div>
             
@@ -418,22 +523,24 @@ html_content += """
                 <div class="recommendations">
                     <div class="recommendation-item important">
                         <div class="recommendation-title">🔴 必须执行的措施</div>
-                        <div>1. <strong>将返程航班改签至12月31日</strong> - 这是最重要的建议，可以避免最后一天的误机风险</div>
+                        <div>1. <strong>将返程航班改签至12月31日</strong> - {flight_advice}</div>
                         <div>2. <strong>出发前确认墨脱通行状况</strong> - 联系当地司机或旅游局，确认扎墨公路是否开放</div>
-                        <div>3. <strong>预留20-30%的缓冲时间</strong> - 特别是Day 2和Day 9，冬季路况可能影响实际行驶时间</div>
-                    </div>
+                        <div>3. {buffer_advice}</div>
+                    </div>"""
+
+    html_content += """
                     
                     <div class="recommendation-item strong">
                         <div class="recommendation-title">🟡 强烈建议的措施</div>
                         <div>1. <strong>准备备选路线方案</strong> - 如果墨脱无法通行，及时调整路线（Day 2: 林芝→波密→然乌湖）</div>
-                        <div>2. <strong>Day 7尽早出发</strong> - 建议5:00-6:00出发，15.8小时往返行程需要充足时间，强烈建议拆分为两天</div>
+                        <div>2. """ + f"<strong>Day {longest_day}尽早出发</strong> - 建议5:00-6:00出发，{longest_hours:.1f}小时的行程需要充足时间" + """</div>
                         <div>3. <strong>Day 9控制纳木措游览时间</strong> - 建议不超过2小时，确保有足够时间前往机场</div>
                     </div>
                     
                     <div class="recommendation-item">
                         <div class="recommendation-title">🟢 可选优化措施</div>
                         <div>1. 考虑在Day 5或Day 8增加半天休息时间，缓解疲劳</div>
-                        <div>2. <strong>强烈建议将Day 7拆分为两天</strong> - 15.8小时的单日行程存在严重安全风险，建议拆分为：Day 7: 日喀则→佩枯措观景台→阿玛直米雪山（住当地），Day 8: 返回日喀则</div>
+                        <div>2. """ + split_advice + """</div>
                         <div>3. 准备路餐，减少中途用餐时间，提高行程效率</div>
                     </div>
                 </div>
@@ -488,6 +595,8 @@ html_content += """
         const times = """ + times_json_str + """;
         const estimatedDistances = """ + estimated_distances_json_str + """;
         const estimatedTimes = """ + estimated_times_json_str + """;
+        const riskScores = """ + risk_scores_json_str + """;
+        const riskColors = """ + risk_colors_json_str + """;
         
         // 等待DOM加载完成
         document.addEventListener('DOMContentLoaded', function() {
@@ -501,8 +610,8 @@ html_content += """
                         datasets: [{
                             label: '实际距离 (km)',
                             data: distances,
-                            backgroundColor: 'rgba(102, 126, 234, 0.8)',
-                            borderColor: 'rgba(102, 126, 234, 1)',
+                            backgroundColor: riskColors,
+                            borderColor: riskColors,
                             borderWidth: 2
                         }, {
                             label: '估算距离 (km)',
@@ -566,6 +675,17 @@ html_content += """
                             borderDash: [5, 5],
                             fill: true,
                             tension: 0.4
+                        }, {
+                            label: '风险评分',
+                            data: riskScores,
+                            yAxisID: 'risk',
+                            borderColor: 'rgba(255, 107, 107, 1)',
+                            backgroundColor: riskColors,
+                            pointBackgroundColor: riskColors,
+                            pointRadius: 6,
+                            borderWidth: 2,
+                            fill: false,
+                            tension: 0
                         }]
                     },
                     options: {
@@ -591,6 +711,18 @@ html_content += """
                                     display: true,
                                     text: '时间 (小时)'
                                 }
+                            },
+                            risk: {
+                                position: 'right',
+                                min: 0,
+                                max: 100,
+                                grid: {
+                                    drawOnChartArea: false
+                                },
+                                title: {
+                                    display: true,
+                                    text: '风险评分'
+                                }
                             }
                         }
                     }
@@ -601,10 +733,60 @@ html_content += """
 </body>
 </html>
 """
+    
+    return html_content
+
 
-# 保存HTML文件
-with open('行程分析报告.html', 'w', encoding='utf-8') as f:
-    f.write(html_content)
+def main(profiler=None, flight_time=None):
+    """
+    主函数
+    
+    Args:
+        profiler: profiling.Profiler，启用时按阶段剖析（可选）
+        flight_time: 返程航班起飞时间 "HH:MM"，用于模拟最后一天的误机概率（不指定时不模拟）
+    """
+    profiler = profiler or Profiler("generate_html_report")
+    itinerary = with_flight_time(ITINERARY, flight_time)
+    
+    # 直接调用分析函数获取数据
+    print("正在分析行程数据...")
+    with span("analyze itinerary", "analysis"), profiler.phase("analyze"):
+        itinerary_data = analyze_itinerary(itinerary)
+    
+    with span("check closures", "closures"), profiler.phase("closures"):
+        attach_closures(itinerary_data, itinerary)
+    
+    with span("elevation profiles", "elevation"), profiler.phase("elevation"):
+        attach_elevation(itinerary_data, itinerary)
+    
+    with span("simulate delays", "simulation"), profiler.phase("simulate"):
+        attach_delay_risk(itinerary_data, itinerary)
+    
+    with span("split long days", "split"), profiler.phase("split"):
+        split_long_days(itinerary_data, itinerary)
+    
+    with span("route maps", "maps"), profiler.phase("maps"):
+        attach_route_maps(itinerary_data, itinerary)
+    
+    with span("render html", "report"), profiler.phase("render"):
+        html_content = generate_html(itinerary_data)
+    
+    # 保存HTML文件
+    with profiler.phase("write"):
+        with open('行程分析报告.html', 'w', encoding='utf-8') as f:
+            f.write(html_content)
+    
+    print("✅ HTML报告已生成: 行程分析报告.html")
+    
+    trace_file = export_if_enabled()
+    if trace_file:
+        print(f"🧭 分段耗时追踪已保存到 {trace_file}")
+    profiler.report()
 
-print("✅ HTML报告已生成: 行程分析报告.html")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成HTML行程分析报告")
+    parser.add_argument("--flight-time", help="返程航班起飞时间 HH:MM，用于模拟最后一天的误机概率")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    main(profiler_from_args(args, "generate_html_report"), args.flight_time)
\ No newline at end of file
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML图片区域补丁工具
+一次扫描页面建立 景点标题 → image-slider 区间 的索引，
+再一次性拼接所有图库并原子写回文件
+"""
+
+import os
+import re
+import shutil
+import tempfile
+
+H4_PATTERN = re.compile(r'<h4>(.*?)</h4>', re.DOTALL)
+SLIDER_OPEN = '<div class="image-slider">'
+DIV_TAG_PATTERN = re.compile(r'<div\b|</div\s*>')
+
+
+def _find_div_end(content, start):
+    """
+    从 start（某个 <div> 开始标签之后）查找与之匹配的 </div> 位置
+
+    Args:
+        content: 页面内容
+        start: 开始标签结束处的偏移
+
+    Returns:
+        int: 匹配的 </div> 起始偏移，未找到返回 -1
+    """
+    depth = 1
+    for tag in DIV_TAG_PATTERN.finditer(content, start):
+        if tag.group(0).startswith('</'):
+            depth -= 1
+            if depth == 0:
+                return tag.start()
+        else:
+            depth += 1
+    return -1
+
+
+def build_gallery_index(content):
+    """
+    单次扫描页面，建立图库索引
+
+    每个 <h4> 标题之后、下一个 <h4> 之前的第一个 image-slider 归属于该标题。
+
+    Args:
+        content: 页面内容
+
+    Returns:
+        list: [(标题文本, slider内部起始偏移, slider内部结束偏移), ...]，按页面顺序
+    """
+    headings = list(H4_PATTERN.finditer(content))
+    index = []
+    for i, heading in enumerate(headings):
+        section_end = headings[i + 1].start() if i + 1 < len(headings) else len(content)
+        slider_pos = content.find(SLIDER_OPEN, heading.end(), section_end)
+        if slider_pos == -1:
+            continue
+        inner_start = slider_pos + len(SLIDER_OPEN)
+        inner_end = _find_div_end(content, inner_start)
+        if inner_end == -1:
+            continue
+        index.append((heading.group(1), inner_start, inner_end))
+    return index
+
+
+def locate_galleries(index, attractions):
+    """
+    为每个景点名称找到标题中包含该名称的第一个图库
+
+    Args:
+        index: build_gallery_index 的返回值
+        attractions: 景点名称列表
+
+    Returns:
+        dict: {景点名称: (slider内部起始偏移, slider内部结束偏移)}，未找到的景点不包含在内
+    """
+    located = {}
+    for attraction in attractions:
+        for title, inner_start, inner_end in index:
+            if attraction in title:
+                located[attraction] = (inner_start, inner_end)
+                break
+    return located
+
+
+def splice_galleries(content, galleries):
+    """
+    一次性替换页面中多个景点的图库内容
+
+    Args:
+        content: 页面内容
+        galleries: {景点名称: 新的slider内部HTML}
+
+    Returns:
+        tuple: (新页面内容, 实际更新的景点名称列表)
+    """
+    located = locate_galleries(build_gallery_index(content), galleries.keys())
+
+    # 同一个图库只替换一次（多个名称可能命中同一个标题）
+    spans = {}
+    for attraction, span in located.items():
+        spans.setdefault(span, attraction)
+
+    parts = []
+    cursor = 0
+    for (inner_start, inner_end), attraction in sorted(spans.items()):
+        parts.append(content[cursor:inner_start])
+        parts.append('\n' + galleries[attraction] + '\n                                ')
+        cursor = inner_end
+    parts.append(content[cursor:])
+
+    return ''.join(parts), list(spans.values())
+
+
+def write_atomic(path, content):
+    """
+    先写入同目录临时文件，再原子替换目标文件
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.html', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def patch_html_file(html_file, galleries):
+    """
+    读取HTML文件，替换所有景点的图库并原子写回
+
+    Args:
+        html_file: HTML文件路径
+        galleries: {景点名称: 新的slider内部HTML}
+
+    Returns:
+        list: 实际更新的景点名称列表
+    """
+    with open(html_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    new_content, updated = splice_galleries(content, galleries)
+
+    if updated:
+        write_atomic(html_file, new_content)
+    return updated
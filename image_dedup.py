@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片去重工具
+同一张照片会以不同CDN域名（sns-webpic / sns-img）和不同尺寸出现，
+这里先按规范化URL去重，再用感知哈希（dHash）+ BK树按汉明距离聚类，
+每个聚类只保留一张代表图片
+"""
+
+import io
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+import requests
+from PIL import Image
+
+from api_metrics import METRICS, instrumented_get
+
+HASH_CACHE_FILE = "image_hash_cache.json"
+HASH_SIZE = 8  # 8x8 = 64位哈希
+MAX_DISTANCE = 6  # 汉明距离不超过此值视为同一张照片
+MAX_WORKERS = 16
+# 通过图片代理只下载缩略图，节省带宽
+THUMBNAIL_URL = "https://images.weserv.nl/?url={url}&w=64&h=64&fit=inside"
+
+XHS_HOST_PATTERN = re.compile(r'^sns-(?:webpic|img)[\w-]*\.xhscdn\.com$')
+
+
+def canonical_url(url):
+    """
+    规范化图片URL：统一小红书CDN域名，去掉尺寸/格式后缀和查询参数
+
+    Args:
+        url: 图片URL
+
+    Returns:
+        str: 规范化后的URL，用作去重和哈希缓存的键
+    """
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    path = parts.path
+    if XHS_HOST_PATTERN.match(host):
+        host = "sns-img.xhscdn.com"
+        path = path.split('!', 1)[0]
+        return f"https://{host}{path}"
+    return f"{parts.scheme}://{host}{path}" + (f"?{parts.query}" if parts.query else "")
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    计算图片的差值哈希（dHash）
+
+    Args:
+        image: PIL.Image
+        hash_size: 哈希边长
+
+    Returns:
+        int: hash_size * hash_size 位的整数哈希
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    按汉明距离组织的BK树，用于快速查找相近哈希
+    """
+
+    def __init__(self):
+        self.root = None  # 节点结构: [哈希, 数据, {距离: 子节点}]
+
+    def add(self, value, item):
+        if self.root is None:
+            self.root = [value, item, {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, item, {}]
+                return
+            node = child
+
+    def find(self, value, max_distance):
+        """
+        查找与 value 汉明距离不超过 max_distance 的所有条目
+
+        Returns:
+            list: [(距离, 数据), ...]
+        """
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= max_distance:
+                found.append((distance, node[1]))
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+def load_hash_cache(cache_file=HASH_CACHE_FILE):
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_hash_cache(cache, cache_file=HASH_CACHE_FILE):
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+
+
+def fetch_thumbnail_hash(session, url):
+    """
+    下载缩略图并计算感知哈希
+
+    Returns:
+        int: 哈希值，下载或解码失败返回 None
+    """
+    try:
+        response = instrumented_get("image_thumbnail", session.get,
+                                    THUMBNAIL_URL.format(url=quote(url, safe='')), timeout=10)
+        response.raise_for_status()
+        with Image.open(io.BytesIO(response.content)) as image:
+            return dhash(image)
+    except (requests.RequestException, OSError):
+        return None
+
+
+def compute_hashes(urls, cache_file=HASH_CACHE_FILE, max_workers=MAX_WORKERS):
+    """
+    并发计算一组图片的感知哈希，已缓存的URL不再下载；下载或解码失败的不缓存，下次运行时重试
+
+    Args:
+        urls: 规范化后的图片URL列表
+
+    Returns:
+        dict: {url: 哈希值或None}
+    """
+    cache = load_hash_cache(cache_file)
+    # 旧版本缓存中记为 None 的失败结果也重新下载
+    pending = [url for url in urls if not cache.get(url)]
+    for url in urls:
+        METRICS.observe_cache("image_hash", bool(cache.get(url)))
+
+    if pending:
+        session = requests.Session()
+        session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        })
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for url, value in zip(pending, executor.map(lambda u: fetch_thumbnail_hash(session, u), pending)):
+                # 以十六进制字符串保存；失败的只在本次运行中视为没有哈希
+                if value is not None:
+                    cache[url] = format(value, 'x')
+                else:
+                    cache.pop(url, None)
+        save_hash_cache(cache, cache_file)
+
+    return {url: int(cache[url], 16) if cache.get(url) else None for url in urls}
+
+
+def dedupe_images(images_dict, max_images=5, max_distance=MAX_DISTANCE, cache_file=HASH_CACHE_FILE):
+    """
+    跨景点、跨关键词去除重复图片
+
+    按景点顺序遍历，每个聚类只保留第一次出现的图片；
+    已被前面景点使用的照片不会在后面的景点中重复出现。
+
+    Args:
+        images_dict: {景点名称: [图片URL, ...]}
+        max_images: 每个景点最多保留的图片数
+        max_distance: 判定为同一张照片的最大汉明距离
+
+    Returns:
+        dict: {景点名称: [去重后的图片URL, ...]}
+    """
+    # 第一步：按规范化URL去重，无需下载
+    seen_urls = set()
+    candidates = {}
+    for attraction, images in images_dict.items():
+        candidates[attraction] = []
+        for url in images:
+            key = canonical_url(url)
+            if key not in seen_urls:
+                seen_urls.add(key)
+                candidates[attraction].append((key, url))
+
+    # 第二步：计算感知哈希并按汉明距离聚类
+    hashes = compute_hashes(list(seen_urls), cache_file=cache_file)
+    tree = BKTree()
+    results = {}
+    for attraction, entries in candidates.items():
+        kept = []
+        for key, url in entries:
+            if len(kept) >= max_images:
+                break
+            value = hashes.get(key)
+            if value is not None:
+                if tree.find(value, max_distance):
+                    continue
+                tree.add(value, key)
+            kept.append(url)
+        results[attraction] = kept
+    return results
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片占位图生成工具
+在生成页面时为每张图片计算原始尺寸和一张极小的模糊占位图（base64 LQIP），
+页面上的图片带上 width/height、decoding="async" 和内联占位背景，
+远程图片加载完成前不再出现空白框和页面跳动
+"""
+
+import base64
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image, ImageFilter
+
+from api_metrics import METRICS, instrumented_get
+
+META_CACHE_FILE = "image_meta_cache.json"
+MAX_WORKERS = 16
+HEADER_BYTES = 64 * 1024  # 读取尺寸只需要文件头部
+PLACEHOLDER_WIDTH = 16
+# 通过图片代理获取缩略图用于生成占位图
+THUMBNAIL_PARAMS = "&w=32&h=32&fit=inside"
+
+
+def load_meta_cache(cache_file=META_CACHE_FILE):
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_meta_cache(cache, cache_file=META_CACHE_FILE):
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+
+
+def make_placeholder(image):
+    """
+    将图片缩小并模糊，编码为 base64 JPEG data URI
+
+    Args:
+        image: PIL.Image
+
+    Returns:
+        str: data URI，通常只有几百字节
+    """
+    width, height = image.size
+    small_height = max(1, round(PLACEHOLDER_WIDTH * height / max(width, 1)))
+    small = image.convert('RGB').resize((PLACEHOLDER_WIDTH, small_height), Image.BILINEAR)
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    small.save(buffer, format='JPEG', quality=40, optimize=True)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def fetch_image_meta(session, proxy_url):
+    """
+    获取单张图片的原始尺寸和模糊占位图
+
+    Args:
+        session: requests.Session
+        proxy_url: 页面中实际使用的（代理）图片URL
+
+    Returns:
+        dict: {"width", "height", "placeholder"}，失败返回 None
+    """
+    try:
+        # 只下载文件头部即可解析尺寸
+        response = instrumented_get("image_header", session.get, proxy_url, timeout=10,
+                                    headers={'Range': f'bytes=0-{HEADER_BYTES - 1}'})
+        response.raise_for_status()
+        with Image.open(io.BytesIO(response.content)) as image:
+            width, height = image.size
+
+        thumb = instrumented_get("image_thumbnail", session.get, proxy_url + THUMBNAIL_PARAMS, timeout=10)
+        thumb.raise_for_status()
+        with Image.open(io.BytesIO(thumb.content)) as image:
+            placeholder = make_placeholder(image)
+
+        return {"width": width, "height": height, "placeholder": placeholder}
+    except (requests.RequestException, OSError):
+        return None
+
+
+def build_image_metas(proxy_urls, cache_file=META_CACHE_FILE, max_workers=MAX_WORKERS):
+    """
+    并发获取一组图片的尺寸和占位图，已缓存的不再下载；获取失败的不缓存，下次运行时重试
+
+    Args:
+        proxy_urls: 页面中使用的图片URL列表
+
+    Returns:
+        dict: {url: meta或None}
+    """
+    cache = load_meta_cache(cache_file)
+    unique_urls = list(dict.fromkeys(proxy_urls))
+    # 旧版本缓存中记为 None 的失败结果也重新获取
+    pending = [url for url in unique_urls if not cache.get(url)]
+    for url in unique_urls:
+        METRICS.observe_cache("image_meta", bool(cache.get(url)))
+
+    if pending:
+        session = requests.Session()
+        session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        })
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for url, meta in zip(pending, executor.map(lambda u: fetch_image_meta(session, u), pending)):
+                # 失败的只在本次运行中视为没有占位图
+                if meta is not None:
+                    cache[url] = meta
+                else:
+                    cache.pop(url, None)
+        save_meta_cache(cache, cache_file)
+
+    return {url: cache.get(url) for url in unique_urls}
+
+
+def placeholder_attrs(meta, extra_style=''):
+    """
+    生成 <img> 上的尺寸、异步解码和占位背景属性
+
+    Args:
+        meta: build_image_metas 返回的单张图片信息（可为 None）
+        extra_style: 需要保留的其它内联样式
+
+    Returns:
+        str: 以空格开头的属性字符串
+    """
+    attrs = ' decoding="async"'
+    style = extra_style
+    if meta:
+        attrs += f' width="{meta["width"]}" height="{meta["height"]}"'
+        style = (f"background: #ddd url('{meta['placeholder']}') center / cover no-repeat; " + style).strip()
+    if style:
+        attrs += f' style="{style}"'
+    return attrs
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片URL健康检查工具
+并发检查配置中的图片URL，缓存检查结果，在写入HTML之前剔除失效图片
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from api_metrics import METRICS, instrumented_get
+
+CACHE_FILE = "image_check_cache.json"
+CACHE_TTL = 24 * 3600  # 缓存有效期（秒）
+# 可能只是暂时失败的状态码，与网络错误一样不缓存，下次运行时重新检查
+TRANSIENT_STATUSES = (408, 429, 500, 502, 503, 504)
+MAX_WORKERS = 32
+TIMEOUT = 5
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Referer': 'https://www.xiaohongshu.com/',
+}
+
+
+def load_cache(cache_file=CACHE_FILE):
+    """
+    读取检查结果缓存，文件不存在或损坏时返回空缓存
+    """
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, cache_file=CACHE_FILE):
+    """
+    保存检查结果缓存
+    """
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+
+
+def check_image_url(session, url):
+    """
+    检查单个图片URL是否可用
+
+    先发送HEAD请求；服务器不支持HEAD时，改用只取第一个字节的GET请求。
+
+    Args:
+        session: requests.Session
+        url: 图片URL
+
+    Returns:
+        dict: {"ok", "status", "content_type", "size", "checked_at"}
+    """
+    result = {
+        "ok": False,
+        "status": None,
+        "content_type": "",
+        "size": None,
+        "checked_at": time.time()
+    }
+
+    if not url or 'placeholder' in url.lower():
+        return result
+
+    try:
+        response = instrumented_get("image_check", session.head, url, timeout=TIMEOUT, allow_redirects=True)
+        if response.status_code in (403, 405, 501):
+            response = instrumented_get("image_check", session.get, url, timeout=TIMEOUT,
+                                        headers={'Range': 'bytes=0-0'}, stream=True)
+            response.close()
+
+        content_type = response.headers.get('Content-Type', '')
+        size = response.headers.get('Content-Length')
+        content_range = response.headers.get('Content-Range', '')
+        if '/' in content_range:
+            size = content_range.rsplit('/', 1)[1]
+
+        result["status"] = response.status_code
+        result["content_type"] = content_type
+        result["size"] = int(size) if size and size.isdigit() else None
+        result["ok"] = response.status_code in (200, 206) and content_type.startswith('image/')
+    except requests.RequestException:
+        pass
+
+    return result
+
+
+def check_image_urls(urls, cache_file=CACHE_FILE, ttl=CACHE_TTL, max_workers=MAX_WORKERS):
+    """
+    并发检查一组图片URL，未过期的缓存结果直接复用；
+    只缓存明确的HTTP状态，网络错误和暂时性的状态码下次运行时重新检查
+
+    Args:
+        urls: 图片URL列表（可重复）
+        cache_file: 缓存文件路径
+        ttl: 缓存有效期（秒）
+        max_workers: 并发线程数
+
+    Returns:
+        dict: {url: 检查结果}
+    """
+    cache = load_cache(cache_file)
+    now = time.time()
+
+    unique_urls = list(dict.fromkeys(url for url in urls if url))
+    pending = [url for url in unique_urls
+               if url not in cache or now - cache[url].get("checked_at", 0) > ttl]
+    for url in unique_urls:
+        METRICS.observe_cache("image_check", url not in pending)
+
+    checked = {}
+    if pending:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for url, result in zip(pending, executor.map(lambda u: check_image_url(session, u), pending)):
+                checked[url] = result
+                if result["status"] is not None and result["status"] not in TRANSIENT_STATUSES:
+                    cache[url] = result
+                else:
+                    cache.pop(url, None)
+
+        save_cache(cache, cache_file)
+
+    return {url: checked.get(url) or cache[url] for url in unique_urls}
+
+
+def filter_valid_images(images_config, cache_file=CACHE_FILE, ttl=CACHE_TTL):
+    """
+    剔除配置中不可用的图片URL
+
+    Args:
+        images_config: {景点名称: [图片URL, ...]}
+
+    Returns:
+        dict: {景点名称: [可用的图片URL, ...]}，保持原有顺序
+    """
+    all_urls = [url for images in images_config.values() for url in images]
+    results = check_image_urls(all_urls, cache_file=cache_file, ttl=ttl)
+
+    filtered = {}
+    for attraction, images in images_config.items():
+        valid = [url for url in images if url and results.get(url, {}).get("ok")]
+        dropped = len(images) - len(valid)
+        if dropped:
+            print(f"  ⚠️  {attraction}: 剔除 {dropped} 张不可用图片")
+        filtered[attraction] = valid
+    return filtered
+
+
+def main(config_file="xhs_images_config.json"):
+    """
+    检查配置文件中的所有图片URL并输出统计
+    """
+    print("=" * 60)
+    print("图片URL健康检查")
+    print("=" * 60)
+
+    with open(config_file, 'r', encoding='utf-8') as f:
+        images_config = json.load(f)
+
+    start = time.time()
+    all_urls = [url for images in images_config.values() for url in images]
+    results = check_image_urls(all_urls)
+    ok_count = sum(1 for r in results.values() if r["ok"])
+    print(f"\n检查 {len(results)} 个URL，可用 {ok_count} 个，用时 {time.time() - start:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+高德API Key 池
+在 config.py 中设置 AMAP_API_KEYS（列表）或环境变量 AMAP_API_KEYS（逗号分隔）即可配置多个 Key。
+每个 Key 有自己的QPS限制（按 GCRA 令牌桶计算下一次可用的时间）和每日调用计数，
+每次请求选择可以最早发出、今天用量最少的 Key；返回配额或QPS超限的 infocode 时，
+该 Key 暂停使用，直到限制解除（每日配额到北京时间零点重置）。
+
+用量保存在 amap_key_usage.json 中（只保存 Key 的摘要，不保存 Key 本身），
+多个进程通过文件锁共享同一份状态，同时运行的批量任务加起来也不会超过每个 Key 的限制
+
+使用方法：
+    python key_pool.py    # 查看各个 Key 今天的用量和暂停状态
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，用量只在单个进程内共享
+    fcntl = None
+
+from api_metrics import timed_sleep
+
+KEY_USAGE_FILE = "amap_key_usage.json"
+KEY_QPS = float(os.environ.get("AMAP_KEY_QPS", 3))                    # 每个 Key 的QPS上限
+DAILY_QUOTA = int(os.environ.get("AMAP_KEY_DAILY_QUOTA", 5000))       # 每个 Key 每天的调用次数上限
+MAX_WAIT_SECONDS = 10    # Key 的限制在这个时间内解除时等待，否则视为不可用
+BEIJING = timezone(timedelta(hours=8))
+
+# 配额和QPS相关的 infocode -> 暂停秒数，None 表示暂停到北京时间零点配额重置
+PARK_INFOCODES = {
+    "10001": None,   # INVALID_USER_KEY
+    "10003": None,   # DAILY_QUERY_OVER_LIMIT
+    "10044": None,   # USER_DAILY_QUERY_OVER_LIMIT
+    "10004": 60,     # ACCESS_TOO_FREQUENT，按分钟限制
+    "10019": 1,      # CUQPS_HAS_EXCEEDED_THE_LIMIT，服务总QPS超限
+    "10020": 1,      # CKQPS_HAS_EXCEEDED_THE_LIMIT，Key 的QPS超限
+    "10021": 1,      # CUQPS_HAS_EXCEEDED_THE_LIMIT，账号的QPS超限
+}
+
+
+def fingerprint(key):
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+def mask(key):
+    return f"{key[:4]}…{key[-4:]}" if len(key) > 8 else "****"
+
+
+def beijing_date(timestamp):
+    return datetime.fromtimestamp(timestamp, BEIJING).date().isoformat()
+
+
+def next_reset(timestamp):
+    """
+    下一个北京时间零点的时间戳
+    """
+    day = datetime.fromtimestamp(timestamp, BEIJING).date() + timedelta(days=1)
+    return datetime(day.year, day.month, day.day, tzinfo=BEIJING).timestamp()
+
+
+class KeyPool:
+    """
+    Key 池，state_file 为 None 时用量只保存在内存中；qps 为 0 时不限制QPS
+    """
+
+    def __init__(self, keys, state_file=KEY_USAGE_FILE, qps=KEY_QPS, daily_quota=DAILY_QUOTA):
+        self.keys = list(dict.fromkeys(keys))
+        self.ids = {key: fingerprint(key) for key in self.keys}
+        self.state_file = state_file
+        self.interval = 1 / qps if qps else 0.0
+        self.daily_quota = daily_quota
+        self.lock = threading.Lock()
+        self.state = {}
+
+    @contextmanager
+    def _locked_state(self, write=True):
+        """
+        加锁读取用量状态，退出时写回（write 为 False 时只读）；有状态文件时同时加文件锁，与其他进程互斥
+        """
+        with self.lock:
+            if not self.state_file:
+                yield self.state
+                return
+            with open(f"{self.state_file}.lock", 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                state = {}
+                if os.path.exists(self.state_file):
+                    try:
+                        with open(self.state_file, 'r', encoding='utf-8') as f:
+                            state = json.load(f)
+                    except (OSError, ValueError):
+                        state = {}
+                yield state
+                if not write:
+                    return
+                temp_file = f"{self.state_file}.{os.getpid()}.tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, indent=2)
+                os.replace(temp_file, self.state_file)
+
+    def _entry(self, state, key, now):
+        entry = state.setdefault(self.ids[key], {"date": "", "count": 0, "tat": 0.0, "parked_until": 0.0,
+                                                 "reason": ""})
+        today = beijing_date(now)
+        if entry["date"] != today:
+            entry.update(date=today, count=0)
+        return entry
+
+    def acquire(self):
+        """
+        选择一个 Key 并占用一次调用额度，需要等待QPS令牌时在锁外等待
+
+        Returns:
+            str: Key，所有 Key 都用完配额或暂停时返回 None
+        """
+        with self._locked_state() as state:
+            now = time.time()
+            best = None
+            for key in self.keys:
+                entry = self._entry(state, key, now)
+                wait = max(0.0, entry["tat"] - now, entry["parked_until"] - now)
+                if wait > MAX_WAIT_SECONDS or entry["count"] >= self.daily_quota:
+                    continue
+                if best is None or (wait, entry["count"]) < best[0]:
+                    best = ((wait, entry["count"]), key, entry)
+            if best is None:
+                return None
+            (wait, _), key, entry = best
+            entry["tat"] = now + wait + self.interval
+            entry["count"] += 1
+        if wait > 0:
+            timed_sleep(wait, "key_pool")
+        return key
+
+    def report(self, key, infocode):
+        """
+        记录响应的 infocode，配额或QPS超限时暂停该 Key
+
+        Returns:
+            bool: 是否已暂停（应换一个 Key 重试）
+        """
+        infocode = str(infocode or "")
+        if infocode not in PARK_INFOCODES:
+            return False
+        seconds = PARK_INFOCODES[infocode]
+        with self._locked_state() as state:
+            now = time.time()
+            entry = self._entry(state, key, now)
+            entry["parked_until"] = next_reset(now) if seconds is None else now + seconds
+            entry["reason"] = infocode
+        return True
+
+    def status(self):
+        """
+        各个 Key 今天的用量和暂停状态
+        """
+        with self._locked_state(write=False) as state:
+            now = time.time()
+            rows = []
+            for key in self.keys:
+                entry = self._entry(state, key, now)
+                parked = entry["parked_until"] > now
+                rows.append({
+                    "key": mask(key),
+                    "count": entry["count"],
+                    "quota": self.daily_quota,
+                    "parked_until": (datetime.fromtimestamp(entry["parked_until"], BEIJING).strftime("%m-%d %H:%M:%S")
+                                     if parked else None),
+                    "reason": entry["reason"] if parked else ""
+                })
+        return rows
+
+
+_POOL = None
+
+
+def get_key_pool(keys):
+    """
+    返回给定 Key 列表的 Key 池，Key 列表变化时重新创建
+    """
+    global _POOL
+    if _POOL is None or _POOL.keys != list(dict.fromkeys(keys)):
+        _POOL = KeyPool(keys)
+    return _POOL
+
+
+def main():
+    from travel_analyzer import api_keys
+
+    pool = get_key_pool(api_keys())
+    print(f"🔑 高德API Key 池: {len(pool.keys)} 个 Key，每个 {KEY_QPS:g} QPS、每天 {DAILY_QUOTA} 次")
+    for row in pool.status():
+        line = f"  {row['key']}: 今天 {row['count']}/{row['quota']} 次"
+        if row["parked_until"]:
+            line += f"，暂停到 {row['parked_until']}（infocode {row['reason']}）"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    main()
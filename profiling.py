@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能剖析工具
+为各个入口脚本提供 --profile 选项：按阶段运行 cProfile（可选 tracemalloc 内存分配追踪），
+在输出目录写出每个阶段的 .pstats 文件和内存分配 Top-N 报告
+
+查看结果：
+    python -m pstats travel_analyzer.analyze.pstats
+    snakeviz travel_analyzer.analyze.pstats
+"""
+
+import cProfile
+import os
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Profiler:
+    """
+    按阶段剖析的上下文管理器集合，未启用时 phase() 是空操作
+
+    阶段不能嵌套：同一时间只能有一个 cProfile 处于活动状态。
+    """
+
+    def __init__(self, name, output_dir=".", enabled=False, track_memory=False, top=25):
+        self.name = name
+        self.output_dir = output_dir
+        self.enabled = enabled
+        self.track_memory = track_memory
+        self.top = top
+        self.written = []
+
+    def _path(self, phase_name, suffix):
+        return os.path.join(self.output_dir, f"{self.name}.{phase_name}.{suffix}")
+
+    @contextmanager
+    def phase(self, phase_name):
+        if not self.enabled:
+            yield
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.track_memory:
+            tracemalloc.start()
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            stats_file = self._path(phase_name, "pstats")
+            profile.dump_stats(stats_file)
+            self.written.append(stats_file)
+
+            if self.track_memory:
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, cProfile.__file__),
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                ])
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                alloc_file = self._path(phase_name, "alloc.txt")
+                with open(alloc_file, 'w', encoding='utf-8') as f:
+                    f.write(f"阶段: {phase_name}\n")
+                    f.write(f"当前分配: {current / 1024:.1f} KB, 峰值: {peak / 1024:.1f} KB\n\n")
+                    f.write(f"Top {self.top} 分配位置:\n")
+                    for stat in snapshot.statistics('lineno')[:self.top]:
+                        f.write(f"  {stat}\n")
+                self.written.append(alloc_file)
+
+    def report(self):
+        if self.written:
+            print("🔬 性能剖析结果:")
+            for path in self.written:
+                print(f"  {path}")
+
+
+def add_profile_arguments(parser):
+    """
+    为 argparse 解析器添加剖析相关选项
+    """
+    group = parser.add_argument_group("性能剖析")
+    group.add_argument("--profile", action="store_true", help="使用 cProfile 按阶段剖析并写出 .pstats 文件")
+    group.add_argument("--profile-memory", action="store_true", help="同时用 tracemalloc 追踪内存分配")
+    group.add_argument("--profile-dir", default=".", help="剖析结果输出目录（默认当前目录）")
+    return parser
+
+
+def profiler_from_args(args, name):
+    """
+    根据命令行参数创建 Profiler
+    """
+    return Profiler(name, output_dir=args.profile_dir,
+                    enabled=args.profile or args.profile_memory,
+                    track_memory=args.profile_memory)
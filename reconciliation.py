@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API结果校正
+检查每天的路线结果是否异常（途经点地理编码失败、距离或时间与行程参考值之比超出范围），
+只对包含地名的路段换用坐标途经点重试。重试后仍超出范围时：参考值抄自高德地图显示的天
+退回行程中的参考数据；参考值只是手写粗略估算的天保留API结果并提示（偏差更可能来自参考值）。
+校正结果连同来源和原因写入缓存，之后的运行直接使用，不再重复请求；
+退回参考数据的结果只缓存 ESTIMATE_CACHE_TTL 秒，之后重新请求API
+"""
+
+import json
+import os
+import threading
+import time
+
+from api_metrics import METRICS
+
+RECONCILE_CACHE_FILE = "reconciled_legs.json"
+ESTIMATE_CACHE_TTL = 24 * 3600   # 退回行程参考数据的结果只缓存一天
+
+# (结果字段, 行程参考字段, 允许的比值范围, 名称)
+# 途经点定位错误主要表现为距离偏差；粗略估算的时间本身误差大，只检查明显离谱的结果
+RATIO_CHECKS = (
+    ("distance_km", "estimated_distance", (0.8, 1.25), "距离"),
+    ("duration_hours", "estimated_time", (0.5, 2.0), "时间"),
+)
+# 参考值抄自高德地图显示（行程中 "reference": "amap"）时，时间也按较严格的范围检查
+VERIFIED_RATIO_CHECKS = (
+    ("distance_km", "estimated_distance", (0.8, 1.25), "距离"),
+    ("duration_hours", "estimated_time", (0.7, 1.3), "时间"),
+)
+
+# 地名常见后缀，地理编码失败时去掉后缀重试
+NAME_SUFFIXES = ("国家风景区", "风景区", "景区", "观景台", "县城")
+
+
+def load_cache(cache_file=RECONCILE_CACHE_FILE):
+    if not cache_file or not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, cache_file=RECONCILE_CACHE_FILE):
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+
+
+def is_coordinate(value):
+    parts = str(value).split(',')
+    if len(parts) != 2:
+        return False
+    try:
+        float(parts[0])
+        float(parts[1])
+        return True
+    except ValueError:
+        return False
+
+
+def leg_key(origin, destination, waypoints=None):
+    return f"{origin}|{destination}|{'|'.join(waypoints or [])}"
+
+
+def day_key(item):
+    """
+    行程中一天的缓存键；修改起终点、途经点或参考数据后自动失效
+    """
+    return json.dumps([item["origin"], item["destination"], item.get("waypoints") or [],
+                       item.get("waypoint_coords") or [], item.get("estimated_distance"),
+                       item.get("estimated_time"), item.get("reference")], ensure_ascii=False)
+
+
+def geocode_variants(name):
+    """
+    生成地理编码重试用的查询词
+    """
+    variants = []
+    if not name.startswith("西藏"):
+        variants.append(f"西藏自治区{name}")
+    for suffix in NAME_SUFFIXES:
+        if name.endswith(suffix) and len(name) > len(suffix):
+            variants.append(name[:-len(suffix)])
+            break
+    return variants
+
+
+def find_anomalies(item, result):
+    """
+    检查一天的路线结果
+
+    Returns:
+        list: 异常原因，空列表表示结果可信
+    """
+    reasons = []
+    if result.get("unresolved"):
+        reasons.append(f"地理编码失败: {'、'.join(result['unresolved'])}")
+    checks = VERIFIED_RATIO_CHECKS if item.get("reference") == "amap" else RATIO_CHECKS
+    for key, estimate_key, (low, high), label in checks:
+        estimate = item.get(estimate_key)
+        if estimate:
+            ratio = result[key] / estimate
+            if not low <= ratio <= high:
+                reasons.append(f"{label}与参考值之比 {ratio:.2f} 超出 [{low}, {high}]")
+    return reasons
+
+
+def is_fresh(entry, now=None):
+    """
+    缓存条目是否仍可使用：退回参考数据的结果过期后重新请求API
+    """
+    if entry["source"] != "estimate":
+        return True
+    return (now or time.time()) - entry.get("reconciled_at", 0) < ESTIMATE_CACHE_TTL
+
+
+def estimate_result(item):
+    return {
+        "distance_km": item["estimated_distance"],
+        "duration_hours": item["estimated_time"],
+        "duration_minutes": item["estimated_time"] * 60
+    }
+
+
+def _summary(result):
+    return {key: result[key] for key in ("distance_km", "duration_hours", "duration_minutes")}
+
+
+def _cached(result):
+    # 多个路线策略时各策略的结果一起缓存，之后可以换一种选择规则而不用重新请求
+    if result.get("alternatives"):
+        return dict(_summary(result), alternatives=result["alternatives"])
+    return _summary(result)
+
+
+class Reconciler:
+    """
+    校正结果缓存，cache_file 为 None 时只保存在内存中；source 为路线结果的来源标记
+    """
+
+    def __init__(self, cache_file=RECONCILE_CACHE_FILE, source="api"):
+        self.cache_file = cache_file
+        self.source = source
+        self.cache = load_cache(cache_file)
+        self.lock = threading.Lock()
+
+    def lookup(self, item):
+        """
+        返回已缓存的校正结果（带 source 字段），没有时返回 None
+        """
+        with self.lock:
+            entry = self.cache.get(day_key(item))
+        if entry and not is_fresh(entry):
+            entry = None
+        METRICS.observe_cache("reconcile", entry is not None)
+        if not entry:
+            return None
+        return dict(entry["result"], source=entry["source"])
+
+    def store(self, item, result, source, reasons, candidates):
+        entry = {
+            "day": item.get("day"),
+            "route": item.get("route"),
+            "result": _cached(result),
+            "source": source,
+            "reasons": reasons,
+            "api_candidates": candidates,
+            "reconciled_at": time.time()
+        }
+        with self.lock:
+            self.cache[day_key(item)] = entry
+            if self.cache_file:
+                save_cache(self.cache, self.cache_file)
+
+    def _resolver(self, item, geocode):
+        known = dict(zip(item.get("waypoints") or [], item.get("waypoint_coords") or []))
+
+        def resolve(name):
+            if is_coordinate(name):
+                return name
+            if name not in known:
+                for query in geocode_variants(name) + [name]:
+                    coord = geocode(query)
+                    if coord:
+                        known[name] = coord
+                        break
+                else:
+                    known[name] = name
+            return known[name]
+
+        return resolve
+
+    def reconcile_day(self, item, plan, route, geocode, log=print):
+        """
+        计算一天的路线并校正异常结果
+
+        Args:
+            item: 行程中的一天
+            plan: plan(route) -> 用给定的路线函数计算当天结果（travel_analyzer.route_day）
+            route: 路线查询函数
+            geocode: 地理编码函数
+            log: 输出提示的函数
+
+        Returns:
+            dict: 路线结果（带 source 字段），API不可用时返回 None
+        """
+        legs = {}
+
+        def recording_route(origin, destination, waypoints=None):
+            result = route(origin, destination, waypoints)
+            legs[leg_key(origin, destination, waypoints)] = result
+            return result
+
+        api_result = plan(recording_route)
+        if api_result:
+            reasons = find_anomalies(item, api_result)
+            if not reasons:
+                return dict(api_result, source=self.source)
+            log(f"  ⚠️  API返回数据({api_result['duration_hours']:.1f}小时, {api_result['distance_km']:.1f}km)异常: "
+                f"{'；'.join(reasons)}")
+            candidates = [_summary(api_result)]
+        else:
+            # 途经点名称无法识别时高德会直接返回参数错误，同样尝试用坐标重试
+            reasons, candidates = ["路线请求失败"], []
+
+        resolve = self._resolver(item, geocode)
+
+        def retry_route(origin, destination, waypoints=None):
+            key = leg_key(origin, destination, waypoints)
+            resolved = [resolve(origin), resolve(destination), [resolve(wp) for wp in waypoints or []]]
+            if resolved == [origin, destination, list(waypoints or [])] and key in legs:
+                return legs[key]  # 没有得到新的坐标，重试结果不会不同，沿用第一次的结果
+            return route(resolved[0], resolved[1], resolved[2] or None)
+
+        retried = plan(retry_route)
+        if not retried and not candidates:
+            return None  # API不可用，不缓存
+
+        if retried and not find_anomalies(item, retried):
+            result, source = retried, f"{self.source}_retry"
+            log(f"  ✓ 使用坐标途经点重试后数据正常: {result['duration_hours']:.1f}小时, {result['distance_km']:.1f}km")
+        elif item.get("reference") == "amap":
+            # 参考值抄自高德地图显示，比仍然异常的API结果可信
+            if retried and _summary(retried) not in candidates:
+                candidates.append(_summary(retried))
+            result, source = estimate_result(item), "estimate"
+            log(f"  ⚠️  使用行程参考数据: {item['estimated_time']:.2f}小时, {item['estimated_distance']:.1f}km")
+        else:
+            # 参考值只是粗略估算：偏差只用来触发重试，仍然使用API结果（重试用了坐标，优先使用）
+            result, source = (retried, f"{self.source}_retry") if retried else (api_result, self.source)
+            log(f"  ⚠️  保留{self.source}结果 {result['duration_hours']:.1f}小时, {result['distance_km']:.1f}km，"
+                f"行程参考值（{item['estimated_time']}小时, {item['estimated_distance']}km）可能不准确")
+
+        self.store(item, result, source, reasons, candidates)
+        return dict(_cached(result), source=source)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行程风险评分
+根据每天的数值特征（行车时间、距离、实际与估算的偏差、最后一天/航班压力、海拔、
+垭口封路概率、天黑后到达概率）加权计算 0-100 的风险分，并按阈值划分等级。
+特征矩阵一次性向量化计算，可以同时为整个行程库评分
+
+权重和阈值可以在本模块所在目录的 risk_model.json 中覆盖，例如：
+    {"features": {"drive_hours": {"weight": 0.3, "high": 10}}, "thresholds": {"high": 50}}
+"""
+
+import json
+import os
+from copy import deepcopy
+from functools import lru_cache
+
+import numpy as np
+
+from delay_simulation import PASSES, DEFAULT_ALTITUDE, route_passes
+
+RISK_MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "risk_model.json")
+
+# 每个特征按 (x - low) / (high - low) 归一化到 0-1 后乘以权重，权重之和为 1
+DEFAULT_FEATURES = {
+    "drive_hours": {"label": "行车时间", "weight": 0.25, "low": 6, "high": 12},
+    "distance_km": {"label": "行驶距离", "weight": 0.10, "low": 300, "high": 800},
+    "overrun": {"label": "超出估算", "weight": 0.10, "low": 0.0, "high": 0.3},
+    "last_day": {"label": "返程日", "weight": 0.05, "low": 0.0, "high": 1.0},
+    "flight_miss": {"label": "误机概率", "weight": 0.20, "low": 0.0, "high": 0.3},
+    "altitude": {"label": "海拔", "weight": 0.10, "low": 4000, "high": 5300},
+    "closure": {"label": "垭口封路", "weight": 0.10, "low": 0.0, "high": 0.25},
+    "after_dark": {"label": "夜间驾驶", "weight": 0.10, "low": 0.0, "high": 1.0},
+}
+DEFAULT_THRESHOLDS = {"high": 45, "medium": 12}
+
+LEVELS = ("low", "medium", "high")
+LEVEL_LABELS = {"high": "高风险", "medium": "注意", "low": "低风险"}
+
+
+@lru_cache(maxsize=4096)
+def _pass_features(route, origin, destination):
+    passes = route_passes({"route": route, "origin": origin, "destination": destination})
+    altitude = max([PASSES[name]["altitude"] for name in passes] + [DEFAULT_ALTITUDE])
+    open_prob = 1.0
+    for name in passes:
+        open_prob *= 1 - PASSES[name]["closure_prob"]
+    return altitude, 1 - open_prob
+
+
+def day_features(result, is_last):
+    """
+    从一天的分析结果中提取特征值（顺序同 DEFAULT_FEATURES）
+    """
+    hours = result["实际时间(小时)"]
+    estimated = result["估算时间(小时)"]
+    altitude, closure = _pass_features(result["行程"], result["起点"], result["终点"])
+    # 有 DEM 海拔剖面时用路线上实际的最高点
+    altitude = result.get("最高海拔(m)") or altitude
+    # 没有延误模拟结果时，用最后一天的行车时间近似航班压力；模拟过但当天没有航班时为 0
+    if "误机概率" in result:
+        flight_miss = result["误机概率"] or 0.0
+    else:
+        flight_miss = min(1.0, max(0.0, (hours - 6) / 4)) * 0.3 if is_last else 0.0
+    return [
+        hours,
+        result["实际距离(km)"],
+        (hours - estimated) / estimated if estimated else 0.0,
+        1.0 if is_last else 0.0,
+        flight_miss,
+        altitude,
+        closure,
+        result.get("天黑后到达概率", 0.0),
+    ]
+
+
+class RiskModel:
+    """
+    风险评分模型：特征权重、归一化区间和等级阈值
+    """
+
+    def __init__(self, features=None, thresholds=None):
+        self.features = deepcopy(DEFAULT_FEATURES)
+        for name, overrides in (features or {}).items():
+            if name not in self.features:
+                raise ValueError(f"未知的风险特征: {name}")
+            self.features[name].update(overrides)
+        self.thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+
+        self.names = list(self.features)
+        self.weights = np.array([self.features[n]["weight"] for n in self.names], dtype=float)
+        self.low = np.array([self.features[n]["low"] for n in self.names], dtype=float)
+        self.span = np.array([self.features[n]["high"] - self.features[n]["low"] for n in self.names], dtype=float)
+
+    @classmethod
+    def load(cls, path=RISK_MODEL_FILE):
+        """
+        读取配置文件中的覆盖项，文件不存在时使用默认模型
+        """
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config.get("features"), config.get("thresholds"))
+
+    def score(self, matrix):
+        """
+        为特征矩阵的每一行评分
+
+        Args:
+            matrix: (天数, 特征数) 数组
+
+        Returns:
+            tuple: (分数数组, 等级索引数组, 各特征贡献矩阵)
+        """
+        normalized = np.clip((matrix - self.low) / self.span, 0.0, 1.0)
+        contributions = normalized * self.weights * 100
+        scores = contributions.sum(axis=1)
+        levels = (scores >= self.thresholds["medium"]).astype(int) + (scores >= self.thresholds["high"])
+        return scores, levels, contributions
+
+    def assess(self, matrix, top=2):
+        """
+        评分并整理为每天一个字典：分数、等级和贡献最大的因素
+        """
+        scores, levels, contributions = self.score(matrix)
+        order = np.argsort(-contributions, axis=1)[:, :top]
+        assessments = []
+        for i in range(len(scores)):
+            factors = [self.features[self.names[j]]["label"] for j in order[i] if contributions[i, j] >= 1]
+            assessments.append({
+                "score": round(float(scores[i]), 1),
+                "level": LEVELS[levels[i]],
+                "factors": factors
+            })
+        return assessments
+
+
+def feature_matrix(results):
+    return np.array([day_features(r, i == len(results) - 1) for i, r in enumerate(results)], dtype=float)
+
+
+def score_catalog(catalog, model=None):
+    """
+    为多个行程一次性评分
+
+    Args:
+        catalog: 行程分析结果列表的列表
+        model: RiskModel（默认读取 risk_model.json）
+
+    Returns:
+        list: 与 catalog 对应的每天评估结果
+    """
+    model = model or RiskModel.load()
+    sizes = [len(results) for results in catalog]
+    if not sum(sizes):
+        return [[] for _ in catalog]
+    matrix = np.concatenate([feature_matrix(results) for results in catalog if results])
+    assessments = model.assess(matrix)
+    offsets = np.cumsum([0] + sizes)
+    return [assessments[offsets[i]:offsets[i + 1]] for i in range(len(catalog))]
+
+
+def score_results(results, model=None):
+    """
+    为单个行程的每天评分
+    """
+    return score_catalog([results], model)[0]
+
+
+def attach_risk_scores(catalog, model=None):
+    """
+    评分并写入结果（"风险评分"、"风险等级"、"风险因素" 字段）
+
+    Returns:
+        list: 原 catalog
+    """
+    for results, assessments in zip(catalog, score_catalog(catalog, model)):
+        for result, assessment in zip(results, assessments):
+            result["风险评分"] = assessment["score"]
+            result["风险等级"] = assessment["level"]
+            result["风险因素"] = assessment["factors"]
+    return catalog
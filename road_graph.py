@@ -0,0 +1,618 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地路网路线规划
+不依赖网络和高德配额：把区域路网载入为紧凑的 CSR 数组，按速度配置（冬季/夏季）预先计算
+收缩层次（Contraction Hierarchies），之后点到点和经途经点的查询只需要在很小的上行图中
+做双向搜索，返回结果的格式与 travel_analyzer.get_driving_route 相同
+
+路网来源：
+- 随项目附带的 road_graph.json：西藏、新疆主要干线的骨架路网（里程为近似值）
+- OpenStreetMap XML 导出文件（.osm），例如用 osmium 从 Geofabrik 的中国数据中裁出的西藏/新疆区域
+
+预计算结果保存在 road_graph.<速度配置>.npz，路网文件改变后自动重新计算
+
+使用方法：
+    python road_graph.py 拉萨市 林芝八一镇
+    python road_graph.py 日喀则市 西藏自治区日喀则市 --via 佩枯措观景台 阿玛直米雪山
+    python road_graph.py --graph tibet.osm --profile winter --build
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from gazetteer import KDTree, chord_to_km, get_gazetteer, to_xyz
+from reconciliation import is_coordinate
+
+# 路网数据与本模块放在一起，不依赖当前目录（定时任务可能在任何目录下运行）
+ROAD_GRAPH_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "road_graph.json")
+ROAD_GRAPH_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "road_graph.{profile}.npz")
+CACHE_VERSION = 1
+
+# 各等级道路的平均车速（公里/小时）；冬季考虑积雪、结冰和限速
+SPEED_PROFILES = {
+    "summer": {"motorway": 100, "trunk": 70, "primary": 60, "secondary": 50,
+               "tertiary": 40, "unclassified": 30, "residential": 25, "track": 20},
+    "winter": {"motorway": 85, "trunk": 55, "primary": 45, "secondary": 38,
+               "tertiary": 30, "unclassified": 22, "residential": 20, "track": 12},
+}
+# 翻越垭口的路段在此基础上再降速
+PASS_FACTORS = {"summer": 0.9, "winter": 0.7}
+DEFAULT_PROFILE = "winter"
+ROAD_CLASSES = tuple(SPEED_PROFILES[DEFAULT_PROFILE])
+
+# 起终点不在路网节点上时，按直线距离 × 绕行系数、低速接驳
+SNAP_ROAD_FACTOR = 1.3
+SNAP_SPEED_KMH = 30
+MAX_SNAP_KM = 50
+
+WITNESS_SETTLE_LIMIT = 200  # 收缩时见证路径搜索最多访问的节点数，越大捷径越少但预计算越慢
+
+
+def haversine_km(lng1, lat1, lng2, lat2):
+    lng1, lat1, lng2, lat2 = map(math.radians, (lng1, lat1, lng2, lat2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+
+def to_csr(n, sources, columns):
+    """
+    按起点排序边，返回 (indptr, 排序后的各列)
+    """
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    return indptr, [np.asarray(column)[order] for column in columns]
+
+
+class RoadGraph:
+    """
+    有向路网：节点坐标、节点名称和 CSR 格式的边（终点、长度、道路等级、是否翻越垭口）
+    """
+
+    def __init__(self, coords, names, sources, targets, length_km, road_class, is_pass):
+        self.coords = np.asarray(coords, dtype=float)   # (节点数, 2)，经度、纬度
+        self.names = list(names)                        # 节点名称，没有名称的节点为 ""
+        self.indptr, (self.targets, self.length_km, self.road_class, self.is_pass) = to_csr(
+            len(self.coords), np.asarray(sources, dtype=np.int64),
+            [np.asarray(targets, dtype=np.int64), np.asarray(length_km, dtype=float),
+             np.asarray(road_class, dtype=np.int8), np.asarray(is_pass, dtype=bool)])
+
+    @property
+    def node_count(self):
+        return len(self.coords)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def sources(self):
+        return np.repeat(np.arange(self.node_count), np.diff(self.indptr))
+
+    def edge_seconds(self, profile=DEFAULT_PROFILE):
+        """
+        按速度配置计算每条边的行驶时间（秒）
+        """
+        speeds = np.array([SPEED_PROFILES[profile][c] for c in ROAD_CLASSES], dtype=float)
+        kmh = speeds[self.road_class] * np.where(self.is_pass, PASS_FACTORS[profile], 1.0)
+        return self.length_km / kmh * 3600
+
+    @classmethod
+    def from_json(cls, path=ROAD_GRAPH_FILE):
+        """
+        读取骨架路网：{"nodes": {名称: "经度,纬度"}, "edges": [[起点, 终点, 公里, 道路等级, 垭口名称(可选)]]}
+        边均为双向
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        names = list(data["nodes"])
+        index = {name: i for i, name in enumerate(names)}
+        coords = [tuple(map(float, data["nodes"][name].split(','))) for name in names]
+        sources, targets, length_km, road_class, is_pass = [], [], [], [], []
+        for edge in data["edges"]:
+            a, b, km, road = edge[:4]
+            for u, v in ((a, b), (b, a)):
+                sources.append(index[u])
+                targets.append(index[v])
+                length_km.append(km)
+                road_class.append(ROAD_CLASSES.index(road))
+                is_pass.append(len(edge) > 4)
+        return cls(coords, names, sources, targets, length_km, road_class, is_pass)
+
+    @classmethod
+    def from_osm(cls, path):
+        """
+        读取 OpenStreetMap XML：保留 ROAD_CLASSES 中的道路（含 *_link 匝道），遵守 oneway，
+        与 mountain_pass=yes 节点相连的路段按垭口路段处理
+        """
+        positions, passes, ways = {}, set(), []
+        for _, elem in ET.iterparse(path, events=("end",)):
+            if elem.tag == "node":
+                positions[elem.get("id")] = (float(elem.get("lon")), float(elem.get("lat")))
+                if any(tag.get("k") == "mountain_pass" and tag.get("v") == "yes" for tag in elem.iter("tag")):
+                    passes.add(elem.get("id"))
+                elem.clear()
+            elif elem.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                road = tags.get("highway", "").replace("_link", "")
+                if road in ROAD_CLASSES:
+                    refs = [nd.get("ref") for nd in elem.iter("nd")]
+                    ways.append((refs, road, tags.get("oneway")))
+                elem.clear()
+
+        index, coords, names = {}, [], []
+
+        def node(ref):
+            if ref not in index:
+                index[ref] = len(coords)
+                coords.append(positions[ref])
+                names.append("")
+            return index[ref]
+
+        sources, targets, length_km, road_class, is_pass = [], [], [], [], []
+        for refs, road, oneway in ways:
+            refs = [ref for ref in refs if ref in positions]
+            for a, b in zip(refs, refs[1:]):
+                km = haversine_km(*positions[a], *positions[b])
+                pairs = {"yes": [(a, b)], "1": [(a, b)], "-1": [(b, a)]}.get(oneway, [(a, b), (b, a)])
+                for u, v in pairs:
+                    sources.append(node(u))
+                    targets.append(node(v))
+                    length_km.append(km)
+                    road_class.append(ROAD_CLASSES.index(road))
+                    is_pass.append(a in passes or b in passes)
+        return cls(coords, names, sources, targets, length_km, road_class, is_pass)
+
+    @classmethod
+    def load(cls, path=ROAD_GRAPH_FILE):
+        if path.endswith(".osm"):
+            return cls.from_osm(path)
+        return cls.from_json(path)
+
+
+def contract(n, sources, targets, weights, lengths):
+    """
+    计算收缩层次：按边差（新增捷径数 - 删除的边数 + 已收缩的邻居数）依次收缩节点，
+    两个邻居之间没有更短的见证路径时添加经过该节点的捷径
+
+    Returns:
+        tuple: (rank, 上行边列表, 下行边列表)，边为 (节点, 相邻节点, 秒, 公里, 中间节点或-1)；
+               上行边 v->x 和下行边 x->v 都满足 rank[x] > rank[v]
+    """
+    out = [dict() for _ in range(n)]
+    inc = [dict() for _ in range(n)]
+
+    def add_edge(u, v, w, km, mid):
+        if u != v and (v not in out[u] or w < out[u][v][0]):
+            out[u][v] = inc[v][u] = (w, km, mid)
+
+    for u, v, w, km in zip(sources, targets, weights, lengths):
+        add_edge(int(u), int(v), float(w), float(km), -1)
+
+    def witness_distances(source, skip, limit):
+        dist = {source: 0.0}
+        heap = [(0.0, source)]
+        settled = 0
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            settled += 1
+            if d > limit or settled > WITNESS_SETTLE_LIMIT:
+                break
+            for y, (w, _, _) in out[x].items():
+                if y != skip and d + w < dist.get(y, math.inf):
+                    dist[y] = d + w
+                    heapq.heappush(heap, (d + w, y))
+        return dist
+
+    def shortcuts(v):
+        found = []
+        if not out[v]:
+            return found
+        max_out = max(w for w, _, _ in out[v].values())
+        for u, (w1, km1, _) in inc[v].items():
+            dist = witness_distances(u, v, w1 + max_out)
+            for x, (w2, km2, _) in out[v].items():
+                if x != u and dist.get(x, math.inf) > w1 + w2:
+                    found.append((u, x, w1 + w2, km1 + km2))
+        return found
+
+    deleted = [0] * n
+
+    def priority(v):
+        return len(shortcuts(v)) - len(out[v]) - len(inc[v]) + deleted[v]
+
+    heap = [(priority(v), v) for v in range(n)]
+    heapq.heapify(heap)
+    rank = [0] * n
+    contracted = [False] * n
+    up, down = [], []
+    order = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contracted[v]:
+            continue
+        current = priority(v)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, v))  # 优先级已过期，放回去重新排序
+            continue
+
+        for u, x, w, km in shortcuts(v):
+            add_edge(u, x, w, km, v)
+        rank[v] = order
+        order += 1
+        contracted[v] = True
+        for x, (w, km, mid) in out[v].items():
+            up.append((v, x, w, km, mid))
+            del inc[x][v]
+            deleted[x] += 1
+        for u, (w, km, mid) in inc[v].items():
+            down.append((v, u, w, km, mid))
+            del out[u][v]
+            deleted[u] += 1
+        out[v], inc[v] = {}, {}
+    return rank, up, down
+
+
+class ContractionHierarchy:
+    """
+    收缩层次的查询结构：每个节点的上行邻接表（正向搜索）和下行邻接表（反向搜索）
+    """
+
+    def __init__(self, rank, up, down):
+        self.rank = list(rank)
+        n = len(self.rank)
+        self.up = [dict() for _ in range(n)]
+        self.down = [dict() for _ in range(n)]
+        for table, edges in ((self.up, up), (self.down, down)):
+            for v, x, w, km, mid in edges:
+                table[int(v)][int(x)] = (float(w), float(km), int(mid))
+
+    @classmethod
+    def build(cls, graph, profile=DEFAULT_PROFILE):
+        rank, up, down = contract(graph.node_count, graph.sources(), graph.targets,
+                                  graph.edge_seconds(profile), graph.length_km)
+        return cls(rank, up, down)
+
+    def to_arrays(self):
+        arrays = {"rank": np.array(self.rank, dtype=np.int64)}
+        for label, table in (("up", self.up), ("down", self.down)):
+            rows = [(v, x, w, km, mid) for v, edges in enumerate(table) for x, (w, km, mid) in edges.items()]
+            columns = list(zip(*rows)) or [(), (), (), (), ()]
+            for key, column, dtype in zip(("node", "other", "seconds", "km", "mid"), columns,
+                                          (np.int64, np.int64, float, float, np.int64)):
+                arrays[f"{label}_{key}"] = np.array(column, dtype=dtype)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        edges = {}
+        for label in ("up", "down"):
+            edges[label] = zip(*(arrays[f"{label}_{key}"].tolist() for key in ("node", "other", "seconds", "km", "mid")))
+        return cls(arrays["rank"].tolist(), edges["up"], edges["down"])
+
+    def query(self, source, target, with_path=False):
+        """
+        双向搜索最短行驶时间
+
+        Args:
+            with_path: 是否把捷径展开为原始路网的节点路径
+
+        Returns:
+            tuple: (秒, 公里, 节点路径或None)，不可达时返回 None
+        """
+        if source == target:
+            return 0.0, 0.0, [source] if with_path else None
+        dist = ({source: 0.0}, {target: 0.0})
+        parent = ({source: None}, {target: None})
+        heaps = ([(0.0, source)], [(0.0, target)])
+        tables = (self.up, self.down)
+        best, meeting = math.inf, None
+        while heaps[0] or heaps[1]:
+            for side in (0, 1):
+                heap = heaps[side]
+                if not heap:
+                    continue
+                d, v = heapq.heappop(heap)
+                if d >= best:
+                    heap.clear()  # 这一侧不会再找到更短的路径
+                    continue
+                if d > dist[side][v]:
+                    continue
+                if v in dist[1 - side] and d + dist[1 - side][v] < best:
+                    best, meeting = d + dist[1 - side][v], v
+                for x, (w, _, _) in tables[side][v].items():
+                    if d + w < dist[side].get(x, math.inf):
+                        dist[side][x] = d + w
+                        parent[side][x] = v
+                        heapq.heappush(heap, (d + w, x))
+        if meeting is None:
+            return None
+
+        forward, v = [], meeting
+        while v is not None:
+            forward.append(v)
+            v = parent[0][v]
+        backward, v = [], parent[1][meeting]
+        while v is not None:
+            backward.append(v)
+            v = parent[1][v]
+        nodes = forward[::-1] + backward
+        km = sum(self.edge(a, b)[1] for a, b in zip(nodes, nodes[1:]))
+        if not with_path:
+            return best, km, None
+        path = [nodes[0]]
+        for a, b in zip(nodes, nodes[1:]):
+            path.extend(self.unpack(a, b)[1:])
+        return best, km, path
+
+    def edge(self, a, b):
+        if b in self.up[a]:
+            return self.up[a][b]
+        return self.down[b][a]
+
+    def unpack(self, a, b):
+        """
+        把捷径 a->b 展开为原始路网中的节点序列
+        """
+        nodes, stack = [a], [(a, b)]
+        while stack:
+            u, v = stack.pop()
+            mid = self.edge(u, v)[2]
+            if mid < 0:
+                nodes.append(v)
+            else:
+                stack.extend([(mid, v), (u, mid)])  # 先展开前半段
+        return nodes
+
+
+def graph_signature(path):
+    """
+    路网文件的签名（用于判断预计算结果是否过期），文件不存在时返回 None
+    """
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return f"{CACHE_VERSION}:{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+class LocalRouter:
+    """
+    本地路线规划：地名用离线地名库解析，坐标吸附到最近的路网节点后在收缩层次上查询
+    """
+
+    def __init__(self, graph, hierarchy, profile=DEFAULT_PROFILE, gazetteer=None):
+        self.graph = graph
+        self.hierarchy = hierarchy
+        self.profile = profile
+        self.gazetteer = gazetteer or get_gazetteer()
+        self.node_names = {name: i for i, name in enumerate(graph.names) if name}
+        self.tree = KDTree((to_xyz(f"{lng},{lat}"), i) for i, (lng, lat) in enumerate(graph.coords.tolist()))
+        self._adjacency = None  # 绕行查询用的原始邻接表，第一次需要时才构建
+
+    @classmethod
+    def load(cls, path=ROAD_GRAPH_FILE, profile=DEFAULT_PROFILE, cache_file=None, log=print):
+        """
+        读取路网；预计算结果与路网文件匹配时直接使用，否则重新计算并保存
+        """
+        cache_file = cache_file or ROAD_GRAPH_CACHE.format(profile=profile)
+        signature = graph_signature(path)
+        if signature is None:
+            log(f"⚠️  路网文件不存在: {path}")
+            raise FileNotFoundError(path)
+        graph = RoadGraph.load(path)
+        if os.path.exists(cache_file):
+            with np.load(cache_file) as cached:
+                if str(cached["signature"]) == signature:
+                    return cls(graph, ContractionHierarchy.from_arrays(cached), profile)
+
+        start = time.perf_counter()
+        hierarchy = ContractionHierarchy.build(graph, profile)
+        log(f"🛣️  路网预计算完成: {graph.node_count} 个节点, {graph.edge_count} 条边, "
+            f"用时 {time.perf_counter() - start:.1f} 秒")
+        np.savez_compressed(cache_file, signature=np.array(signature), **hierarchy.to_arrays())
+        return cls(graph, hierarchy, profile)
+
+    def geocode(self, name):
+        """
+        地名 -> "经度,纬度"，只查本地数据
+        """
+        if name in self.node_names:
+            lng, lat = self.graph.coords[self.node_names[name]]
+            return f"{lng:.6f},{lat:.6f}"
+        return self.gazetteer.lookup(name)
+
+    def snap(self, location):
+        """
+        Returns:
+            tuple: (最近的路网节点, 直线距离公里)
+        """
+        [(chord, node)] = self.tree.nearest(to_xyz(location))
+        return node, chord_to_km(chord)
+
+    def _resolve(self, points):
+        """
+        把地点解析并吸附到路网节点
+
+        Returns:
+            list: [(坐标, 节点, 直线接驳公里)]，有地点无法定位时返回 None
+        """
+        resolved = []
+        for point in points:
+            location = point if is_coordinate(point) else self.geocode(point)
+            if not location:
+                return None
+            node, km = self.snap(location)
+            if km > MAX_SNAP_KM:
+                return None  # 与高德API一样，无法定位的地点直接返回失败
+            resolved.append((location, node, km))
+        return resolved
+
+    def route(self, origin, destination, waypoints=None):
+        """
+        查询路线，参数和返回值同 travel_analyzer.get_driving_route
+        """
+        resolved = self._resolve([origin] + list(waypoints or []) + [destination])
+        if resolved is None:
+            return None
+
+        access_km = sum(km for _, _, km in resolved) * SNAP_ROAD_FACTOR
+        seconds, distance = access_km / SNAP_SPEED_KMH * 3600, access_km
+        for (_, a, _), (_, b, _) in zip(resolved, resolved[1:]):
+            leg = self.hierarchy.query(a, b)
+            if leg is None:
+                return None
+            seconds += leg[0]
+            distance += leg[1]
+        duration = seconds / 60
+        return {
+            "distance_km": round(distance, 1),
+            "duration_minutes": round(duration, 1),
+            "duration_hours": round(duration / 60, 1),
+            "unresolved": []
+        }
+
+    def route_avoiding(self, origin, destination, waypoints=None, blocked=()):
+        """
+        绕开指定路段查询路线。收缩层次的捷径可能经过这些路段，所以在原始路网上用 Dijkstra 搜索，
+        只在需要绕行时使用
+
+        Args:
+            blocked: 不可通行的边 {(起点节点, 终点节点)}
+
+        Returns:
+            dict: 同 route()，另有 "nodes"（依次经过的路网节点）；无法绕行时返回 None
+        """
+        resolved = self._resolve([origin] + list(waypoints or []) + [destination])
+        if resolved is None:
+            return None
+        if self._adjacency is None:
+            seconds = self.graph.edge_seconds(self.profile).tolist()
+            km = self.graph.length_km.tolist()
+            targets = self.graph.targets.tolist()
+            indptr = self.graph.indptr.tolist()
+            self._adjacency = [[(targets[e], seconds[e], km[e]) for e in range(indptr[u], indptr[u + 1])]
+                               for u in range(self.graph.node_count)]
+
+        blocked = set(blocked)
+        access_km = sum(km for _, _, km in resolved) * SNAP_ROAD_FACTOR
+        total_seconds, distance = access_km / SNAP_SPEED_KMH * 3600, access_km
+        nodes = [resolved[0][1]]
+        for (_, source, _), (_, target, _) in zip(resolved, resolved[1:]):
+            dist, parent = {source: (0.0, 0.0)}, {source: None}
+            heap = [(0.0, source)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if u == target:
+                    break
+                if d > dist[u][0]:
+                    continue
+                for v, w, km in self._adjacency[u]:
+                    if (u, v) not in blocked and d + w < dist.get(v, (math.inf,))[0]:
+                        dist[v] = (d + w, dist[u][1] + km)
+                        parent[v] = u
+                        heapq.heappush(heap, (d + w, v))
+            if target not in dist:
+                return None
+            total_seconds += dist[target][0]
+            distance += dist[target][1]
+            leg, v = [], target
+            while v != source:
+                leg.append(v)
+                v = parent[v]
+            nodes.extend(leg[::-1])
+        duration = total_seconds / 60
+        return {
+            "distance_km": round(distance, 1),
+            "duration_minutes": round(duration, 1),
+            "duration_hours": round(duration / 60, 1),
+            "unresolved": [],
+            "nodes": nodes
+        }
+
+    def route_path(self, origin, destination, waypoints=None):
+        """
+        查询路线的几何形状
+
+        Returns:
+            list: 沿路线的点 [(经度, 纬度, 累计秒, 累计公里)]，无法规划时返回 None
+        """
+        resolved = self._resolve([origin] + list(waypoints or []) + [destination])
+        if resolved is None:
+            return None
+
+        coords = self.graph.coords.tolist()
+        seconds = distance = 0.0
+        points = []
+        for i, (location, node, snap_km) in enumerate(resolved):
+            if i > 0:
+                leg = self.hierarchy.query(resolved[i - 1][1], node, with_path=True)
+                if leg is None:
+                    return None
+                path = leg[2]
+                for u, v in zip(path, path[1:]):
+                    w, km, _ = self.hierarchy.edge(u, v)
+                    seconds += w
+                    distance += km
+                    points.append((*coords[v], seconds, distance))
+            # 地点与路网节点之间的接驳段，每个地点只计一次（与 route() 一致）
+            access_km = snap_km * SNAP_ROAD_FACTOR
+            if i > 0:
+                seconds += access_km / SNAP_SPEED_KMH * 3600
+                distance += access_km
+            points.append((*map(float, location.split(',')), seconds, distance))
+            if i == 0:
+                seconds += access_km / SNAP_SPEED_KMH * 3600
+                distance += access_km
+                points.append((*coords[node], seconds, distance))
+        return points
+
+
+_ROUTERS = {}
+
+
+def get_router(path=ROAD_GRAPH_FILE, profile=DEFAULT_PROFILE):
+    """
+    按路网文件和速度配置缓存路线规划器，第一次使用时才读取和预计算
+    """
+    key = (path, profile)
+    if key not in _ROUTERS:
+        _ROUTERS[key] = LocalRouter.load(path, profile)
+    return _ROUTERS[key]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地路网路线规划")
+    parser.add_argument("origin", nargs="?", help="起点（地名或 \"经度,纬度\"）")
+    parser.add_argument("destination", nargs="?", help="终点")
+    parser.add_argument("--via", nargs="*", default=[], help="途经点")
+    parser.add_argument("--graph", default=ROAD_GRAPH_FILE, help="路网文件（.json 骨架路网或 .osm）")
+    parser.add_argument("--profile", choices=sorted(SPEED_PROFILES), default=DEFAULT_PROFILE, help="速度配置")
+    parser.add_argument("--build", action="store_true", help="只做预计算")
+    args = parser.parse_args(argv)
+
+    router = get_router(args.graph, args.profile)
+    print(f"🛣️  路网: {router.graph.node_count} 个节点, {router.graph.edge_count} 条边（{args.profile}）")
+    if args.build or not (args.origin and args.destination):
+        return 0
+
+    start = time.perf_counter()
+    result = router.route(args.origin, args.destination, args.via)
+    elapsed = (time.perf_counter() - start) * 1000
+    if not result:
+        print(f"❌ 无法规划路线: {args.origin} -> {args.destination}")
+        return 1
+    print(f"✓ {result['distance_km']:.1f} km, {result['duration_hours']:.1f} 小时（查询 {elapsed:.2f} ms）")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
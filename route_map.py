@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告中的路线地图
+每天的路线几何形状（本地路网规划的路线）用 Douglas-Peucker 算法按几个缩放级别分层简化，
+再用 Google 折线编码压缩成字符串，嵌入 HTML 报告；页面用 Leaflet 绘制高德底图（坐标同为 GCJ-02），
+缩放时换用对应层级的折线，地图滚动到可见时才初始化，手机上也能流畅显示
+
+使用方法：
+    python route_map.py   # 输出每层的点数和编码后的大小
+"""
+
+import json
+
+import numpy as np
+
+from gazetteer import EARTH_RADIUS_KM
+
+# 分层：(起始缩放级别, 简化容差公里)，缩放级别越高越精细
+LOD_TIERS = ((0, 2.0), (8, 0.3), (11, 0.03))
+PRECISION = 5  # 坐标保留 5 位小数（约 1 米），与 Google 折线编码的默认精度一致
+
+LEAFLET_CSS = "https://cdn.jsdelivr.net/npm/leaflet@1.9.4/dist/leaflet.css"
+LEAFLET_JS = "https://cdn.jsdelivr.net/npm/leaflet@1.9.4/dist/leaflet.js"
+TILE_URL = "https://webrd0{s}.is.autonavi.com/appmaptile?lang=zh_cn&size=1&scale=1&style=8&x={x}&y={y}&z={z}"
+DAY_COLORS = ("#e6194b", "#3cb44b", "#4363d8", "#f58231", "#911eb4", "#42d4f4", "#f032e6", "#9a6324", "#800000")
+
+
+def simplify(points, tolerance_km):
+    """
+    Douglas-Peucker 折线简化（非递归），距离在局部平面坐标中计算
+
+    Args:
+        points: [[经度, 纬度], ...]
+
+    Returns:
+        list: 保留的点（首尾一定保留）
+    """
+    if len(points) < 3:
+        return [list(point) for point in points]
+    coords = np.asarray(points, dtype=float)
+    scale = np.radians(1) * EARTH_RADIUS_KM
+    xy = np.column_stack([coords[:, 0] * scale * np.cos(np.radians(coords[:, 1].mean())), coords[:, 1] * scale])
+    keep = np.zeros(len(coords), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(coords) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = xy[first], xy[last]
+        inner = xy[first + 1:last]
+        direction = end - start
+        length = np.hypot(*direction)
+        if length == 0:
+            distance = np.hypot(*(inner - start).T)
+        else:
+            offset = inner - start
+            distance = np.abs(direction[0] * offset[:, 1] - direction[1] * offset[:, 0]) / length
+        index = int(distance.argmax())
+        if distance[index] > tolerance_km:
+            middle = first + 1 + index
+            keep[middle] = True
+            stack += [(first, middle), (middle, last)]
+    return coords[keep].tolist()
+
+
+def encode_polyline(points, precision=PRECISION):
+    """
+    Google 折线编码，points 为 [[经度, 纬度], ...]（编码顺序为纬度在前）
+    """
+    factor = 10 ** precision
+    chunks = []
+    previous = (0, 0)
+    for lng, lat in points:
+        current = (round(lat * factor), round(lng * factor))
+        for value in (current[0] - previous[0], current[1] - previous[1]):
+            value = ~(value << 1) if value < 0 else value << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        previous = current
+    return "".join(chunks)
+
+
+def decode_polyline(text, precision=PRECISION):
+    """
+    encode_polyline 的逆运算，返回 [[经度, 纬度], ...]
+    """
+    factor = 10 ** precision
+    points, index, lat, lng = [], 0, 0, 0
+    while index < len(text):
+        deltas = []
+        for _ in range(2):
+            result = shift = 0
+            while True:
+                byte = ord(text[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append([lng / factor, lat / factor])
+    return points
+
+
+def encode_tiers(points):
+    """
+    按 LOD_TIERS 分层简化并编码
+
+    Returns:
+        dict: {"lines": [每层的编码字符串], "bounds": [[南, 西], [北, 东]]}
+    """
+    coords = np.asarray(points, dtype=float)
+    return {
+        "lines": [encode_polyline(simplify(points, tolerance)) for _, tolerance in LOD_TIERS],
+        "bounds": [[float(coords[:, 1].min()), float(coords[:, 0].min())],
+                   [float(coords[:, 1].max()), float(coords[:, 0].max())]]
+    }
+
+
+def attach_route_maps(results, itinerary, router=None):
+    """
+    为每天写入 "路线地图" 字段（encode_tiers 的返回值），路线无法规划时为 None
+
+    Returns:
+        int: 有地图的天数
+    """
+    if router is None:
+        from road_graph import get_router
+        router = get_router()
+    count = 0
+    for result, item in zip(results, itinerary):
+        path = router.route_path(item["origin"], item["destination"], item.get("waypoints"))
+        result["路线地图"] = encode_tiers([point[:2] for point in path]) if path else None
+        count += result["路线地图"] is not None
+    return count
+
+
+def map_data(results):
+    """
+    嵌入页面的地图数据
+    """
+    days = []
+    for day, result in enumerate(results, 1):
+        if result.get("路线地图"):
+            days.append(dict(result["路线地图"], day=day, label=f"Day {day} {result['行程']}",
+                             color=DAY_COLORS[(day - 1) % len(DAY_COLORS)]))
+    return {"tiers": [zoom for zoom, _ in LOD_TIERS], "tiles": TILE_URL, "days": days}
+
+
+MAP_SCRIPT = """
+    <script>
+        (function () {
+            const data = __MAP_DATA__;
+
+            // Google 折线编码解码，返回 [[纬度, 经度], ...]
+            function decode(text) {
+                const points = [];
+                let index = 0, lat = 0, lng = 0;
+                while (index < text.length) {
+                    const deltas = [];
+                    for (let axis = 0; axis < 2; axis++) {
+                        let result = 0, shift = 0, byte;
+                        do {
+                            byte = text.charCodeAt(index++) - 63;
+                            result |= (byte & 0x1f) << shift;
+                            shift += 5;
+                        } while (byte >= 0x20);
+                        deltas.push(result & 1 ? ~(result >> 1) : result >> 1);
+                    }
+                    lat += deltas[0];
+                    lng += deltas[1];
+                    points.push([lat / 1e5, lng / 1e5]);
+                }
+                return points;
+            }
+
+            function tierFor(zoom) {
+                let tier = 0;
+                data.tiers.forEach(function (minZoom, i) { if (zoom >= minZoom) tier = i; });
+                return tier;
+            }
+
+            function drawMap(element, days) {
+                const map = L.map(element, { scrollWheelZoom: false });
+                L.tileLayer(data.tiles, { subdomains: '1234', maxZoom: 18, attribution: '© 高德地图' }).addTo(map);
+                const lines = days.map(function (day) {
+                    return {
+                        day: day,
+                        decoded: {},
+                        layer: L.polyline([], { color: day.color, weight: 4, opacity: 0.85 }).bindTooltip(day.label).addTo(map)
+                    };
+                });
+                // 按当前缩放级别换用对应层级的折线，解码结果按层缓存
+                function update() {
+                    const tier = tierFor(map.getZoom());
+                    lines.forEach(function (line) {
+                        if (!line.decoded[tier]) line.decoded[tier] = decode(line.day.lines[tier]);
+                        line.layer.setLatLngs(line.decoded[tier]);
+                    });
+                }
+                const bounds = L.latLngBounds(days[0].bounds);
+                days.forEach(function (day) { bounds.extend(day.bounds); });
+                map.fitBounds(bounds, { padding: [20, 20] });
+                map.on('zoomend', update);
+                update();
+            }
+
+            document.addEventListener('DOMContentLoaded', function () {
+                if (typeof L === 'undefined') return;  // Leaflet 未能加载（离线打开）时不显示地图
+                const init = function (element) {
+                    const ids = element.dataset.days.split(',').map(Number);
+                    const days = data.days.filter(function (day) { return ids.indexOf(day.day) >= 0; });
+                    if (days.length) drawMap(element, days);
+                };
+                const elements = document.querySelectorAll('.route-map');
+                // 滚动到附近时才初始化地图，避免一次加载全部底图
+                if ('IntersectionObserver' in window) {
+                    const observer = new IntersectionObserver(function (entries) {
+                        entries.forEach(function (entry) {
+                            if (entry.isIntersecting) {
+                                observer.unobserve(entry.target);
+                                init(entry.target);
+                            }
+                        });
+                    }, { rootMargin: '200px' });
+                    elements.forEach(function (element) { observer.observe(element); });
+                } else {
+                    elements.forEach(init);
+                }
+            });
+        })();
+    </script>
+"""
+
+
+def map_head():
+    return f"""
+    <link rel="stylesheet" href="{LEAFLET_CSS}">
+    <script src="{LEAFLET_JS}"></script>"""
+
+
+def map_section(results):
+    """
+    路线地图部分的 HTML（全程地图 + 每天一张），没有地图数据时返回空字符串
+    """
+    data = map_data(results)
+    if not data["days"]:
+        return ""
+    all_days = ",".join(str(day["day"]) for day in data["days"])
+    cards = "".join(f"""
+                    <div class="route-map-card">
+                        <div class="route-map-title" style="border-left-color: {day['color']}">{day['label']}</div>
+                        <div class="route-map route-map-day" data-days="{day['day']}"></div>
+                    </div>""" for day in data["days"])
+    script = MAP_SCRIPT.replace("__MAP_DATA__", json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return f"""
+            <!-- 路线地图 -->
+            <div class="section">
+                <h2 class="section-title">🧭 路线地图</h2>
+                <div class="route-map route-map-trip" data-days="{all_days}"></div>
+                <div class="route-map-grid">{cards}
+                </div>
+            </div>
+            {script}"""
+
+
+MAP_STYLE = """
+        .route-map { width: 100%; border-radius: 10px; background: #eef1f7; }
+        .route-map-trip { height: 420px; margin-bottom: 20px; }
+        .route-map-day { height: 220px; }
+        .route-map-grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(280px, 1fr)); gap: 15px; }
+        .route-map-title { font-size: 0.9em; font-weight: bold; margin-bottom: 6px; padding-left: 8px; border-left: 4px solid; }
+"""
+
+
+def main():
+    from road_graph import get_router
+    from travel_analyzer import ITINERARY
+
+    router = get_router()
+    results = [{"行程": item["route"]} for item in ITINERARY]
+    attach_route_maps(results, ITINERARY, router)
+    total = 0
+    for day, result in enumerate(results, 1):
+        if not result["路线地图"]:
+            print(f"  Day {day}: 无法规划路线")
+            continue
+        sizes = [len(line) for line in result["路线地图"]["lines"]]
+        points = [len(decode_polyline(line)) for line in result["路线地图"]["lines"]]
+        total += sum(sizes)
+        print(f"  Day {day}: " + " / ".join(f"{p} 点 {s} B" for p, s in zip(points, sizes)))
+    print(f"🧭 编码后共 {total / 1024:.1f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
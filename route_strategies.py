@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多策略路线比较
+高德驾车路线规划按 strategy 参数返回不同的路线（速度优先、距离优先、不走快速路等）。
+启用多个策略时每段路线的各个策略同时请求，结果全部写入校正缓存，
+再按选择规则为每天选定一条路线，其余策略作为备选列在结果中：
+- fastest: 时间最短
+- shortest: 距离最短
+- least_risk: 风险最低（先看当天有效的封闭路段，再用 risk_scoring 的模型按时间、距离、
+  海拔（有 DEM 数据时取路线上的最高点）和管制路段评分，分数相同时取时间最短）
+
+每条备选路线只保存简化后的折线（route_map 的折线编码），缓存中的结果也能按日期重新评估封路
+
+使用方法：
+    python route_strategies.py --strategies 0,2,3 --policy least_risk
+"""
+
+import argparse
+
+import numpy as np
+
+from closures import get_closure_index
+from elevation import get_dem
+from risk_scoring import RiskModel, day_features
+from route_map import decode_polyline, encode_polyline, simplify
+
+STRATEGY_LABELS = {
+    "0": "速度优先",
+    "1": "费用优先",
+    "2": "距离优先",
+    "3": "不走快速路",
+    "4": "躲避拥堵",
+}
+POLICIES = {"fastest": "时间最短", "shortest": "距离最短", "least_risk": "风险最低"}
+POLYLINE_TOLERANCE_KM = 0.3  # 备选路线折线的简化容差，远小于封路缓冲区宽度
+
+
+def parse_strategies(value):
+    """
+    "0,2,3" -> ["0", "2", "3"]（去重，保持顺序）
+    """
+    strategies = list(dict.fromkeys(s.strip() for s in str(value).split(",") if s.strip()))
+    unknown = [s for s in strategies if s not in STRATEGY_LABELS]
+    if unknown or not strategies:
+        raise ValueError(f"未知的路线策略: {','.join(unknown) or value}（可选 {','.join(STRATEGY_LABELS)}）")
+    return strategies
+
+
+def label(strategy):
+    return STRATEGY_LABELS.get(strategy, f"策略{strategy}")
+
+
+def path_summary(path):
+    """
+    高德路线结果中的一条路径 -> 距离、时间和简化后的折线
+    """
+    points = []
+    for step in path.get("steps", []):
+        for pair in (step.get("polyline") or "").split(";"):
+            if pair:
+                point = [float(v) for v in pair.split(",")]
+                if not points or point != points[-1]:
+                    points.append(point)
+    distance = float(path.get("distance", 0)) / 1000
+    duration = float(path.get("duration", 0)) / 60
+    return {
+        "distance_km": round(distance, 1),
+        "duration_minutes": round(duration, 1),
+        "duration_hours": round(duration / 60, 1),
+        "polylines": [encode_polyline(simplify(points, POLYLINE_TOLERANCE_KM))] if len(points) > 1 else []
+    }
+
+
+def merge_alternatives(go, back):
+    """
+    往返行程：把去程和返程中都有的策略合并为一天的备选路线
+    """
+    if not go or not back:
+        return None
+    merged = {}
+    for strategy in go:
+        if strategy in back:
+            a, b = go[strategy], back[strategy]
+            merged[strategy] = {
+                "distance_km": a["distance_km"] + b["distance_km"],
+                "duration_hours": a["duration_hours"] + b["duration_hours"],
+                "duration_minutes": a["duration_minutes"] + b["duration_minutes"],
+                "polylines": a.get("polylines", []) + b.get("polylines", [])
+            }
+    return merged or None
+
+
+def alternative_risks(item, alternatives, model=None, index=None, dem=None):
+    """
+    在当天的日期下评估每条备选路线的风险
+
+    Returns:
+        dict: {策略: {"closed": 封闭路段数, "restricted": 管制路段数, "max_altitude": 最高海拔或None, "score": 风险分}}
+    """
+    model = model or RiskModel.load()
+    index = index if index is not None else get_closure_index()
+    dem = dem if dem is not None else get_dem()
+    is_last = bool(item.get("flight_time") or item.get("deadline"))
+    risks, rows = {}, []
+    for strategy, alternative in alternatives.items():
+        lines = [decode_polyline(text) for text in alternative.get("polylines", [])]
+        hits = {}
+        for points in lines:
+            for hit in index.check(points, item["date"]):
+                hits[hit["id"]] = hit["severity"]
+        altitude = None
+        if len(dem) and lines:
+            coords = np.asarray([point for points in lines for point in points], dtype=float)
+            samples = dem.sample(coords[:, 0], coords[:, 1])
+            if np.isfinite(samples).any():
+                altitude = float(np.nanmax(samples))
+        risk = {
+            "closed": sum(1 for severity in hits.values() if severity == "closed"),
+            "restricted": sum(1 for severity in hits.values() if severity == "restricted"),
+            "max_altitude": altitude
+        }
+        features = day_features({
+            "实际时间(小时)": alternative["duration_hours"],
+            "实际距离(km)": alternative["distance_km"],
+            "估算时间(小时)": item.get("estimated_time"),
+            "行程": item.get("route", ""),
+            "起点": item.get("origin", ""),
+            "终点": item.get("destination", ""),
+            "最高海拔(m)": altitude
+        }, is_last)
+        if risk["restricted"]:
+            features[6] = max(features[6], model.features["closure"]["high"])  # 经过管制路段按封路概率上限计
+        rows.append(features)
+        risks[strategy] = risk
+    scores, _, _ = model.score(np.array(rows, dtype=float))
+    for risk, score in zip(risks.values(), scores):
+        risk["score"] = round(float(score), 1)
+    return risks
+
+
+def choose(item, alternatives, policy="fastest"):
+    """
+    按选择规则选定一条路线
+
+    Returns:
+        tuple: (策略, least_risk 时为 alternative_risks 的结果，否则为 None)
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"未知的路线选择规则: {policy}（可选 {', '.join(POLICIES)}）")
+    if policy == "shortest":
+        return min(alternatives, key=lambda s: (alternatives[s]["distance_km"], alternatives[s]["duration_hours"])), None
+    if policy == "fastest":
+        return min(alternatives, key=lambda s: (alternatives[s]["duration_hours"], alternatives[s]["distance_km"])), None
+    risks = alternative_risks(item, alternatives)
+    return min(alternatives, key=lambda s: (risks[s]["closed"], risks[s]["score"],
+                                            alternatives[s]["duration_hours"])), risks
+
+
+def apply_policy(item, api_result, policy="fastest"):
+    """
+    按选择规则把路线结果换成选定的策略
+
+    Returns:
+        tuple: (路线结果, 结果中的备选路线列)
+    """
+    alternatives = api_result["alternatives"]
+    chosen, risks = choose(item, alternatives, policy)
+    columns = {"路线策略": f"{label(chosen)}（{POLICIES[policy]}）"}
+    for strategy, alternative in alternatives.items():
+        name = label(strategy)
+        columns[f"{name}(小时)"] = alternative["duration_hours"]
+        columns[f"{name}(km)"] = alternative["distance_km"]
+        if risks:
+            columns[f"{name}(风险)"] = risks[strategy]["score"]
+    selected = {key: alternatives[chosen][key] for key in ("distance_km", "duration_hours", "duration_minutes")}
+    return dict(api_result, strategy=chosen, **selected), columns
+
+
+def main(argv=None):
+    import time
+    import travel_analyzer
+
+    parser = argparse.ArgumentParser(description="多策略路线比较")
+    parser.add_argument("--strategies", type=parse_strategies, default="0,2,3", help="逗号分隔的高德路线策略（默认 0,2,3）")
+    parser.add_argument("--policy", choices=list(POLICIES), default=travel_analyzer.ROUTE_POLICY,
+                        help="每天选择路线的规则")
+    args = parser.parse_args(argv)
+
+    travel_analyzer.use_strategies(args.strategies, args.policy)
+    if travel_analyzer.active_backend().name != "amap":
+        print("⚠️  多策略比较需要高德地图API（请配置 AMAP_API_KEY 或指向 amap_mock_server.py）")
+        return 1
+    print(f"🔀 路线策略: {', '.join(label(s) for s in travel_analyzer.ROUTE_STRATEGIES)}，"
+          f"按{POLICIES[args.policy]}选择")
+    for item in travel_analyzer.ITINERARY:
+        start = time.perf_counter()
+        result, _ = travel_analyzer.analyze_day(item, log=lambda message: None)
+        elapsed = time.perf_counter() - start
+        choices = "  ".join(f"{label(s)} {result.get(f'{label(s)}(小时)', '-')}h/{result.get(f'{label(s)}(km)', '-')}km"
+                            for s in travel_analyzer.ROUTE_STRATEGIES)
+        print(f"  Day {item['day']}: {result.get('路线策略', '估算值')}  {choices}  ({elapsed:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
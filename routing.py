@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+路线规划后端
+行程分析和可行性服务只依赖 route(origin, destination, waypoints) 和 geocode(name) 两个函数，
+具体由哪个后端提供，可以用 --router 参数或 ROUTING_BACKEND 环境变量选择：
+- amap: 高德地图API（默认，由 travel_analyzer 提供）
+- local: 本地路网（road_graph.py），不需要网络和API配额
+- offline: 离线估算模型（estimator.py），只按直线距离和分区系数估算，未配置API Key 时自动使用
+"""
+
+from collections import namedtuple
+
+# route 的返回值格式同 travel_analyzer.get_driving_route，失败时返回 None
+# remote 为 True 的后端需要访问网络、消耗API配额（请求节奏由 key_pool 控制），
+# 预筛选、调用预算和服务的并发数（按 Key 数量增加）只对这类后端生效
+Backend = namedtuple("Backend", "name label route geocode remote", defaults=(False,))
+
+_FACTORIES = {}
+_BACKENDS = {}
+
+
+def register_backend(name, factory):
+    """
+    注册后端，factory() 在第一次使用时才调用，返回 Backend
+    """
+    _FACTORIES[name] = factory
+    _BACKENDS.pop(name, None)
+
+
+def backend_names():
+    return sorted(_FACTORIES)
+
+
+def get_backend(name):
+    if name not in _BACKENDS:
+        if name not in _FACTORIES:
+            raise ValueError(f"未知的路线规划后端: {name}（可选: {', '.join(backend_names())}）")
+        _BACKENDS[name] = _FACTORIES[name]()
+    return _BACKENDS[name]
+
+
+def _amap_backend():
+    import travel_analyzer
+    return travel_analyzer.amap_backend()
+
+
+def _local_backend():
+    # 路网和预计算结果较大，只在选择本地后端时才载入
+    from road_graph import get_router
+    router = get_router()
+    return Backend("local", "本地路网", router.route, router.geocode)
+
+
+def _offline_backend():
+    from estimator import get_estimator
+    estimator = get_estimator()
+    return Backend("offline", "离线估算模型", estimator.route, estimator.geocode)
+
+
+register_backend("amap", _amap_backend)
+register_backend("local", _local_backend)
+register_backend("offline", _offline_backend)
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行程方案对比（what-if）
+在基础行程上应用一组声明式修改，生成多个方案并行评估，按总行车时间和风险排序输出对比表。
+所有方案的每一天一起放进线程池分析：与基础行程相同的天直接命中校正缓存，
+各方案共用一个路段缓存，同一路段（包括正在查询中的）只调用一次路线规划后端
+
+修改项（changes 列表中的每一项）：
+    {"op": "flight", "date": "12-31", "time": "20:00"}      返程航班改期（date 可写 YYYY-MM-DD 或 MM-DD）
+    {"op": "sleep_at", "day": 7, "place": "萨嘎县"}         第 7 天改住某地，第 8 天从该地出发
+    {"op": "skip", "place": "墨脱"}                          不去某地：从途经点中删除；是住宿地时与下一天合并
+    {"op": "set", "day": 5, "fields": {"depart": "07:00"}}   直接修改某天的字段
+
+起终点或途经点被修改的天，参考距离和时间改用离线估算模型（estimator.py）的结果，
+原来手写的风险提示不再适用，一并清除
+
+使用方法：
+    python scenarios.py --flight 12-31 --sleep 7:萨嘎县 --skip 墨脱   # 每个参数是一个方案
+    python scenarios.py whatif.json --router local --sort risk
+    whatif.json 格式: {"scenarios": [{"name": "航班延后一天", "changes": [{"op": "flight", "date": "12-31"}]}]}
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from copy import deepcopy
+from datetime import date
+
+import travel_analyzer
+from api_metrics import METRICS
+from closures import attach_closures
+from delay_simulation import DEFAULT_SEED, attach_delay_risk
+from elevation import attach_elevation
+from estimator import get_estimator
+from reconciliation import day_key, leg_key
+from risk_scoring import score_catalog
+from routing import backend_names
+
+MAX_WORKERS = 16         # 同时分析的天数
+MAX_CONCURRENCY = 4      # 每个API Key 同时进行的远程API请求数，与可行性服务相同
+SIMULATION_TRIALS = 20_000  # 各方案使用相同的随机种子，结果之间可以直接比较
+STOP_FIELDS = ("origin", "destination", "waypoints", "waypoint_coords")
+WEEKDAYS = ("周一", "周二", "周三", "周四", "周五", "周六", "周日")
+
+
+class LegCache:
+    """
+    各方案共用的路段和地理编码缓存，线程安全；同一个键正在查询时，其他线程等待同一个结果
+    """
+
+    def __init__(self, backend, max_concurrency=MAX_CONCURRENCY):
+        self.backend = backend
+        self.lock = threading.Lock()
+        # 远程后端限制并发，避免触发QPS限制
+        self.semaphore = (threading.Semaphore(max_concurrency * len(travel_analyzer.api_keys()))
+                          if backend.remote else None)
+        self.legs = {}
+        self.geocodes = {}
+        self.fetched = 0
+        self.hits = 0
+
+    def _memo(self, table, key, fetch, *args):
+        with self.lock:
+            future = table.get(key)
+            owner = future is None
+            if owner:
+                future = table[key] = Future()
+                self.fetched += 1
+            else:
+                self.hits += 1
+        METRICS.observe_cache("scenario_leg" if table is self.legs else "scenario_geocode", not owner)
+        if owner:
+            try:
+                if self.semaphore:
+                    with self.semaphore:
+                        result = fetch(*args)
+                else:
+                    result = fetch(*args)
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            future.set_result(result)
+        return future.result()
+
+    def route(self, origin, destination, waypoints=None):
+        return self._memo(self.legs, leg_key(origin, destination, waypoints),
+                          self.backend.route, origin, destination, waypoints)
+
+    def geocode(self, name):
+        return self._memo(self.geocodes, name, self.backend.geocode, name)
+
+
+def _matches(name, place):
+    return place in name or name in place
+
+
+def _find_day(itinerary, day):
+    for index, item in enumerate(itinerary):
+        if item["day"] == day:
+            return index
+    raise ValueError(f"行程中没有 Day {day}")
+
+
+def _relabel(label, index, place):
+    """
+    替换路线描述（"A → B → C"）中的第 index 个地点
+    """
+    names = label.split(" → ")
+    names[index] = place
+    return " → ".join(names)
+
+
+def _parse_date(value, year):
+    # 支持 2024-12-31、12-31 和 12/31
+    parts = [int(part) for part in re.split(r"[-/]", value)]
+    if len(parts) == 2:
+        parts = [year] + parts
+    return date(*parts)
+
+
+def _restop(item, changed):
+    # 起终点或途经点被修改：参考值和手写的风险提示不再适用
+    item.pop("reference", None)
+    item.pop("risk", None)
+    changed[id(item)] = item
+
+
+def _flight(itinerary, change, changed, notes):
+    last = itinerary[-1]
+    last_date = date.fromisoformat(last["date"])
+    flight_date = _parse_date(change["date"], last_date.year)
+    if flight_date < last_date:
+        raise ValueError(f"航班日期 {flight_date} 早于最后一天行程 {last_date}")
+    if flight_date == last_date:
+        last["flight_time"] = change.get("time") or last.get("flight_time")
+        if not last["flight_time"]:
+            raise ValueError("航班改期需要指定起飞时间 time")
+        notes.append(f"航班 {flight_date} {last['flight_time']}")
+        return
+    # 航班在行程结束之后：最后一天不再有当天的起飞时间限制
+    last.pop("flight_time", None)
+    last.pop("deadline", None)
+    notes.append(f"航班改为 {flight_date}，最后一天之后留出 {(flight_date - last_date).days} 天")
+
+
+def _sleep_at(itinerary, change, changed, notes):
+    index = _find_day(itinerary, change["day"])
+    if index == len(itinerary) - 1:
+        raise ValueError(f"Day {change['day']} 是最后一天，没有住宿")
+    place = change["place"]
+    item, following = itinerary[index], itinerary[index + 1]
+    item["destination"] = item["accommodation"] = place
+    item["route"] = _relabel(item["route"], -1, place)
+    following["origin"] = place
+    following["route"] = _relabel(following["route"], 0, place)
+    _restop(item, changed)
+    _restop(following, changed)
+    notes.append(f"Day {change['day']} 住{place}")
+
+
+def _skip(itinerary, change, changed, notes):
+    place = change["place"]
+    if _matches(itinerary[0]["origin"], place) or _matches(itinerary[-1]["destination"], place):
+        raise ValueError(f"{place} 是行程的起点或终点，不能跳过")
+    found = False
+    for item in itinerary:
+        waypoints = item.get("waypoints") or []
+        keep = [i for i, wp in enumerate(waypoints) if not _matches(wp, place)]
+        if len(keep) < len(waypoints):
+            item["waypoints"] = [waypoints[i] for i in keep]
+            if item.get("waypoint_coords"):
+                item["waypoint_coords"] = [item["waypoint_coords"][i] for i in keep]
+            item["route"] = " → ".join(name for name in item["route"].split(" → ") if not _matches(name, place))
+            _restop(item, changed)
+            found = True
+
+    # 住宿地：与下一天合并为一天，下一天的日期空出来
+    index = next((i for i, item in enumerate(itinerary[:-1]) if _matches(item["destination"], place)), None)
+    if index is not None:
+        item, following = itinerary[index], itinerary[index + 1]
+        waypoints = []
+        for name in (item.get("waypoints") or []) + (following.get("waypoints") or []):
+            if not _matches(name, place) and (not waypoints or waypoints[-1] != name):
+                waypoints.append(name)
+        names = item["route"].split(" → ") + following["route"].split(" → ")[1:]
+        labels = []
+        for name in names:
+            if not _matches(name, place) and (not labels or labels[-1] != name):
+                labels.append(name)
+        merged = dict(following, day=item["day"], date=item["date"], weekday=item["weekday"],
+                      origin=item["origin"], waypoints=waypoints, route=" → ".join(labels),
+                      activities=f"{item['activities']}；{following['activities']}")
+        merged.pop("waypoint_coords", None)
+        itinerary[index:index + 2] = [merged]
+        for day, later in enumerate(itinerary, 1):
+            later["day"] = day
+        _restop(merged, changed)
+        notes.append(f"不去{place}，{following['date']} 空出一天")
+    elif found:
+        notes.append(f"不去{place}")
+    else:
+        raise ValueError(f"行程中没有经过 {place}")
+
+
+def _set(itinerary, change, changed, notes):
+    item = itinerary[_find_day(itinerary, change["day"])]
+    fields = change["fields"]
+    item.update(deepcopy(fields))
+    if any(field in fields for field in STOP_FIELDS):
+        _restop(item, changed)
+    notes.append(f"Day {change['day']} " + "，".join(f"{k}={v}" for k, v in fields.items()))
+
+
+OPERATIONS = {"flight": _flight, "sleep_at": _sleep_at, "skip": _skip, "set": _set}
+
+
+def apply_changes(base, changes):
+    """
+    在基础行程的副本上依次应用修改
+
+    Returns:
+        tuple: (新行程, 修改说明列表)
+    """
+    itinerary = deepcopy(base)
+    changed, notes = {}, []
+    for change in changes:
+        if change.get("op") not in OPERATIONS:
+            raise ValueError(f"未知的修改: {change.get('op')}（可选: {', '.join(OPERATIONS)}）")
+        OPERATIONS[change["op"]](itinerary, change, changed, notes)
+
+    # 被修改的天用离线估算作为参考值；地点不在离线地名库中时不设参考值
+    items = [item for item in changed.values() if any(item is later for later in itinerary)]
+    for item, estimate in zip(items, get_estimator().estimate_days(items)):
+        if estimate:
+            item["estimated_distance"] = estimate["distance_km"]
+            item["estimated_time"] = estimate["duration_hours"]
+        else:
+            item["estimated_distance"] = item["estimated_time"] = 0
+            notes.append(f"Day {item['day']} 没有离线参考值")
+    for item in itinerary:
+        item["weekday"] = WEEKDAYS[date.fromisoformat(item["date"]).weekday()]
+    return itinerary, notes
+
+
+def _summary(results, itinerary, base_keys, assessments):
+    hours = [r["实际时间(小时)"] for r in results]
+    scores = [a["score"] for a in assessments]
+    return {
+        "days": len(results),
+        "changed_days": sum(1 for item in itinerary if day_key(item) not in base_keys),
+        "total_km": round(sum(r["实际距离(km)"] for r in results), 1),
+        "total_hours": round(sum(hours), 1),
+        "max_hours": max(hours),
+        "risk_total": round(sum(scores), 1),
+        "risk_max": max(scores),
+        "high_days": sum(1 for a in assessments if a["level"] == "high"),
+        "miss_probability": results[-1].get("误机概率"),
+        "issues": len(travel_analyzer.assess_feasibility(results)["issues"]),
+        # 没有路线数据、也没有参考值的天，总时间不可信
+        "incomplete": sum(1 for r in results if r["数据来源"] == "estimate" and not r["估算时间(小时)"])
+    }
+
+
+def evaluate_scenarios(scenarios, base=None, trials=SIMULATION_TRIALS, max_workers=MAX_WORKERS):
+    """
+    并行评估多个方案（第一个固定为基础行程）
+
+    Args:
+        scenarios: [{"name": 名称, "changes": [修改项, ...]}, ...]
+        base: 基础行程（默认 ITINERARY）
+
+    Returns:
+        tuple: (方案列表 [{"name", "notes", "itinerary", "results", "summary"}], LegCache)
+    """
+    base = base or travel_analyzer.ITINERARY
+    variants = [{"name": "当前行程", "notes": [], "itinerary": deepcopy(base)}]
+    for scenario in scenarios:
+        itinerary, notes = apply_changes(base, scenario.get("changes", []))
+        variants.append({"name": scenario["name"], "notes": notes, "itinerary": itinerary})
+
+    backend = travel_analyzer.active_backend()
+    cache = LegCache(backend)
+    reconciler = travel_analyzer.reconciler_for(backend.name)
+    prefilter = travel_analyzer.PREFILTER and backend.remote
+    estimator = get_estimator()
+
+    def analyze(item, estimate):
+        result, _ = travel_analyzer.analyze_day(item, route=cache.route, geocode=cache.geocode,
+                                                log=lambda *args: None, reconciler=reconciler, estimate=estimate,
+                                                backend=backend)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scenario") as executor:
+        for variant in variants:
+            itinerary = variant["itinerary"]
+            estimates = estimator.estimate_days(itinerary) if prefilter else [None] * len(itinerary)
+            variant["futures"] = [executor.submit(analyze, item, estimate)
+                                  for item, estimate in zip(itinerary, estimates)]
+        for variant in variants:
+            variant["results"] = [future.result() for future in variant.pop("futures")]
+
+    for variant in variants:
+        results, itinerary = variant["results"], variant["itinerary"]
+        attach_closures(results, itinerary, log=lambda *args: None)
+        attach_elevation(results, itinerary, log=lambda *args: None)
+        attach_delay_risk(results, itinerary, trials=trials, seed=DEFAULT_SEED)
+
+    base_keys = {day_key(item) for item in base}
+    catalog = score_catalog([variant["results"] for variant in variants])
+    for variant, assessments in zip(variants, catalog):
+        variant["summary"] = _summary(variant["results"], variant["itinerary"], base_keys, assessments)
+    return variants, cache
+
+
+def rank(variants, by="time"):
+    """
+    排序：数据不完整的方案排在最后，其余按总行车时间（by="time"）或风险总分（by="risk"）
+    """
+    def key(variant):
+        s = variant["summary"]
+        order = (s["total_hours"], s["risk_total"]) if by == "time" else (s["risk_total"], s["total_hours"])
+        return (s["incomplete"] > 0,) + order
+    return sorted(variants, key=key)
+
+
+def print_comparison(variants, cache):
+    print("=" * 80)
+    print("方案对比")
+    print("=" * 80)
+    print(f"{'#':>2} {'天数':>4} {'总里程':>8} {'总行车':>7} {'最长':>5} {'风险总分':>8} {'高风险':>6} "
+          f"{'误机':>5} {'问题':>4}  方案")
+    for i, variant in enumerate(variants, 1):
+        s = variant["summary"]
+        miss = f"{s['miss_probability']:.0%}" if s["miss_probability"] is not None else "-"
+        flag = " ⚠️ 数据不完整" if s["incomplete"] else ""
+        print(f"{i:>2} {s['days']:>4} {s['total_km']:>8.1f} {s['total_hours']:>7.1f} {s['max_hours']:>5.1f} "
+              f"{s['risk_total']:>8.1f} {s['high_days']:>6} {miss:>5} {s['issues']:>4}  {variant['name']}{flag}")
+        if variant["notes"]:
+            print(f"{'':>42}  {'；'.join(variant['notes'])}（变化 {s['changed_days']} 天）")
+    print()
+    total = cache.fetched + cache.hits
+    print(f"🔀 路段和地理编码查询 {total} 次，调用路线规划后端 {cache.fetched} 次，其余命中缓存")
+    print("=" * 80)
+
+
+def shorthand_scenarios(args):
+    """
+    把 --flight/--sleep/--skip 参数转换为方案，每个参数一个方案
+    """
+    scenarios = []
+    for value in args.flight or []:
+        scenarios.append({"name": f"航班改为 {value}", "changes": [{"op": "flight", "date": value}]})
+    for value in args.sleep or []:
+        day, _, place = value.partition(":")
+        if not day.isdigit() or not place:
+            raise ValueError(f"--sleep 的格式应为 天:地点，例如 7:萨嘎县（收到 {value}）")
+        scenarios.append({"name": f"Day {day} 住{place}",
+                          "changes": [{"op": "sleep_at", "day": int(day), "place": place}]})
+    for value in args.skip or []:
+        scenarios.append({"name": f"不去{value}", "changes": [{"op": "skip", "place": value}]})
+    return scenarios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="行程方案对比（what-if）")
+    parser.add_argument("scenario_file", nargs="?", help="方案JSON文件，格式见模块说明")
+    parser.add_argument("--base", help="基础行程JSON文件（默认使用 travel_analyzer.ITINERARY）")
+    parser.add_argument("--flight", action="append", help="方案：返程航班改到某天，例如 12-31")
+    parser.add_argument("--sleep", action="append", help="方案：某天改住某地，例如 7:萨嘎县")
+    parser.add_argument("--skip", action="append", help="方案：不去某地，例如 墨脱")
+    parser.add_argument("--sort", choices=["time", "risk"], default="time", help="按总行车时间或风险总分排序")
+    parser.add_argument("--trials", type=int, default=SIMULATION_TRIALS, help="每个方案的延误模拟试验次数")
+    parser.add_argument("--output", help="把各方案的行程和结果保存为JSON")
+    parser.add_argument("--router", choices=backend_names(), help="路线规划后端（默认 ROUTING_BACKEND）")
+    parser.add_argument("--prefilter", action="store_true", default=None,
+                        help="先离线估算，只对估算结果可能影响可行性判断的天调用API")
+    args = parser.parse_args(argv)
+
+    if args.router:
+        travel_analyzer.use_backend(args.router)
+    if args.prefilter is not None:
+        travel_analyzer.use_prefilter(args.prefilter)
+
+    base = None
+    if args.base:
+        with open(args.base, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+    try:
+        scenarios = []
+        if args.scenario_file:
+            with open(args.scenario_file, 'r', encoding='utf-8') as f:
+                scenarios = json.load(f)["scenarios"]
+        scenarios += shorthand_scenarios(args)
+        if not scenarios:
+            parser.error("需要方案文件，或至少一个 --flight/--sleep/--skip 参数")
+        print(f"🔀 评估 {len(scenarios) + 1} 个方案（{travel_analyzer.active_backend().label}）...")
+        variants, cache = evaluate_scenarios(scenarios, base, trials=args.trials)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+
+    ranked = rank(variants, args.sort)
+    print_comparison(ranked, cache)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump([{key: variant[key] for key in ("name", "notes", "summary", "itinerary", "results")}
+                       for variant in ranked], f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已保存到 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+沿途停靠点查找与长途日拆分
+对行车时间超过上限的天，用本地路网取得当天路线的几何形状，沿路线按固定里程取样，
+在地名库的空间索引中查询走廊范围内可住宿的地点，再选出拆分点，使拆分后每段的行车时间
+都不超过上限：优先段数最少，其次最长一段最短
+
+路网只用来确定停靠点在路线上的位置（所占比例），各段时间按当天的实际行车时间折算，
+所以无论实际时间来自高德还是本地路网，拆分结果都与分析结果一致
+"""
+
+import math
+
+from gazetteer import get_gazetteer
+
+MAX_DRIVE_HOURS = 8       # 与可行性分析中"长途驾驶日"的标准一致
+CORRIDOR_KM = 20          # 距路线多远以内的地点可以作为停靠点
+SAMPLE_KM = 5             # 沿路线取样的间距
+DETOUR_SPEED_KMH = 30     # 从路线绕到停靠点的车速
+STOP_SERVICE = "lodging"  # 过夜停靠点需要的服务
+
+
+def sample_route(points, step_km=SAMPLE_KM):
+    """
+    沿路线按固定里程插值取样
+
+    Args:
+        points: road_graph.LocalRouter.route_path 的返回值
+
+    Returns:
+        list: [("经度,纬度", 里程比例)]
+    """
+    total_km = points[-1][3]
+    if total_km <= 0:
+        return []
+    samples = []
+    for (lng1, lat1, _, km1), (lng2, lat2, _, km2) in zip(points, points[1:]):
+        steps = max(1, math.ceil((km2 - km1) / step_km))
+        for i in range(steps):
+            t = i / steps
+            samples.append((f"{lng1 + (lng2 - lng1) * t:.6f},{lat1 + (lat2 - lat1) * t:.6f}",
+                            (km1 + (km2 - km1) * t) / total_km))
+    lng, lat = points[-1][:2]
+    samples.append((f"{lng:.6f},{lat:.6f}", 1.0))
+    return samples
+
+
+def find_stops(points, gazetteer=None, corridor_km=CORRIDOR_KM, service=STOP_SERVICE):
+    """
+    查找路线走廊内提供指定服务的地点
+
+    同一地点被路线多次经过（往返行程）时，每次经过都是一个候选
+
+    Returns:
+        list: [{"name", "location", "services", "fraction", "offset_km"}]，按 fraction 排序
+    """
+    gazetteer = gazetteer or get_gazetteer()
+    stops, active = [], {}
+    for location, fraction in sample_route(points):
+        nearby = {}
+        for place, km in gazetteer.within(location, corridor_km):
+            if service in place.get("services", []):
+                nearby[place["name"]] = (place, km)
+        for name in list(active):
+            if name not in nearby:
+                del active[name]  # 离开了该地点的走廊，下次再进入算新的一次经过
+        for name, (place, km) in nearby.items():
+            stop = active.get(name)
+            if stop is None:
+                stop = active[name] = {"name": name, "location": place["location"],
+                                       "services": place.get("services", []), "offset_km": math.inf}
+                stops.append(stop)
+            if km < stop["offset_km"]:
+                stop["offset_km"] = km
+                stop["fraction"] = fraction
+    for stop in stops:
+        stop["offset_km"] = round(stop["offset_km"], 1)
+    return sorted(stops, key=lambda stop: stop["fraction"])
+
+
+def choose_splits(stops, total_hours, limit_hours=MAX_DRIVE_HOURS):
+    """
+    选择拆分点：在每段不超过上限的方案中，段数最少，其次最长一段最短
+
+    Returns:
+        list: 选中的停靠点（带 "position_hours"、"detour_hours"），无法满足上限时返回 None
+    """
+    nodes = [{"position_hours": 0.0, "detour_hours": 0.0}]
+    for stop in stops:
+        nodes.append(dict(stop, position_hours=stop["fraction"] * total_hours,
+                          detour_hours=stop["offset_km"] / DETOUR_SPEED_KMH))
+    nodes.append({"position_hours": total_hours, "detour_hours": 0.0})
+
+    def segment_hours(i, j):
+        return (nodes[j]["position_hours"] - nodes[i]["position_hours"]
+                + nodes[i]["detour_hours"] + nodes[j]["detour_hours"])
+
+    # best[j] = (段数, 最长一段小时数, 上一个节点)
+    best = [None] * len(nodes)
+    best[0] = (0, 0.0, None)
+    for j in range(1, len(nodes)):
+        for i in range(j):
+            if best[i] is None or nodes[j]["position_hours"] <= nodes[i]["position_hours"]:
+                continue
+            hours = segment_hours(i, j)
+            if hours > limit_hours:
+                continue
+            candidate = (best[i][0] + 1, max(best[i][1], hours), i)
+            if best[j] is None or candidate[:2] < best[j][:2]:
+                best[j] = candidate
+    if best[-1] is None:
+        return None
+
+    chosen, j = [], best[-1][2]
+    while j:
+        chosen.append(nodes[j])
+        j = best[j][2]
+    return chosen[::-1]
+
+
+def plan_day_split(item, hours, distance_km, limit_hours=MAX_DRIVE_HOURS, router=None, gazetteer=None):
+    """
+    为一天生成拆分方案
+
+    Args:
+        item: 行程中的一天
+        hours, distance_km: 当天的实际行车时间和距离
+        router: road_graph.LocalRouter（默认使用附带的路网）
+
+    Returns:
+        dict: {"day", "limit_hours", "stops", "segments"}，路网无法规划或沿途没有合适的停靠点时返回 None
+    """
+    if router is None:
+        from road_graph import get_router
+        router = get_router()
+    points = router.route_path(item["origin"], item["destination"], item.get("waypoints"))
+    if not points:
+        return None
+    chosen = choose_splits(find_stops(points, gazetteer), hours, limit_hours)
+    if chosen is None:
+        return None
+
+    route_names = [name.strip() for name in item["route"].split("→")]
+    boundaries = [{"name": route_names[0], "fraction": 0.0, "position_hours": 0.0, "detour_hours": 0.0}]
+    boundaries += chosen
+    boundaries.append({"name": route_names[-1], "fraction": 1.0, "position_hours": hours, "detour_hours": 0.0})
+    segments = []
+    for a, b in zip(boundaries, boundaries[1:]):
+        segments.append({
+            "from": a["name"],
+            "to": b["name"],
+            "hours": round(b["position_hours"] - a["position_hours"] + a["detour_hours"] + b["detour_hours"], 1),
+            "distance_km": round((b["fraction"] - a["fraction"]) * distance_km
+                                 + (a["detour_hours"] + b["detour_hours"]) * DETOUR_SPEED_KMH, 1)
+        })
+    return {
+        "day": item["day"],
+        "limit_hours": limit_hours,
+        "stops": [{"name": stop["name"], "location": stop["location"], "offset_km": stop["offset_km"],
+                   "fuel": "fuel" in stop["services"]} for stop in chosen],
+        "segments": segments
+    }
+
+
+def split_long_days(results, itinerary, limit_hours=MAX_DRIVE_HOURS, router=None, gazetteer=None):
+    """
+    为所有超过上限的天生成拆分方案，写入结果的 "拆分建议" 字段（无法拆分时为 None）
+
+    Returns:
+        list: 生成的拆分方案
+    """
+    plans = []
+    for result, item in zip(results, itinerary):
+        if result["实际时间(小时)"] <= limit_hours:
+            continue
+        plan = plan_day_split(item, result["实际时间(小时)"], result["实际距离(km)"], limit_hours,
+                              router, gazetteer)
+        result["拆分建议"] = plan
+        if plan:
+            plans.append(plan)
+    return plans
+
+
+def format_split(plan):
+    """
+    拆分方案 -> "日喀则 → 拉孜县（4.3小时，住宿）→ 日喀则（3.9小时）"
+    """
+    text = plan["segments"][0]["from"]
+    for segment in plan["segments"]:
+        stay = "，住宿" if segment is not plan["segments"][-1] else ""
+        text += f" → {segment['to']}（{segment['hours']:.1f}小时{stay}）"
+    return text
@@ -0,0 +1,16 @@
+import os
+import sys
+import types
+
+# 模块都在仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py 保存API Key，不在仓库中；没有时用未配置 Key 的占位配置（高德后端自动换成离线估算，测试不会访问网络）
+try:
+    import config  # noqa: F401
+except ImportError:
+    config = types.ModuleType("config")
+    config.AMAP_API_KEY = "YOUR_API_KEY_HERE"
+    config.AMAP_API_BASE_URL = "https://restapi.amap.com/v3/direction/driving"
+    config.AMAP_GEOCODE_URL = "https://restapi.amap.com/v3/geocode/geo"
+    sys.modules["config"] = config
@@ -0,0 +1,83 @@
+import contextlib
+import io
+
+import pytest
+
+import benchmark
+import call_planner
+import travel_analyzer
+from amap_mock_server import DRIVING_PATH, GEOCODE_PATH
+
+
+@pytest.fixture
+def mock_amap(monkeypatch):
+    """
+    本地高德API替身（amap_mock_server 的逻辑），按接口统计实际请求次数
+    """
+    monkeypatch.setattr(travel_analyzer, "ROUTING_BACKEND", "amap")
+    monkeypatch.setattr(travel_analyzer, "PREFILTER", False)
+    monkeypatch.setattr(travel_analyzer, "ROUTE_STRATEGIES", ["0"])
+    with benchmark.stubbed_amap() as stub:
+        counts = {"amap_geocode": 0, "amap_driving": 0}
+        handle = stub.mock.handle
+
+        def counting_handle(path, params):
+            counts[{GEOCODE_PATH: "amap_geocode", DRIVING_PATH: "amap_driving"}[path]] += 1
+            return handle(path, params)
+
+        stub.mock.handle = counting_handle
+        yield counts
+
+
+def analyze(itinerary, deferred=()):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return travel_analyzer.analyze_itinerary(itinerary, deferred=deferred)
+
+
+def test_plan_bounds_actual_calls(mock_amap):
+    plan = call_planner.plan_calls([("行程", travel_analyzer.ITINERARY)], router="amap", prefilter=False)
+    assert plan["counts"]["api"] == len(travel_analyzer.ITINERARY)
+    analyze(travel_analyzer.ITINERARY)
+    # 地名都在离线地名库中，第一次请求的次数与计划完全一致；只有数据异常的天会多出重试
+    assert mock_amap["amap_geocode"] == plan["calls"]["amap_geocode"] == 0
+    assert plan["calls"]["amap_driving"] <= mock_amap["amap_driving"] <= plan["total"] + plan["retry"]
+
+
+def test_plan_counts_each_strategy(mock_amap, monkeypatch):
+    single = call_planner.plan_calls([("行程", travel_analyzer.ITINERARY)], router="amap", prefilter=False)
+    multiple = call_planner.plan_calls([("行程", travel_analyzer.ITINERARY)], router="amap", prefilter=False,
+                                       strategies=["0", "2", "3"])
+    assert multiple["strategies"] == ["0", "2", "3"]
+    assert multiple["calls"]["amap_driving"] == 3 * single["calls"]["amap_driving"]
+    # 不指定时使用 travel_analyzer 当前的设置
+    monkeypatch.setattr(travel_analyzer, "ROUTE_STRATEGIES", ["0", "2"])
+    default = call_planner.plan_calls([("行程", travel_analyzer.ITINERARY)], router="amap", prefilter=False)
+    assert default["calls"]["amap_driving"] == 2 * single["calls"]["amap_driving"]
+
+
+def test_cached_and_duplicate_days_are_not_planned(mock_amap):
+    itineraries = [("a", travel_analyzer.ITINERARY), ("b", travel_analyzer.ITINERARY)]
+    plan = call_planner.plan_calls(itineraries, router="amap", prefilter=False)
+    assert plan["counts"]["duplicate"] == len(travel_analyzer.ITINERARY)
+
+    days = travel_analyzer.ITINERARY[:3]
+    analyze(days)
+    cached = len(travel_analyzer.reconciler_for("amap").cache)  # 校正过的天写入缓存
+    assert cached
+    plan = call_planner.plan_calls([("a", days)], router="amap", prefilter=False)
+    assert (plan["counts"]["cached"], plan["counts"]["api"]) == (cached, len(days) - cached)
+    before = sum(mock_amap.values())
+    analyze(days)
+    assert sum(mock_amap.values()) - before == plan["total"]
+
+
+@pytest.mark.parametrize("budget", [0, 5, 12])
+def test_budget_caps_actual_calls(mock_amap, budget):
+    plan = call_planner.plan_calls([("行程", travel_analyzer.ITINERARY)], budget=budget, router="amap",
+                                   prefilter=False)
+    assert plan["total"] + plan["retry"] <= budget
+    results = analyze(travel_analyzer.ITINERARY, deferred=plan["deferred"][0])
+    assert sum(mock_amap.values()) <= budget
+    sources = [result["数据来源"] for result in results]
+    # 推迟的天暂用离线估算（或核实过的参考值），其余的天都请求了API
+    assert sum(source not in ("offline", "reference") for source in sources) == len(plan["planned"])
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from closures import ClosureIndex, RTree, active_on, bbox_intersects
+
+WINTER = {"valid": [{"from": "11-15", "to": "03-31"}]}
+
+
+@pytest.mark.parametrize("day, expected", [
+    ("2024-11-14", False), ("2024-11-15", True), ("2024-12-31", True), ("2025-01-01", True),
+    ("2025-03-31", True), ("2025-04-01", False), ("2025-07-15", False),
+])
+def test_seasonal_range_wraps_year_end(day, expected):
+    assert active_on(WINTER, day) is expected
+
+
+def test_date_ranges():
+    summer = {"valid": [{"from": "06-01", "to": "08-31"}]}
+    assert active_on(summer, "2024-07-01") and not active_on(summer, "2024-12-01")
+    dated = {"valid": [{"from": "2024-12-20", "to": "2025-01-05"}]}
+    assert active_on(dated, "2025-01-01") and not active_on(dated, "2025-12-25")
+    assert active_on({}, "2024-12-25")
+
+
+def test_rtree_query_matches_brute_force():
+    rng = random.Random(7)
+    boxes = []
+    for _ in range(300):
+        lng, lat = rng.uniform(80, 100), rng.uniform(26, 36)
+        boxes.append((lng, lat, lng + rng.uniform(0, 1.5), lat + rng.uniform(0, 1.0)))
+    tree = RTree(boxes, capacity=4)
+    for _ in range(200):
+        lng, lat = rng.uniform(78, 102), rng.uniform(24, 38)
+        query = (lng, lat, lng + rng.uniform(0, 3), lat + rng.uniform(0, 2))
+        expected = [i for i, box in enumerate(boxes) if bbox_intersects(box, query)]
+        assert sorted(tree.query(query)) == expected
+
+
+def test_empty_rtree():
+    assert RTree([]).query((0, 0, 180, 90)) == []
+
+
+def test_check_filters_by_date_and_overlap():
+    index = ClosureIndex([
+        {"id": "pass", "name": "山口段", "severity": "closed", "coordinates": [[94.5, 29.6], [94.8, 29.6]],
+         **WINTER},
+        {"id": "far", "name": "远处路段", "coordinates": [[88.0, 31.0], [88.3, 31.0]]},
+    ])
+    route = [(94.3, 29.6), (95.0, 29.6)]
+    hits = index.check(route, "2025-01-10")
+    assert [hit["id"] for hit in hits] == ["pass"]
+    assert hits[0]["overlap_km"] > 20
+    assert index.check(route, "2025-06-10") == []
+    # 只在端点附近擦过缓冲区不算受影响
+    grazing = [(94.85, 29.5), (94.85, 29.7)]
+    assert index.check(grazing, "2025-01-10") == []
+    assert [hit["id"] for hit in index.check(grazing, "2025-01-10", min_overlap_km=0.5)] == ["pass"]
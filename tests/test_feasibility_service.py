@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import pytest
+
+import travel_analyzer
+from feasibility_service import RequestError, dispatch, parse_itinerary
+
+DAY = dict(travel_analyzer.ITINERARY[0])
+
+
+def body(*items, wrap=False):
+    data = {"itinerary": list(items)} if wrap else list(items)
+    return json.dumps(data, ensure_ascii=False)
+
+
+def test_valid_itineraries():
+    assert parse_itinerary("") is travel_analyzer.ITINERARY
+    assert parse_itinerary(body(DAY)) == [DAY]
+    assert parse_itinerary(body(DAY, wrap=True)) == [DAY]
+    with_waypoints = dict(DAY, waypoints=["色季拉山口"], estimated_time=1)
+    assert parse_itinerary(body(with_waypoints)) == [with_waypoints]
+    with_coords = dict(with_waypoints, waypoint_coords=["94.618362,29.610145"])
+    assert parse_itinerary(body(with_coords)) == [with_coords]
+
+
+@pytest.mark.parametrize("text, message", [
+    ("{", "不是合法的JSON"),
+    ("[]", "缺少行程数据"),
+    ('{"days": []}', "缺少行程数据"),
+    ('"Day 1"', "缺少行程数据"),
+    (body(DAY, "Day 2"), "第 2 天应为对象"),
+    (body(DAY, [DAY]), "第 2 天应为对象"),
+    (body({k: v for k, v in DAY.items() if k != "origin"}), "缺少字段: origin"),
+    (body(dict(DAY, estimated_distance="50")), "estimated_distance 应为数字"),
+    (body(dict(DAY, estimated_time=True)), "estimated_time 应为数字"),
+    (body(dict(DAY, estimated_distance=0)), "estimated_distance 应大于0"),
+    (body(dict(DAY, estimated_time=-1.5)), "estimated_time 应大于0"),
+    (body(dict(DAY, destination="")), "destination 应为地点名称或坐标"),
+    (body(dict(DAY, origin=["林芝"])), "origin 应为地点名称或坐标"),
+    (body(dict(DAY, waypoints="色季拉山口")), "waypoints 应为地点列表"),
+    (body(dict(DAY, waypoints=["色季拉山口", None])), "waypoints 应为地点列表"),
+    (body(dict(DAY, waypoint_coords="94.618362,29.610145")), "waypoint_coords 应为"),
+    (body(dict(DAY, waypoint_coords=["色季拉山口"])), "waypoint_coords 应为"),
+    (body(dict(DAY, waypoint_coords=[[94.618362, 29.610145]])), "waypoint_coords 应为"),
+    (body(dict(DAY, date="12月23日")), "日期应为 YYYY-MM-DD"),
+])
+def test_invalid_itineraries_are_rejected(text, message):
+    with pytest.raises(RequestError) as error:
+        parse_itinerary(text)
+    assert error.value.status == 400
+    assert message in str(error.value)
+
+
+@pytest.mark.parametrize("path", ["/analyze", "/feasibility"])
+def test_dispatch_rejects_before_analysis(path):
+    # 参数错误在调用服务之前返回 400，不会访问路线后端
+    with pytest.raises(RequestError) as error:
+        asyncio.run(dispatch(None, "POST", path, body(DAY, 3).encode("utf-8")))
+    assert error.value.status == 400
@@ -0,0 +1,16 @@
+import fetch_xhs_images
+
+
+def test_fully_rejected_galleries_are_reported_and_dropped(monkeypatch, capsys):
+    monkeypatch.setattr(fetch_xhs_images, "filter_valid_images",
+                        lambda images: {name: [url for url in urls if "ok" in url] for name, urls in images.items()})
+
+    filtered = fetch_xhs_images.validate_images({
+        "禾木村": ["ok1.jpg", "bad1.jpg"],
+        "白哈巴": ["bad2.jpg", "bad3.jpg"],
+        "喀纳斯景区": [],
+    })
+    assert filtered == {"禾木村": ["ok1.jpg"], "喀纳斯景区": []}
+    out = capsys.readouterr().out
+    assert "❌ 白哈巴: 所有图片均无效，保持原有图片" in out
+    assert "禾木村: 所有图片均无效" not in out and "喀纳斯景区: 所有图片均无效" not in out
@@ -0,0 +1,57 @@
+from html_patcher import build_gallery_index, patch_html_file, splice_galleries
+
+PAGE = """<html><body>
+<h4>Day 1 羊卓雍措</h4>
+<div class="image-slider">
+    <div class="slide"><div class="caption">旧图1</div><img src="a.jpg"></div>
+    <div class="slide"><img src="b.jpg"></div>
+</div>
+<div class="after">羊湖之后的内容</div>
+<h4>Day 2 纳木措</h4>
+<p>没有图库</p>
+<h4>Day 3 卡若拉冰川</h4>
+<div class="image-slider"><div class="slide"><div><div>深层嵌套</div></div></div></div>
+<footer>页脚</footer>
+</body></html>
+"""
+
+
+def test_index_spans_whole_slider_with_nested_divs():
+    index = build_gallery_index(PAGE)
+    assert [title for title, _, _ in index] == ["Day 1 羊卓雍措", "Day 3 卡若拉冰川"]
+    for _, inner_start, inner_end in index:
+        inner = PAGE[inner_start:inner_end]
+        assert inner.count("<div") == inner.count("</div>")
+        assert PAGE[inner_end:].startswith("</div>")
+    assert "旧图1" in PAGE[index[0][1]:index[0][2]] and "b.jpg" in PAGE[index[0][1]:index[0][2]]
+    assert "深层嵌套" in PAGE[index[1][1]:index[1][2]]
+
+
+def test_splice_replaces_only_slider_contents():
+    content, updated = splice_galleries(PAGE, {"羊卓雍措": "<img src=\"new1.jpg\">",
+                                               "卡若拉冰川": "<img src=\"new3.jpg\">",
+                                               "纳木措": "<img src=\"new2.jpg\">"})
+    assert sorted(updated) == ["卡若拉冰川", "羊卓雍措"]
+    assert "a.jpg" not in content and "深层嵌套" not in content
+    assert "new1.jpg" in content and "new3.jpg" in content and "new2.jpg" not in content
+    # 图库之后的内容保持不变，页面的 div 仍然配对
+    assert '<div class="after">羊湖之后的内容</div>' in content
+    assert "<footer>页脚</footer>" in content
+    assert content.count("<div") == content.count("</div>")
+    assert [title for title, _, _ in build_gallery_index(content)] == ["Day 1 羊卓雍措", "Day 3 卡若拉冰川"]
+
+
+def test_names_matching_same_heading_replace_once():
+    content, updated = splice_galleries(PAGE, {"羊卓雍措": "<i>x</i>", "羊卓": "<i>y</i>"})
+    assert updated == ["羊卓雍措"]
+    assert content.count("<i>x</i>") == 1 and "<i>y</i>" not in content
+
+
+def test_patch_html_file_writes_only_when_updated(tmp_path):
+    page = tmp_path / "page.html"
+    page.write_text(PAGE, encoding="utf-8")
+    assert patch_html_file(str(page), {"不存在的景点": "<img>"}) == []
+    assert page.read_text(encoding="utf-8") == PAGE
+    assert patch_html_file(str(page), {"卡若拉冰川": "<img src=\"c.jpg\">"}) == ["卡若拉冰川"]
+    assert "c.jpg" in page.read_text(encoding="utf-8")
+    assert [p.name for p in tmp_path.iterdir()] == ["page.html"]  # 没有残留临时文件
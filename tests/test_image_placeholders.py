@@ -0,0 +1,33 @@
+import json
+
+import image_placeholders
+from image_placeholders import build_image_metas, load_meta_cache
+
+META = {"width": 800, "height": 600, "placeholder": "data:image/jpeg;base64,AAAA"}
+
+
+def test_failed_fetches_are_not_cached(tmp_path, monkeypatch):
+    cache_file = str(tmp_path / "meta.json")
+    monkeypatch.setattr(image_placeholders, "fetch_image_meta",
+                        lambda session, url: META if url == "ok.jpg" else None)
+
+    metas = build_image_metas(["ok.jpg", "bad.jpg", "ok.jpg"], cache_file=cache_file)
+    assert metas == {"ok.jpg": META, "bad.jpg": None}
+    assert load_meta_cache(cache_file) == {"ok.jpg": META}
+
+
+def test_cached_failures_are_fetched_again(tmp_path, monkeypatch):
+    cache_file = tmp_path / "meta.json"
+    # 旧版本缓存中的失败记录
+    cache_file.write_text(json.dumps({"ok.jpg": META, "retry.jpg": None}), encoding="utf-8")
+    fetched = []
+
+    def fetch(session, url):
+        fetched.append(url)
+        return META
+
+    monkeypatch.setattr(image_placeholders, "fetch_image_meta", fetch)
+    metas = build_image_metas(["ok.jpg", "retry.jpg"], cache_file=str(cache_file))
+    assert fetched == ["retry.jpg"]
+    assert metas == {"ok.jpg": META, "retry.jpg": META}
+    assert load_meta_cache(str(cache_file)) == {"ok.jpg": META, "retry.jpg": META}
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+
+import key_pool
+from key_pool import KeyPool, next_reset
+
+
+class FakeClock:
+    """
+    替换 key_pool 的时间和等待函数：等待时直接推进时钟
+    """
+
+    def __init__(self, now=1_735_000_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds, name=None):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(key_pool, "time", SimpleNamespace(time=clock.time))
+    monkeypatch.setattr(key_pool, "timed_sleep", clock.sleep)
+    return clock
+
+
+def test_single_key_is_paced_to_qps(clock):
+    pool = KeyPool(["a" * 32], state_file=None, qps=4)
+    issued = []
+    for _ in range(6):
+        pool.acquire()
+        issued.append(clock.now)
+    assert clock.sleeps == [0.25] * 5
+    assert [round(b - a, 6) for a, b in zip(issued, issued[1:])] == [0.25] * 5
+
+
+def test_keys_are_used_in_turn_before_waiting(clock):
+    pool = KeyPool(["key-one-0000", "key-two-0000"], state_file=None, qps=1)
+    assert [pool.acquire() for _ in range(4)] == ["key-one-0000", "key-two-0000"] * 2
+    assert clock.sleeps == [1.0]  # 第三次请求时两个 Key 都要等待，等一次后两个都可用
+
+
+def test_quota_infocode_parks_key_until_reset(clock):
+    pool = KeyPool(["key-one-0000", "key-two-0000"], state_file=None, qps=0)
+    assert pool.report("key-one-0000", "10003")
+    assert {pool.acquire() for _ in range(3)} == {"key-two-0000"}
+    assert pool.report("key-two-0000", "10044")
+    assert pool.acquire() is None
+    clock.now = next_reset(clock.now) + 1
+    assert pool.acquire() in {"key-one-0000", "key-two-0000"}
+
+
+def test_qps_infocode_parks_briefly(clock):
+    pool = KeyPool(["key-one-0000"], state_file=None, qps=0)
+    assert pool.report("key-one-0000", "10021")
+    assert pool.acquire() == "key-one-0000"
+    assert clock.sleeps == [1.0]
+
+
+def test_other_infocodes_do_not_park(clock):
+    pool = KeyPool(["key-one-0000"], state_file=None, qps=0)
+    assert not pool.report("key-one-0000", "10000")
+    assert not pool.report("key-one-0000", None)
+    assert pool.acquire() == "key-one-0000" and clock.sleeps == []
+
+
+def test_daily_quota_and_shared_state_file(clock, tmp_path):
+    state_file = str(tmp_path / "usage.json")
+    first = KeyPool(["key-one-0000"], state_file=state_file, qps=0, daily_quota=3)
+    second = KeyPool(["key-one-0000"], state_file=state_file, qps=0, daily_quota=3)
+    assert first.acquire() and second.acquire() and first.acquire()
+    assert second.acquire() is None  # 两个进程共享同一份用量
+    assert second.status()[0]["count"] == 3
+    assert "key-one-0000" not in (tmp_path / "usage.json").read_text()
+    clock.now = next_reset(clock.now)
+    assert second.acquire() == "key-one-0000"
@@ -0,0 +1,92 @@
+import pytest
+
+import reconciliation
+from reconciliation import ESTIMATE_CACHE_TTL, Reconciler, is_fresh
+
+ITEM = {
+    "day": 2, "route": "拉萨 → 羊湖 → 日喀则",
+    "origin": "拉萨市", "destination": "日喀则市", "waypoints": ["羊卓雍措景区"],
+    "estimated_distance": 360, "estimated_time": 6.0,
+}
+VERIFIED = dict(ITEM, reference="amap")
+COORDS = {"西藏自治区羊卓雍措景区": "90.693565,28.956438"}
+
+
+def leg(km, hours):
+    return {"distance_km": km, "duration_hours": hours, "duration_minutes": hours * 60}
+
+
+def plan(route):
+    return route(ITEM["origin"], ITEM["destination"], ITEM["waypoints"])
+
+
+class FakeRoute:
+    """
+    途经点是地名时返回 by_name，换成坐标后返回 by_coordinate
+    """
+
+    def __init__(self, by_name, by_coordinate):
+        self.by_name, self.by_coordinate = by_name, by_coordinate
+        self.calls = []
+
+    def __call__(self, origin, destination, waypoints=None):
+        self.calls.append(list(waypoints or []))
+        if all(reconciliation.is_coordinate(wp) for wp in waypoints or []):
+            return self.by_coordinate
+        return self.by_name
+
+
+def test_plausible_result_is_used_without_retry():
+    route = FakeRoute(leg(350, 6.2), None)
+    result = Reconciler(cache_file=None).reconcile_day(ITEM, plan, route, COORDS.get, log=lambda m: None)
+    assert result["source"] == "api" and result["distance_km"] == 350
+    assert route.calls == [["羊卓雍措景区"]]
+
+
+def test_retry_with_coordinates_replaces_anomalous_result(tmp_path):
+    cache_file = tmp_path / "legs.json"
+    route = FakeRoute(leg(900, 14), leg(355, 6.1))
+    reconciler = Reconciler(cache_file=str(cache_file))
+    result = reconciler.reconcile_day(ITEM, plan, route, COORDS.get, log=lambda m: None)
+    assert result["source"] == "api_retry" and result["distance_km"] == 355
+    assert route.calls == [["羊卓雍措景区"], ["90.693565,28.956438"]]
+    # 校正结果写入缓存，下次运行直接使用
+    cached = Reconciler(cache_file=str(cache_file)).lookup(ITEM)
+    assert cached["source"] == "api_retry" and cached["distance_km"] == 355
+
+
+def test_verified_reference_falls_back_to_estimate():
+    reconciler = Reconciler(cache_file=None)
+    result = reconciler.reconcile_day(VERIFIED, plan, FakeRoute(leg(900, 14), leg(880, 13.5)), COORDS.get,
+                                      log=lambda m: None)
+    assert result["source"] == "estimate"
+    assert (result["distance_km"], result["duration_hours"]) == (360, 6.0)
+    entry = next(iter(reconciler.cache.values()))
+    assert entry["api_candidates"] == [leg(900, 14), leg(880, 13.5)]
+
+
+def test_estimate_fallback_expires():
+    reconciler = Reconciler(cache_file=None)
+    reconciler.reconcile_day(VERIFIED, plan, FakeRoute(leg(900, 14), leg(880, 13.5)), COORDS.get,
+                             log=lambda m: None)
+    entry = next(iter(reconciler.cache.values()))
+    assert reconciler.lookup(VERIFIED)["source"] == "estimate"
+    assert not is_fresh(entry, now=entry["reconciled_at"] + ESTIMATE_CACHE_TTL + 1)
+    entry["reconciled_at"] -= ESTIMATE_CACHE_TTL + 1
+    assert reconciler.lookup(VERIFIED) is None
+
+
+@pytest.mark.parametrize("retried, expected", [(leg(870, 13), ("api_retry", 870)), (None, ("api", 900))])
+def test_rough_reference_keeps_api_result(retried, expected):
+    messages = []
+    reconciler = Reconciler(cache_file=None)
+    result = reconciler.reconcile_day(ITEM, plan, FakeRoute(leg(900, 14), retried), COORDS.get, log=messages.append)
+    assert (result["source"], result["distance_km"]) == expected
+    assert any("可能不准确" in message for message in messages)
+    assert is_fresh(next(iter(reconciler.cache.values())), now=float("inf"))
+
+
+def test_unavailable_api_is_not_cached():
+    reconciler = Reconciler(cache_file=None)
+    assert reconciler.reconcile_day(ITEM, plan, FakeRoute(None, None), COORDS.get, log=lambda m: None) is None
+    assert reconciler.cache == {}
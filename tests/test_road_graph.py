@@ -0,0 +1,89 @@
+import heapq
+import math
+import random
+
+import numpy as np
+import pytest
+
+from road_graph import ROAD_CLASSES, ROAD_GRAPH_FILE, ContractionHierarchy, RoadGraph
+
+
+def dijkstra(graph, seconds, source):
+    """
+    在原始路网上做普通 Dijkstra，作为收缩层次查询的参照
+    """
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        d, v = heapq.heappop(heap)
+        if d > dist[v]:
+            continue
+        for e in range(graph.indptr[v], graph.indptr[v + 1]):
+            x, w = int(graph.targets[e]), seconds[e]
+            if d + w < dist.get(x, math.inf):
+                dist[x] = d + w
+                heapq.heappush(heap, (d + w, x))
+    return dist
+
+
+def random_graph(seed, n=40, extra_edges=60):
+    rng = random.Random(seed)
+    coords = [(rng.uniform(85, 97), rng.uniform(28, 31)) for _ in range(n)]
+    pairs = {(i, rng.randrange(i)) for i in range(1, n)}  # 生成树保证连通
+    while len(pairs) < n - 1 + extra_edges:
+        a, b = rng.sample(range(n), 2)
+        if (a, b) not in pairs and (b, a) not in pairs:
+            pairs.add((a, b))
+    sources, targets, length_km, road_class, is_pass = [], [], [], [], []
+    for a, b in pairs:
+        km, road, crossing = rng.uniform(5, 120), rng.randrange(len(ROAD_CLASSES)), rng.random() < 0.1
+        for u, v in ((a, b), (b, a)):
+            sources.append(u)
+            targets.append(v)
+            length_km.append(km)
+            road_class.append(road)
+            is_pass.append(crossing)
+    return RoadGraph(coords, [""] * n, sources, targets, length_km, road_class, is_pass)
+
+
+def assert_matches_dijkstra(graph):
+    seconds = graph.edge_seconds()
+    hierarchy = ContractionHierarchy.build(graph)
+    for source in range(graph.node_count):
+        expected = dijkstra(graph, seconds, source)
+        for target in range(graph.node_count):
+            result = hierarchy.query(source, target, with_path=True)
+            if target not in expected:
+                assert result is None
+                continue
+            best, km, path = result
+            assert best == pytest.approx(expected[target])
+            # 展开后的路径是原始路网中首尾相接的边，时间和距离与查询结果一致
+            assert path[0] == source and path[-1] == target
+            total_seconds = total_km = 0.0
+            for a, b in zip(path, path[1:]):
+                edges = [e for e in range(graph.indptr[a], graph.indptr[a + 1]) if graph.targets[e] == b]
+                assert edges
+                e = min(edges, key=lambda e: seconds[e])
+                total_seconds += seconds[e]
+                total_km += graph.length_km[e]
+            assert total_seconds == pytest.approx(best)
+            assert total_km == pytest.approx(km)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_contraction_hierarchy_matches_dijkstra_on_random_graphs(seed):
+    assert_matches_dijkstra(random_graph(seed))
+
+
+def test_contraction_hierarchy_matches_dijkstra_on_road_graph():
+    assert_matches_dijkstra(RoadGraph.from_json(ROAD_GRAPH_FILE))
+
+
+def test_unreachable_nodes_return_none():
+    graph = RoadGraph([(90, 29), (91, 29), (92, 29)], ["a", "b", "c"], [0, 1], [1, 0], [10.0, 10.0],
+                      [0, 0], [False, False])
+    hierarchy = ContractionHierarchy.build(graph)
+    assert hierarchy.query(0, 2) is None
+    assert hierarchy.query(0, 1)[0] == pytest.approx(graph.edge_seconds()[0])
+    assert np.isfinite(hierarchy.query(1, 0)[0])
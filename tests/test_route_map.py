@@ -0,0 +1,71 @@
+import math
+import random
+
+import pytest
+
+from route_map import LOD_TIERS, decode_polyline, encode_polyline, encode_tiers, simplify
+
+
+def random_walk(seed, n=500):
+    rng = random.Random(seed)
+    points, lng, lat = [], 91.1, 29.6
+    for _ in range(n):
+        lng += rng.uniform(-0.01, 0.02)
+        lat += rng.uniform(-0.01, 0.01)
+        points.append([lng, lat])
+    return points
+
+
+def test_encode_matches_reference_example():
+    # Google 折线编码文档中的示例（点按 [经度, 纬度] 传入）
+    points = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    assert encode_polyline(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@") == points
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_round_trip_keeps_five_decimals(seed):
+    points = random_walk(seed) + [[-179.99999, -89.99999], [0.0, 0.0], [179.99999, 89.99999]]
+    decoded = decode_polyline(encode_polyline(points))
+    assert len(decoded) == len(points)
+    for (lng, lat), (lng2, lat2) in zip(points, decoded):
+        assert lng2 == pytest.approx(round(lng, 5), abs=1e-9)
+        assert lat2 == pytest.approx(round(lat, 5), abs=1e-9)
+
+
+def test_empty_polyline():
+    assert encode_polyline([]) == ""
+    assert decode_polyline("") == []
+
+
+@pytest.mark.parametrize("tolerance", [tolerance for _, tolerance in LOD_TIERS])
+def test_simplify_keeps_endpoints_and_subset(tolerance):
+    points = random_walk(3)
+    simplified = simplify(points, tolerance)
+    assert simplified[0] == points[0] and simplified[-1] == points[-1]
+    # 保留的点按原顺序取自原折线
+    remaining = iter(points)
+    assert all(any(point == original for original in remaining) for point in simplified)
+    assert 2 <= len(simplified) <= len(points)
+
+
+def test_simplify_closed_loop_keeps_both_endpoints():
+    loop = [[91.0 + 0.1 * math.cos(a / 10 * 2 * math.pi), 29.6 + 0.1 * math.sin(a / 10 * 2 * math.pi)]
+            for a in range(11)]
+    simplified = simplify(loop, 0.5)
+    assert simplified[0] == loop[0] and simplified[-1] == loop[-1]
+    assert len(simplified) > 2  # 首尾重合时按到端点的距离简化，环不会退化成一个点
+
+
+def test_simplify_drops_collinear_points():
+    line = [[90.0 + i * 0.01, 29.0] for i in range(50)]
+    assert simplify(line, 0.01) == [line[0], line[-1]]
+    assert simplify(line[:2], 1.0) == line[:2]
+
+
+def test_tiers_get_coarser():
+    tiers = encode_tiers(random_walk(4))
+    sizes = [len(decode_polyline(line)) for line in tiers["lines"]]
+    assert sizes == sorted(sizes)
+    (south, west), (north, east) = tiers["bounds"]
+    assert south < north and west < east
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+西藏行程工具统一命令行入口
+
+    tibet-travel analyze [--no-input] [--router local] [--prefilter] [--plan] [--budget N] [--strategies 0,2,3]
+                         [--policy least_risk] [--flight-time 20:00] [--max-drive-hours 8] [--profile]
+    tibet-travel report [--flight-time 20:00] [--profile]
+    tibet-travel images {update,fetch,crawl,check} [--profile]
+    tibet-travel batch ITINERARY.json ... [--output-dir DIR] [--router local] [--prefilter] [--plan] [--budget N]
+                       [--strategies 0,2,3] [--policy least_risk] [--flight-time 20:00] [--max-drive-hours 8]
+    tibet-travel whatif [SCENARIOS.json] [--flight 12-31] [--sleep 7:萨嘎县] [--skip 墨脱] [--sort risk]
+    tibet-travel serve mock-amap [--port 8765 ...]
+    tibet-travel serve feasibility [--port 8790 ...]
+    tibet-travel places 羊湖 纳木错 [--near 经度,纬度 --radius 50]
+    tibet-travel keys
+
+各子命令需要的模块（requests、PIL 等）只在执行该子命令时才导入，
+所以 --help 和参数错误几乎是瞬间返回，适合由定时任务频繁调用
+"""
+
+import argparse
+import sys
+
+
+def add_profile_arguments(parser):
+    # 延迟到这里才导入，profiling 本身只依赖标准库
+    from profiling import add_profile_arguments as add
+    return add(parser)
+
+
+def add_router_argument(parser):
+    # 可选值写在这里而不是从 routing 导入，保持 --help 不需要导入任何模块
+    parser.add_argument("--router", choices=["amap", "local", "offline"],
+                        help="路线规划后端：amap（高德地图API）、local（本地路网）或 offline（离线估算模型），"
+                             "默认读取 ROUTING_BACKEND 环境变量")
+    parser.add_argument("--prefilter", action="store_true", default=None,
+                        help="先离线估算，只对估算结果可能影响可行性判断的天调用API")
+
+
+def add_plan_arguments(parser):
+    parser.add_argument("--plan", action="store_true", help="只输出API调用计划和配额估算，不访问网络")
+    parser.add_argument("--budget", type=int, help="API调用次数预算，超出预算的天暂用离线估算，下次运行时再调用API")
+
+
+def add_flight_argument(parser):
+    parser.add_argument("--flight-time", help="返程航班起飞时间 HH:MM，用于模拟最后一天的误机概率"
+                                              "（行程JSON的最后一天没有 flight_time 时使用）")
+
+
+def add_limit_arguments(parser):
+    # 默认值由被调用的模块决定（delay_simulation.DEFAULT_TRIALS、stop_finder.MAX_DRIVE_HOURS），这里不重复
+    parser.add_argument("--trials", type=int, help="延误模拟的试验次数（默认 delay_simulation.DEFAULT_TRIALS）")
+    parser.add_argument("--max-drive-hours", type=float,
+                        help="单日行车时间上限（默认 stop_finder.MAX_DRIVE_HOURS），超过时自动生成拆分方案，并按此判断长途驾驶日")
+
+
+def add_strategy_arguments(parser):
+    parser.add_argument("--strategies", help="逗号分隔的高德路线策略，例如 0,2,3（0 速度优先、2 距离优先、3 不走快速路），"
+                                             "多个策略时每段路线同时请求，默认读取 ROUTE_STRATEGIES 环境变量")
+    parser.add_argument("--policy", choices=["fastest", "shortest", "least_risk"],
+                        help="多个路线策略时每天选择路线的规则：时间最短、距离最短或风险最低")
+
+
+def use_strategy_arguments(args):
+    if args.strategies or args.policy:
+        import travel_analyzer
+        travel_analyzer.use_strategies(args.strategies or travel_analyzer.ROUTE_STRATEGIES, args.policy)
+
+
+def cmd_analyze(args):
+    use_strategy_arguments(args)
+    if args.plan:
+        import call_planner
+        argv = ["--router", args.router] if args.router else []
+        if args.budget is not None:
+            argv += ["--budget", str(args.budget)]
+        if args.prefilter:
+            argv.append("--prefilter")
+        return call_planner.main(argv)
+
+    from profiling import profiler_from_args
+    import travel_analyzer
+    travel_analyzer.main(profiler_from_args(args, "travel_analyzer"),
+                         interactive=False if args.no_input else None, trials=args.trials, router=args.router,
+                         prefilter=args.prefilter, budget=args.budget, flight_time=args.flight_time,
+                         max_drive_hours=args.max_drive_hours)
+    return 0
+
+
+def cmd_report(args):
+    from profiling import profiler_from_args
+    import generate_html_report
+    generate_html_report.main(profiler_from_args(args, "generate_html_report"), args.flight_time)
+    return 0
+
+
+def cmd_images(args):
+    if args.action == "check":
+        import image_validator
+        image_validator.main()
+        return 0
+
+    from profiling import profiler_from_args
+    if args.action == "update":
+        import update_xhs_images as module
+    elif args.action == "fetch":
+        import fetch_xhs_images as module
+    else:
+        import xiaohongshu_image_crawler as module
+    return module.main(profiler_from_args(args, module.__name__)) or 0
+
+
+def cmd_batch(args):
+    import json
+    import os
+    from travel_analyzer import (active_backend, analyze_itinerary, feasibility_analysis, use_backend, use_prefilter,
+                                 with_flight_time)
+    from call_planner import load_itineraries, plan_calls, print_plan
+    from closures import attach_closures
+    from delay_simulation import DEFAULT_TRIALS, attach_delay_risk
+    from elevation import attach_elevation
+    from risk_scoring import attach_risk_scores
+    from stop_finder import MAX_DRIVE_HOURS, split_long_days
+
+    if args.router:
+        use_backend(args.router)
+    if args.prefilter is not None:
+        use_prefilter(args.prefilter)
+    use_strategy_arguments(args)
+
+    itineraries = [(name, with_flight_time(itinerary, args.flight_time))
+                   for name, itinerary in load_itineraries(args.itineraries)]
+    deferred = [set() for _ in itineraries]
+    if args.plan or (args.budget is not None and active_backend().remote):
+        # 所有行程一起计划：重复的天只计一次，预算在行程之间按优先级分配
+        plan = plan_calls(itineraries, args.budget)
+        print_plan(plan)
+        if args.plan:
+            return 0
+        deferred = plan["deferred"]
+
+    max_drive_hours = args.max_drive_hours or MAX_DRIVE_HOURS
+    catalog = []
+    for path, (_, itinerary), skipped in zip(args.itineraries, itineraries, deferred):
+        print(f"📂 {path}")
+        results = analyze_itinerary(itinerary, skipped)
+        attach_closures(results, itinerary)
+        attach_elevation(results, itinerary)
+        attach_delay_risk(results, itinerary, trials=args.trials or DEFAULT_TRIALS)
+        split_long_days(results, itinerary, max_drive_hours)
+        if not args.skip_feasibility:
+            feasibility_analysis(results, max_drive_hours)
+        catalog.append(results)
+
+    # 所有行程一起评分
+    attach_risk_scores(catalog)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for path, results in zip(args.itineraries, catalog):
+        name = os.path.splitext(os.path.basename(path))[0]
+        output_file = os.path.join(args.output_dir, f"{name}.results.json")
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        high = sum(1 for r in results if r["风险等级"] == "high")
+        print(f"✅ 结果已保存到 {output_file}（高风险 {high} 天）")
+    return 0
+
+
+def cmd_whatif(args):
+    import scenarios
+    argv = [args.scenario_file] if args.scenario_file else []
+    for flag in ("flight", "sleep", "skip"):
+        for value in getattr(args, flag) or []:
+            argv += [f"--{flag}", value]
+    for flag in ("base", "output", "router"):
+        if getattr(args, flag):
+            argv += [f"--{flag}", getattr(args, flag)]
+    argv += ["--sort", args.sort]
+    if args.trials:
+        argv += ["--trials", str(args.trials)]
+    if args.prefilter:
+        argv.append("--prefilter")
+    return scenarios.main(argv)
+
+
+def cmd_serve(args):
+    if args.service == "mock-amap":
+        import amap_mock_server
+        amap_mock_server.main(args.service_args)
+    elif args.service == "feasibility":
+        import feasibility_service
+        feasibility_service.main(args.service_args)
+    return 0
+
+
+def cmd_places(args):
+    import gazetteer
+    argv = list(args.names)
+    if args.near:
+        argv += ["--near", args.near]
+    if args.radius:
+        argv += ["--radius", str(args.radius)]
+    return gazetteer.main(argv)
+
+
+def cmd_keys(args):
+    import key_pool
+    return key_pool.main()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="tibet-travel", description="西藏行程分析工具集")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    analyze = subparsers.add_parser("analyze", help="调用高德API分析行程并评估可行性")
+    analyze.add_argument("--no-input", action="store_true", help="不等待用户输入（用于定时任务）")
+    add_limit_arguments(analyze)
+    add_router_argument(analyze)
+    add_plan_arguments(analyze)
+    add_strategy_arguments(analyze)
+    add_flight_argument(analyze)
+    add_profile_arguments(analyze)
+    analyze.set_defaults(func=cmd_analyze)
+
+    report = subparsers.add_parser("report", help="分析行程并生成HTML报告")
+    add_flight_argument(report)
+    add_profile_arguments(report)
+    report.set_defaults(func=cmd_report)
+
+    images = subparsers.add_parser("images", help="获取、检查图片并更新页面图库")
+    images.add_argument("action", choices=["update", "fetch", "crawl", "check"],
+                        help="update: 按配置更新；fetch: 第三方接口获取；crawl: 爬取笔记；check: 检查URL")
+    add_profile_arguments(images)
+    images.set_defaults(func=cmd_images)
+
+    batch = subparsers.add_parser("batch", help="批量分析多个行程JSON文件（从不等待输入）")
+    batch.add_argument("itineraries", nargs="+", help="行程JSON文件，格式同 travel_analyzer.ITINERARY")
+    batch.add_argument("--output-dir", default="batch_results", help="结果输出目录")
+    batch.add_argument("--skip-feasibility", action="store_true", help="只输出结果，不打印可行性分析")
+    add_limit_arguments(batch)
+    add_router_argument(batch)
+    add_plan_arguments(batch)
+    add_strategy_arguments(batch)
+    add_flight_argument(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    whatif = subparsers.add_parser("whatif", help="在行程上应用修改，并行评估多个方案并对比")
+    whatif.add_argument("scenario_file", nargs="?", help="方案JSON文件，格式见 scenarios.py")
+    whatif.add_argument("--base", help="基础行程JSON文件（默认使用内置行程）")
+    whatif.add_argument("--flight", action="append", help="方案：返程航班改到某天，例如 12-31")
+    whatif.add_argument("--sleep", action="append", help="方案：某天改住某地，例如 7:萨嘎县")
+    whatif.add_argument("--skip", action="append", help="方案：不去某地，例如 墨脱")
+    whatif.add_argument("--sort", choices=["time", "risk"], default="time", help="按总行车时间或风险总分排序")
+    whatif.add_argument("--trials", type=int, help="每个方案的延误模拟试验次数（默认 scenarios.SIMULATION_TRIALS）")
+    whatif.add_argument("--output", help="把各方案的行程和结果保存为JSON")
+    add_router_argument(whatif)
+    whatif.set_defaults(func=cmd_whatif)
+
+    serve = subparsers.add_parser("serve", help="启动本地服务")
+    serve.add_argument("service", choices=["mock-amap", "feasibility"],
+                       help="mock-amap: 高德API模拟服务；feasibility: 常驻的行程可行性查询服务")
+    serve.add_argument("service_args", nargs=argparse.REMAINDER, help="透传给服务的参数")
+    serve.set_defaults(func=cmd_serve)
+
+    places = subparsers.add_parser("places", help="查询离线地名库")
+    places.add_argument("names", nargs="*", help="要查询的地名")
+    places.add_argument("--near", help="按坐标查询附近地点，格式 \"经度,纬度\"")
+    places.add_argument("--radius", type=float, help="查询半径（公里），省略时只返回最近的5个地点")
+    places.set_defaults(func=cmd_places)
+
+    keys = subparsers.add_parser("keys", help="查看高德API Key 池中各个 Key 今天的用量和暂停状态")
+    keys.set_defaults(func=cmd_keys)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级分段耗时追踪
+记录每天行程分析中各个阶段（地理编码、路线规划、数据校正、等待）的起止时间，
+导出为 Chrome trace-event JSON，可在 chrome://tracing 或 Perfetto 中以瀑布图查看
+
+设置环境变量 TRACE_FILE=trace.json 即可在运行结束时导出
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """
+    线程安全的span记录器，未启用时所有操作都是空操作
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+
+    def _stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def begin(self, name, cat="", **args):
+        """
+        开始一个span，必须与 end() 成对调用（同一线程内）
+        """
+        if self.enabled:
+            self._stack().append((name, cat, args, time.perf_counter()))
+
+    def end(self, **args):
+        """
+        结束当前线程最近开始的span，args 会合并到span参数中
+        """
+        if not self.enabled:
+            return
+        stack = self._stack()
+        if not stack:
+            return
+        name, cat, begin_args, start = stack.pop()
+        begin_args.update(args)
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1e6, 1),
+            "dur": round((time.perf_counter() - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {key: str(value) for key, value in begin_args.items()}
+        }
+        with self.lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name, cat="", **args):
+        self.begin(name, cat, **args)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def export(self, path):
+        """
+        导出为 Chrome trace-event JSON
+        """
+        with self.lock:
+            events = sorted(self.events, key=lambda e: e["ts"])
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        return path
+
+
+TRACER = Tracer()
+span = TRACER.span
+
+if os.environ.get("TRACE_FILE"):
+    TRACER.enable()
+
+
+def export_if_enabled():
+    """
+    如果设置了 TRACE_FILE，导出追踪结果并返回文件路径
+    """
+    path = os.environ.get("TRACE_FILE")
+    if TRACER.enabled and path:
+        return TRACER.export(path)
+    return None
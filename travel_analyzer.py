@@ -3,14 +3,58 @@
 """
 西藏行程分析工具
 使用高德地图API计算实际行车时间并生成报表
+
+requests、numpy 和各分析模块（封路、海拔、延误模拟、离线估算等）只在用到的函数中导入，
+导入本模块（例如只读取 ITINERARY）几乎没有开销
 """
 
-import requests
-import pandas as pd
-from datetime import datetime, timedelta
-import time
+import argparse
 import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from api_metrics import METRICS, instrumented_get
+from profiling import Profiler
+from tracing import TRACER, span, export_if_enabled
 from config import AMAP_API_KEY, AMAP_API_BASE_URL, AMAP_GEOCODE_URL
+try:
+    from config import AMAP_API_KEYS  # 可选：多个 Key 组成 Key 池（key_pool.py）
+except ImportError:
+    AMAP_API_KEYS = []
+
+# 允许通过环境变量覆盖配置，例如指向本地模拟服务 amap_mock_server.py
+AMAP_API_KEY = os.environ.get("AMAP_API_KEY", AMAP_API_KEY)
+AMAP_API_BASE_URL = os.environ.get("AMAP_API_BASE_URL", AMAP_API_BASE_URL)
+AMAP_GEOCODE_URL = os.environ.get("AMAP_GEOCODE_URL", AMAP_GEOCODE_URL)
+AMAP_API_KEYS = [key.strip() for key in os.environ.get("AMAP_API_KEYS", ",".join(AMAP_API_KEYS)).split(",")
+                 if key.strip()]
+if AMAP_API_KEYS and AMAP_API_KEY == "YOUR_API_KEY_HERE":
+    AMAP_API_KEY = AMAP_API_KEYS[0]
+
+# 延误模拟的风险阈值
+MISS_PROBABILITY_LIMIT = 0.05   # 误机概率超过5%即提示
+DARK_PROBABILITY_LIMIT = 0.5    # 一半以上的概率天黑后到达即提示
+
+# 不是来自路线规划后端的数据来源，分析时注明
+SOURCE_LABELS = {
+    "reference": "高德地图核实的行程参考值",
+    "offline": "离线估算",
+    "estimate": "行程参考数据",
+}
+
+
+# 路线规划后端：amap（高德地图API）、local（本地路网）或 offline（离线估算模型）
+ROUTING_BACKEND = os.environ.get("ROUTING_BACKEND", "amap")
+# 预筛选：离线估算已足以做出可行性判断的天不调用API
+PREFILTER = os.environ.get("ESTIMATE_PREFILTER") == "1"
+# 高德路线策略：多个策略时每段路线同时请求所有策略，按 ROUTE_POLICY 为每天选择（route_strategies.py）
+ROUTE_STRATEGIES = [s.strip() for s in os.environ.get("ROUTE_STRATEGIES", "0").split(",") if s.strip()] or ["0"]
+ROUTE_POLICY = os.environ.get("ROUTE_POLICY", "fastest")
+
+# API结果校正缓存，之前校正过的天直接使用（第一次使用时才读取缓存文件）
+RECONCILER = None
+# 其他后端的校正结果只保存在内存中，不与高德的结果混用
+RECONCILERS = {}
 
 
 # 行程数据定义
@@ -38,8 +82,7 @@ ITINERARY = [
         "estimated_distance": 250,
         "estimated_time": 6,
         "activities": "观南迦巴瓦峰，穿越鲁朗林海，进入墨脱",
-        "accommodation": "墨脱县城",
-        "risk": "扎墨公路通行风险"
+        "accommodation": "墨脱县城"
     },
     {
         "day": 3,
@@ -89,6 +132,7 @@ ITINERARY = [
         "waypoints": ["羊卓雍措景区", "卡若拉冰川"],
         "estimated_distance": 359.2,  # 高德显示359.2公里
         "estimated_time": 6.13,  # 高德显示6小时8分钟 = 6.13小时
+        "reference": "amap",  # 参考值来自高德地图显示，校正时按较严格的范围检查
         "activities": "羊卓雍措全天游览",
         "accommodation": "日喀则市"
     },
@@ -100,7 +144,6 @@ ITINERARY = [
         "origin": "西藏自治区日喀则市",
         "destination": "西藏自治区日喀则市",
         "waypoints": ["佩枯措观景台", "阿玛直米雪山"],
-        "waypoint_coords": ["85.493658,28.814772", "87.627316,28.100825"],  # 从高德地图获取的坐标
         "estimated_distance": 1050,  # 根据高德地图实际数据更新
         "estimated_time": 15.75,  # 根据高德地图实际数据更新（15小时45分钟）
         "activities": "佩枯措和阿玛直米雪山观景",
@@ -130,6 +173,7 @@ ITINERARY = [
         "waypoints": ["纳木措国家风景区", "西藏自治区拉萨市"],
         "estimated_distance": 683.7,  # 高德显示683.7公里
         "estimated_time": 8.08,  # 高德显示8小时5分钟 = 8.08小时
+        "reference": "amap",  # 参考值来自高德地图显示，校正时按较严格的范围检查
         "activities": "纳木措游览，返程送机",
         "accommodation": "行程结束",
         "risk": "车程极长，存在误机风险"
@@ -137,6 +181,50 @@ ITINERARY = [
 ]
 
 
+def with_flight_time(itinerary, flight_time):
+    """
+    返回最后一天设置了返程航班起飞时间（"HH:MM"）的行程副本，用于模拟误机概率；
+    flight_time 为空或最后一天已有 flight_time/deadline 时原样返回
+    """
+    last = itinerary[-1] if itinerary else {}
+    if not flight_time or last.get("flight_time") or last.get("deadline"):
+        return itinerary
+    return itinerary[:-1] + [dict(last, flight_time=flight_time)]
+
+
+def api_keys():
+    """
+    Key 池中的所有 Key（未配置 AMAP_API_KEYS 时只有 AMAP_API_KEY）
+    """
+    return list(dict.fromkeys(AMAP_API_KEYS + [AMAP_API_KEY]))
+
+
+def amap_request(endpoint, url, params):
+    """
+    用 Key 池中负载最低的 Key 发送请求；Key 因配额或QPS超限被暂停时换一个 Key 重试
+    
+    Returns:
+        dict: 响应数据，所有 Key 都不可用时返回 None
+    """
+    import requests
+    from key_pool import get_key_pool
+    
+    pool = get_key_pool(api_keys())
+    data = None
+    for _ in range(len(pool.keys) + 1):
+        key = pool.acquire()
+        if key is None:
+            print(f"⚠️  所有API Key 都已用完今天的配额或被暂停")
+            return data
+        response = instrumented_get(endpoint, requests.get, url, params=dict(params, key=key), timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        METRICS.observe_infocode(endpoint, data.get("infocode"))
+        if not pool.report(key, data.get("infocode")):
+            break
+    return data
+
+
 def get_location_coordinate(location_name):
     """
     通过地点名称获取坐标
@@ -147,19 +235,29 @@ def get_location_coordinate(location_name):
     Returns:
         str: 坐标字符串 "经度,纬度" 或 None
     """
+    from gazetteer import get_gazetteer
+    from reconciliation import is_coordinate
+    
+    if is_coordinate(location_name):
+        return location_name  # 已经是坐标，不需要再请求地理编码
+    
+    # 先查离线地名库，命中时不需要请求API
+    location = get_gazetteer().lookup(location_name)
+    METRICS.observe_cache("gazetteer", location is not None)
+    if location:
+        return location
+    if AMAP_API_KEY == "YOUR_API_KEY_HERE":
+        return None
+
     try:
         params = {
-            "key": AMAP_API_KEY,
             "address": location_name,
             "city": "西藏"  # 限定在西藏自治区
         }
         
-        response = requests.get(AMAP_GEOCODE_URL, params=params, timeout=10)
-        response.raise_for_status()
+        data = amap_request("amap_geocode", AMAP_GEOCODE_URL, params)
         
-        data = response.json()
-        
-        if data.get("status") == "1" and data.get("geocodes"):
+        if data and data.get("status") == "1" and data.get("geocodes"):
             geocode = data["geocodes"][0]
             location = geocode.get("location")
             if location:
@@ -170,7 +268,22 @@ def get_location_coordinate(location_name):
         return None
 
 
-def get_driving_route(origin, destination, waypoints=None):
+def parse_driving_route(data):
+    """
+    高德驾车路线响应 -> 第一条路径，请求失败时返回 None
+    """
+    if data is None:
+        return None
+    if data.get("status") == "1" and data.get("route"):
+        paths = data["route"].get("paths", [])
+        return paths[0] if paths else None  # 取第一条路径
+    error_info = data.get('info', '未知错误')
+    if error_info != "INVALID_PARAMS":  # 不显示参数错误，因为可能是地点名称问题
+        print(f"⚠️  API返回错误: {error_info}")
+    return None
+
+
+def get_driving_route(origin, destination, waypoints=None, strategies=None):
     """
     调用高德地图API获取驾车路线信息
     
@@ -178,211 +291,374 @@ def get_driving_route(origin, destination, waypoints=None):
         origin: 起点（地点名称或坐标）
         destination: 终点（地点名称或坐标）
         waypoints: 途经点列表（可选）
+        strategies: 路线策略列表（默认 ROUTE_STRATEGIES），多个策略时同时请求
     
     Returns:
-        dict: 包含距离（公里）和时间（分钟）的字典
+        dict: 包含距离（公里）和时间（分钟）的字典，unresolved 为地理编码失败、按原名称请求的地点；
+              多个策略时距离和时间为第一个成功的策略，alternatives 为各策略的结果（route_strategies.path_summary）
     """
+    from route_strategies import path_summary
+    
+    strategies = strategies or ROUTE_STRATEGIES
     if AMAP_API_KEY == "YOUR_API_KEY_HERE":
         print(f"⚠️  警告: 未配置高德地图API Key，使用估算值")
         return None
     
     try:
+        unresolved = []
+        
         # 尝试获取起点坐标
-        origin_coord = get_location_coordinate(origin)
+        with span("geocode origin", "geocode", location=origin):
+            origin_coord = get_location_coordinate(origin)
         if not origin_coord:
             origin_coord = origin  # 如果获取失败，使用原始值
+            unresolved.append(origin)
         
         # 尝试获取终点坐标
-        dest_coord = get_location_coordinate(destination)
+        with span("geocode destination", "geocode", location=destination):
+            dest_coord = get_location_coordinate(destination)
         if not dest_coord:
             dest_coord = destination  # 如果获取失败，使用原始值
+            unresolved.append(destination)
         
         # 构建请求参数
         params = {
-            "key": AMAP_API_KEY,
             "origin": origin_coord,
             "destination": dest_coord,
             "extensions": "all",
-            "strategy": "0"  # 0:速度优先（时间最短）
+            "strategy": strategies[0]  # 默认 0:速度优先（时间最短）
         }
         
         # 如果有途经点，获取坐标并添加到参数中
         if waypoints:
             waypoint_coords = []
             for wp in waypoints:
-                wp_coord = get_location_coordinate(wp)
+                with span("geocode waypoint", "geocode", location=wp):
+                    wp_coord = get_location_coordinate(wp)
                 if wp_coord:
                     waypoint_coords.append(wp_coord)
                 else:
                     waypoint_coords.append(wp)  # 如果获取失败，使用原始值
+                    unresolved.append(wp)
             
             if waypoint_coords:
                 waypoint_str = "|".join(waypoint_coords)
                 params["waypoints"] = waypoint_str
         
-        # 发送请求
-        response = requests.get(AMAP_API_BASE_URL, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
+        if len(strategies) > 1:
+            # 地理编码只做一次，各策略的请求同时发出（Key 池负责按每个 Key 的QPS限制控制请求频率）
+            with ThreadPoolExecutor(max_workers=len(strategies)) as executor:
+                responses = list(executor.map(
+                    lambda strategy: amap_request("amap_driving", AMAP_API_BASE_URL, dict(params, strategy=strategy)),
+                    strategies))
+            alternatives = {}
+            for strategy, data in zip(strategies, responses):
+                path = parse_driving_route(data)
+                if path:
+                    alternatives[strategy] = path_summary(path)
+            if not alternatives:
+                return None
+            primary = next(iter(alternatives))
+            return dict({key: alternatives[primary][key] for key in ("distance_km", "duration_minutes", "duration_hours")},
+                        unresolved=unresolved, strategy=primary, alternatives=alternatives)
         
-        if data.get("status") == "1" and data.get("route"):
-            route = data["route"]
-            paths = route.get("paths", [])
+        # 发送请求（Key 池负责按每个 Key 的QPS限制控制请求频率）
+        path = parse_driving_route(amap_request("amap_driving", AMAP_API_BASE_URL, params))
+        if path:
+            distance = float(path.get("distance", 0)) / 1000  # 转换为公里
+            duration = float(path.get("duration", 0)) / 60  # 转换为分钟
             
-            if paths:
-                path = paths[0]  # 取第一条路径
-                distance = float(path.get("distance", 0)) / 1000  # 转换为公里
-                duration = float(path.get("duration", 0)) / 60  # 转换为分钟
-                
-                return {
-                    "distance_km": round(distance, 1),
-                    "duration_minutes": round(duration, 1),
-                    "duration_hours": round(duration / 60, 1)
-                }
-        else:
-            error_info = data.get('info', '未知错误')
-            if error_info != "INVALID_PARAMS":  # 不显示参数错误，因为可能是地点名称问题
-                print(f"⚠️  API返回错误: {error_info}")
-            return None
+            return {
+                "distance_km": round(distance, 1),
+                "duration_minutes": round(duration, 1),
+                "duration_hours": round(duration / 60, 1),
+                "unresolved": unresolved
+            }
+        return None
             
     except Exception as e:
         print(f"⚠️  调用API时出错: {str(e)}")
         return None
 
 
-def analyze_itinerary():
+def use_backend(name):
+    """
+    选择路线规划后端
+    """
+    from routing import get_backend
+    
+    global ROUTING_BACKEND
+    if name != "amap":
+        get_backend(name)  # 名称错误时立即报错
+    ROUTING_BACKEND = name
+
+
+def use_prefilter(enabled=True):
+    """
+    启用或关闭离线估算预筛选
+    """
+    global PREFILTER
+    PREFILTER = enabled
+
+
+def use_strategies(strategies, policy=None):
+    """
+    设置高德路线策略（列表或逗号分隔的字符串）和每天选择路线的规则
+    """
+    from route_strategies import POLICIES, parse_strategies
+    
+    global ROUTE_STRATEGIES, ROUTE_POLICY
+    if isinstance(strategies, str):
+        strategies = parse_strategies(strategies)
+    if policy is not None and policy not in POLICIES:
+        raise ValueError(f"未知的路线选择规则: {policy}（可选 {', '.join(POLICIES)}）")
+    ROUTE_STRATEGIES = list(strategies)
+    ROUTE_POLICY = policy or ROUTE_POLICY
+
+
+def strategies_missing(api_result, strategies=None):
+    """
+    启用了多个路线策略（默认 ROUTE_STRATEGIES），但缓存的结果是只请求一个策略时得到的（行程参考数据除外），需要重新查询
+    """
+    return (len(strategies or ROUTE_STRATEGIES) > 1 and not api_result.get("alternatives")
+            and api_result.get("source") != "estimate")
+
+
+def amap_backend():
+    """
+    高德地图API后端，使用本模块中的路线函数：直接运行 travel_analyzer.py 时本模块是 __main__，
+    如果由 routing 按模块名导入，会得到另一份模块，use_strategies 等设置不会生效
+    """
+    from routing import Backend
+    return Backend("amap", "高德地图API", get_driving_route, get_location_coordinate, True)
+
+
+def active_backend(name=None):
+    """
+    返回实际使用的后端：未配置高德API Key 时高德后端换成离线估算模型
+    """
+    from routing import get_backend
+    
+    name = name or ROUTING_BACKEND
+    if name == "amap" and AMAP_API_KEY == "YOUR_API_KEY_HERE":
+        name = "offline"
+    return amap_backend() if name == "amap" else get_backend(name)
+
+
+def reconciler_for(name):
+    """
+    返回后端对应的校正缓存
+    """
+    from reconciliation import Reconciler
+    
+    global RECONCILER
+    if name == "amap":
+        if RECONCILER is None:
+            RECONCILER = Reconciler()
+        return RECONCILER
+    if name not in RECONCILERS:
+        RECONCILERS[name] = Reconciler(cache_file=None, source=name)
+    return RECONCILERS[name]
+
+
+def route_day(item, route, geocode):
+    """
+    按行程类型（单程或往返）查询一天的路线
+    
+    Args:
+        item: ITINERARY 中的一天
+        route: 路线查询函数，签名同 get_driving_route
+        geocode: 地理编码函数，签名同 get_location_coordinate
+    
+    Returns:
+        dict: 当天合计的距离和时间，API不可用时返回 None
+    """
+    waypoints = item.get("waypoints")
+    
+    # 单程：直接查询起点经途经点到终点
+    if item["origin"] != item["destination"] or not waypoints:
+        with span("route", "route"):
+            return route(item["origin"], item["destination"], waypoints)
+    
+    # 往返行程：起点和终点相同，分别计算去程和返程
+    if item.get("waypoint_coords"):
+        # 如果有预定义的坐标，直接使用坐标进行路径规划
+        with span("geocode origin", "geocode", location=item["origin"]):
+            origin = geocode(item["origin"]) or item["origin"]
+        stops = item["waypoint_coords"]
+    else:
+        origin = item["origin"]
+        stops = waypoints
+    
+    # 去程：起点 -> 途经点 -> 最远的途经点
+    with span("route go", "route"):
+        api_result_go = route(origin, stops[-1], stops[:-1] if len(stops) > 1 else None)
+    # 返程：最远的途经点 -> 起点
+    with span("route back", "route"):
+        api_result_back = route(stops[-1], origin)
+    
+    if api_result_go and api_result_back:
+        result = {
+            "distance_km": api_result_go["distance_km"] + api_result_back["distance_km"],
+            "duration_hours": api_result_go["duration_hours"] + api_result_back["duration_hours"],
+            "duration_minutes": api_result_go["duration_minutes"] + api_result_back["duration_minutes"],
+            "unresolved": api_result_go.get("unresolved", []) + api_result_back.get("unresolved", [])
+        }
+        from route_strategies import merge_alternatives
+        alternatives = merge_alternatives(api_result_go.get("alternatives"), api_result_back.get("alternatives"))
+        if alternatives:
+            result["alternatives"] = alternatives
+        return result
+    return None
+
+
+def verified_reference(item):
+    """
+    行程中抄自高德地图显示的参考值（"reference": "amap"），比离线估算可信；其他天返回 None
+    """
+    from reconciliation import estimate_result
+    
+    if item.get("reference") == "amap":
+        return dict(estimate_result(item), source="reference")
+    return None
+
+
+def analyze_day(item, route=None, geocode=None, log=print, reconciler=None, estimate=None, defer=False,
+                backend=None):
+    """
+    计算单日行程的实际距离和时间
+    
+    Args:
+        item: ITINERARY 中的一天
+        route: 路线查询函数，签名同 get_driving_route（默认使用 ROUTING_BACKEND 后端）
+        geocode: 地理编码函数，签名同 get_location_coordinate（默认使用 ROUTING_BACKEND 后端）
+        log: 输出数据校正提示的函数，服务中传入空函数
+        reconciler: reconciliation.Reconciler（默认为后端对应的校正缓存）
+        estimate: 当天的离线估算结果（estimator），启用预筛选时用于判断是否需要调用API
+        defer: 超出调用预算（call_planner），有离线估算时不调用API
+        backend: routing.Backend（默认为 active_backend()），服务和方案评估传入自己的后端
+    
+    Returns:
+        tuple: (结果字典, 路线数据或None)
+    """
+    from estimator import precision_reasons
+    
+    backend = backend or active_backend()
+    route = route or backend.route
+    geocode = geocode or backend.geocode
+    reconciler = reconciler or reconciler_for(backend.name)
+    
+    # 之前校正过的结果直接使用，不再请求API
+    api_result = reconciler.lookup(item)
+    if api_result and backend.name == "amap" and strategies_missing(api_result):
+        log(f"  🔀 已校正的数据只有一种路线策略，重新查询所有策略")
+        api_result = None
+    if api_result:
+        log(f"  ♻️  使用已校正的数据（来源: {api_result['source']}）")
+    elif defer:
+        # 超出调用预算：暂用核实过的参考值或离线估算（都没有时用行程参考值），不写入校正缓存，下次运行时再调用API
+        api_result = verified_reference(item) or (dict(estimate, source="offline") if estimate else None)
+        log(f"  ⏸️  超出API调用预算，暂不调用API，下次运行时再查询")
+    elif backend.name == "offline" and verified_reference(item):
+        # 离线模式下，高德地图核实过的参考值比按直线距离的估算准确
+        api_result = verified_reference(item)
+        log(f"  📌 使用高德地图核实的参考值，不做离线估算")
+    elif PREFILTER and backend.remote and estimate and not precision_reasons(item, estimate):
+        api_result = verified_reference(item) or dict(estimate, source="offline")
+        log(f"  ⚡ 离线估算 {estimate['duration_hours']:.1f}±{estimate['duration_hours'] * estimate['relative_error']:.1f}"
+            f" 小时，不影响可行性判断，不调用API")
+    else:
+        with span("reconcile", "reconcile"):
+            api_result = reconciler.reconcile_day(item, lambda r: route_day(item, r, geocode), route, geocode, log)
+    
+    # 多个路线策略：按 ROUTE_POLICY 选择当天的路线，其余策略作为备选列
+    strategy_columns = {}
+    if api_result and api_result.get("alternatives"):
+        from route_strategies import apply_policy
+        api_result, strategy_columns = apply_policy(item, api_result, ROUTE_POLICY)
+    
+    if api_result:
+        actual_distance = api_result["distance_km"]
+        actual_duration_hours = api_result["duration_hours"]
+        actual_duration_minutes = api_result["duration_minutes"]
+    else:
+        # 如果API调用失败，使用估算值
+        actual_distance = item["estimated_distance"]
+        actual_duration_hours = item["estimated_time"]
+        actual_duration_minutes = item["estimated_time"] * 60
+    
+    # 计算差异
+    distance_diff = actual_distance - item["estimated_distance"]
+    time_diff = actual_duration_hours - item["estimated_time"]
+    
+    result = {
+        "日期": item["date"],
+        "星期": item["weekday"],
+        "行程": item["route"],
+        "起点": item["origin"],
+        "终点": item["destination"],
+        "估算距离(km)": item["estimated_distance"],
+        "实际距离(km)": actual_distance,
+        "距离差异(km)": round(distance_diff, 1),
+        "估算时间(小时)": item["estimated_time"],
+        "实际时间(小时)": actual_duration_hours,
+        "实际时间(分钟)": actual_duration_minutes,
+        "时间差异(小时)": round(time_diff, 1),
+        "活动安排": item["activities"],
+        "住宿": item["accommodation"],
+        "风险提示": item.get("risk", ""),
+        "数据来源": api_result["source"] if api_result else "estimate"
+    }
+    result.update(strategy_columns)
+    return result, api_result
+
+
+def analyze_itinerary(itinerary=None, deferred=()):
     """
     分析整个行程，计算实际行车时间
+    
+    Args:
+        itinerary: 行程列表，格式同 ITINERARY（默认使用 ITINERARY）
+        deferred: 超出调用预算、暂用离线估算的天的下标（call_planner.plan_calls）
     """
+    if itinerary is None:
+        itinerary = ITINERARY
+    
     results = []
+    backend = active_backend()
+    # 整个行程一次性离线估算，预筛选用
+    if (PREFILTER or deferred) and backend.remote:
+        from estimator import get_estimator
+        estimates = get_estimator().estimate_days(itinerary)
+    else:
+        estimates = [None] * len(itinerary)
     
     print("=" * 80)
-    print("开始分析行程，正在调用高德地图API计算实际行车时间...")
+    print(f"开始分析行程，正在调用{backend.label}计算实际行车时间...")
     print("=" * 80)
     print()
     
-    for item in ITINERARY:
+    for index, (item, estimate) in enumerate(zip(itinerary, estimates)):
+        TRACER.begin(f"Day {item['day']}", "day", route=item["route"])
         print(f"Day {item['day']} ({item['date']} {item['weekday']}): {item['route']}")
         
-        # 调用API获取实际数据
-        waypoints = item.get("waypoints")
-        
-        # 特殊处理：如果起点和终点相同（往返行程），计算往返距离
-        if item["origin"] == item["destination"] and waypoints:
-            # 如果有预定义的坐标，直接使用坐标进行路径规划
-            if "waypoint_coords" in item and item["waypoint_coords"]:
-                # 使用坐标进行路径规划
-                origin_coord = get_location_coordinate(item["origin"])
-                if not origin_coord:
-                    origin_coord = item["origin"]
-                
-                # 构建完整的往返路径：起点 -> 途经点1 -> 途经点2 -> 起点
-                waypoint_coords = item["waypoint_coords"]
-                # 去程：起点 -> 途经点1 -> 途经点2
-                api_result_go = get_driving_route(origin_coord, waypoint_coords[-1], waypoint_coords[:-1] if len(waypoint_coords) > 1 else None)
-                # 返程：途经点2 -> 起点
-                api_result_back = get_driving_route(waypoint_coords[-1], origin_coord)
-                
-                if api_result_go and api_result_back:
-                    actual_distance = api_result_go["distance_km"] + api_result_back["distance_km"]
-                    actual_duration_hours = api_result_go["duration_hours"] + api_result_back["duration_hours"]
-                    actual_duration_minutes = api_result_go["duration_minutes"] + api_result_back["duration_minutes"]
-                    api_result = {
-                        "distance_km": actual_distance,
-                        "duration_hours": actual_duration_hours,
-                        "duration_minutes": actual_duration_minutes
-                    }
-                else:
-                    # 如果API调用失败，使用从高德地图获取的实际数据
-                    api_result = {
-                        "distance_km": item.get("estimated_distance", 500),
-                        "duration_hours": item.get("estimated_time", 8),
-                        "duration_minutes": item.get("estimated_time", 8) * 60
-                    }
-            else:
-                # 计算去程：起点到最远的途经点
-                api_result_go = get_driving_route(item["origin"], waypoints[-1], waypoints[:-1] if len(waypoints) > 1 else None)
-                # 计算返程：最远的途经点回到起点
-                api_result_back = get_driving_route(waypoints[-1], item["origin"])
-                
-                if api_result_go and api_result_back:
-                    actual_distance = api_result_go["distance_km"] + api_result_back["distance_km"]
-                    actual_duration_hours = api_result_go["duration_hours"] + api_result_back["duration_hours"]
-                    actual_duration_minutes = api_result_go["duration_minutes"] + api_result_back["duration_minutes"]
-                    api_result = {
-                        "distance_km": actual_distance,
-                        "duration_hours": actual_duration_hours,
-                        "duration_minutes": actual_duration_minutes
-                    }
-                else:
-                    api_result = None
-        else:
-            api_result = get_driving_route(item["origin"], item["destination"], waypoints)
-        
-        if api_result:
-            actual_distance = api_result["distance_km"]
-            actual_duration_hours = api_result["duration_hours"]
-            actual_duration_minutes = api_result["duration_minutes"]
-            
-            # API返回的数据优先使用，直接使用API返回的实际数据
-            # 以便与基准时间进行比较
-            
-            # 特殊处理：如果API返回的数据与高德显示差异很大，使用高德显示的数据
-            # Day 6: 高德显示6小时8分钟(6.13小时)，359.2公里
-            # Day 9: 高德显示8小时5分钟(8.08小时)，683.7公里
-            # API可能因为途经点坐标获取失败而返回不准确的数据
-            if item["day"] == 6:
-                if actual_duration_hours < item["estimated_time"] * 0.6 or actual_distance < item["estimated_distance"] * 0.8:
-                    print(f"  ⚠️  API返回数据({actual_duration_hours:.1f}小时, {actual_distance:.1f}km)与高德显示差异较大")
-                    print(f"  ⚠️  使用高德地图显示数据: {item['estimated_time']:.2f}小时, {item['estimated_distance']:.1f}km")
-                    actual_distance = item["estimated_distance"]
-                    actual_duration_hours = item["estimated_time"]
-                    actual_duration_minutes = item["estimated_time"] * 60
-            elif item["day"] == 9:
-                # Day 9: API返回数据与高德显示差异较大，直接使用高德数据
-                # 高德显示：8小时5分钟(8.08小时)，683.7公里
-                # API返回：6.7小时，543.0公里（可能因为途经点坐标问题）
-                if abs(actual_duration_hours - item["estimated_time"]) > 1.0 or abs(actual_distance - item["estimated_distance"]) > 100:
-                    print(f"  ⚠️  API返回数据({actual_duration_hours:.1f}小时, {actual_distance:.1f}km)与高德显示差异较大")
-                    print(f"  ⚠️  使用高德地图显示数据: {item['estimated_time']:.2f}小时, {item['estimated_distance']:.1f}km")
-                    actual_distance = item["estimated_distance"]
-                    actual_duration_hours = item["estimated_time"]
-                    actual_duration_minutes = item["estimated_time"] * 60
-        else:
-            # 如果API调用失败，使用估算值
-            actual_distance = item["estimated_distance"]
-            actual_duration_hours = item["estimated_time"]
-            actual_duration_minutes = item["estimated_time"] * 60
+        result, api_result = analyze_day(item, estimate=estimate, defer=index in deferred)
+        results.append(result)
         
-        # 计算差异
+        actual_distance = result["实际距离(km)"]
+        actual_duration_hours = result["实际时间(小时)"]
+        actual_duration_minutes = result["实际时间(分钟)"]
         distance_diff = actual_distance - item["estimated_distance"]
         time_diff = actual_duration_hours - item["estimated_time"]
         
-        result = {
-            "日期": item["date"],
-            "星期": item["weekday"],
-            "行程": item["route"],
-            "起点": item["origin"],
-            "终点": item["destination"],
-            "估算距离(km)": item["estimated_distance"],
-            "实际距离(km)": actual_distance,
-            "距离差异(km)": round(distance_diff, 1),
-            "估算时间(小时)": item["estimated_time"],
-            "实际时间(小时)": actual_duration_hours,
-            "实际时间(分钟)": actual_duration_minutes,
-            "时间差异(小时)": round(time_diff, 1),
-            "活动安排": item["activities"],
-            "住宿": item["accommodation"],
-            "风险提示": item.get("risk", "")
-        }
-        
-        results.append(result)
-        
         # 打印结果
         if api_result:
             print(f"  ✓ 实际距离: {actual_distance} km")
             print(f"  ✓ 实际时间: {actual_duration_hours} 小时 ({actual_duration_minutes} 分钟)")
+            if result["数据来源"] in SOURCE_LABELS:
+                print(f"  ℹ️  数据来源: {SOURCE_LABELS[result['数据来源']]}")
+            if result.get("路线策略"):
+                print(f"  🔀 路线策略: {result['路线策略']}")
         else:
             print(f"  ⚠ 使用估算值: {actual_distance} km, {actual_duration_hours} 小时")
         
@@ -393,9 +669,7 @@ def analyze_itinerary():
             print(f"  ⚠️  风险: {item['risk']}")
         
         print()
-        
-        # 避免API调用过于频繁
-        time.sleep(0.5)
+        TRACER.end()
     
     return results
 
@@ -403,48 +677,35 @@ def analyze_itinerary():
 # Excel报表生成功能已移除，只生成HTML报告
 
 
-def feasibility_analysis(results):
-    """
-    分析行程可行性
+def assess_feasibility(results, max_drive_hours=None):
     """
-    print("=" * 80)
-    print("行程可行性分析")
-    print("=" * 80)
-    print()
+    计算行程可行性评估（不输出）
+    
+    Args:
+        results: analyze_itinerary 的结果
+        max_drive_hours: 长途驾驶日的单日驾驶时间上限（默认 stop_finder.MAX_DRIVE_HOURS）
     
+    Returns:
+        dict: 总体数据、风险日、长途驾驶日、问题和建议
+    """
     total_distance = sum(r["实际距离(km)"] for r in results)
     total_time = sum(r["实际时间(小时)"] for r in results)
     avg_distance = total_distance / len(results)
     avg_time = total_time / len(results)
     max_time = max(r["实际时间(小时)"] for r in results)
     max_distance = max(r["实际距离(km)"] for r in results)
-    
-    print(f"📊 总体数据:")
-    print(f"  总行程距离: {total_distance:.1f} 公里")
-    print(f"  总行车时间: {total_time:.1f} 小时 ({total_time/24:.1f} 天)")
-    print(f"  平均每日距离: {avg_distance:.1f} 公里")
-    print(f"  平均每日时间: {avg_time:.1f} 小时")
-    print()
-    
-    print(f"⚠️  关键风险点:")
+    from elevation import altitude_warnings
+    from stop_finder import MAX_DRIVE_HOURS, format_split
+    limit = max_drive_hours or MAX_DRIVE_HOURS
     
     # 分析高风险日
-    high_risk_days = []
-    for r in results:
-        if r["实际时间(小时)"] >= 8:
-            high_risk_days.append(r)
+    risk_days = []
+    long_days = []
+    for i, r in enumerate(results, 1):
+        if r["实际时间(小时)"] >= limit:
+            long_days.append({"day": i, "hours": r["实际时间(小时)"], "route": r["行程"]})
         if r["风险提示"]:
-            print(f"  • Day {results.index(r)+1} ({r['日期']}): {r['风险提示']}")
-            print(f"    实际时间: {r['实际时间(小时)']} 小时")
-    
-    if high_risk_days:
-        print()
-        print(f"  • 超过8小时的长途驾驶日: {len(high_risk_days)} 天")
-        for day in high_risk_days:
-            print(f"    - Day {results.index(day)+1}: {day['实际时间(小时)']} 小时 ({day['行程']})")
-    
-    print()
-    print(f"💡 可行性评估:")
+            risk_days.append({"day": i, "date": r["日期"], "risk": r["风险提示"], "hours": r["实际时间(小时)"]})
     
     # 评估标准
     issues = []
@@ -458,56 +719,244 @@ def feasibility_analysis(results):
         issues.append(f"平均每日行车时间 {avg_time:.1f} 小时，强度较高")
         recommendations.append("建议适当减少每日行程，增加缓冲时间")
     
-    if len([r for r in results if r["实际时间(小时)"] >= 8]) >= 3:
-        issues.append("超过3天行程超过8小时，整体强度过大")
+    if len(long_days) >= 3:
+        issues.append(f"超过3天行程超过{limit:g}小时，整体强度过大")
         recommendations.append("建议优化路线，减少长途驾驶天数")
     
-    # 检查最后一天
-    last_day = results[-1]
-    if last_day["实际时间(小时)"] >= 10:
-        issues.append(f"最后一天行程 {last_day['实际时间(小时)']} 小时，存在误机风险")
-        recommendations.append("强烈建议将返程航班延后一天，或提前一天结束行程")
+    # 有拆分方案时给出具体的住宿地点
+    for i, r in enumerate(results, 1):
+        if "拆分建议" not in r:
+            continue
+        if r["拆分建议"]:
+            recommendations.append(f"建议将 Day {i} 拆分为 {len(r['拆分建议']['segments'])} 天: "
+                                   f"{format_split(r['拆分建议'])}")
+        else:
+            recommendations.append(f"Day {i} 沿途没有合适的住宿地点，无法拆分，建议调整路线")
+    
+    # 当天禁止通行的封路
+    for i, r in enumerate(results, 1):
+        if "绕行方案" not in r:
+            continue
+        closed = "、".join(hit["name"] for hit in r["封路信息"] if hit["severity"] == "closed")
+        detour = r["绕行方案"]
+        if detour is None:
+            issues.append(f"Day {i} 途经的{closed}当天封闭，路网中没有绕行路线")
+            recommendations.append(f"建议调整 Day {i} 的日期或路线")
+        else:
+            issues.append(f"Day {i} 途经的{closed}当天封闭，需绕行，多 {detour['extra_hours']:.1f} 小时")
+            recommendations.append(f"Day {i} 按绕行路线安排: {' → '.join(detour['via'])}")
+    
+    # 住宿海拔（需要 DEM 数据）
+    for i, warning in altitude_warnings(results):
+        issues.append(f"Day {i} {warning}")
+        recommendations.append(f"建议 Day {i} 改住海拔较低的地点，或在前一晚增加适应日")
+    
+    simulated = all("误机概率" in r for r in results)
+    if simulated:
+        # 有延误模拟结果时，按模拟出的概率评估，而不是按固定小时数
+        for i, r in enumerate(results, 1):
+            if r["误机概率"] is not None and r["误机概率"] >= MISS_PROBABILITY_LIMIT:
+                issues.append(f"Day {i} 有 {r['误机概率']:.0%} 的概率无法在 {r['截止时间']} 前到达，存在误机风险")
+                recommendations.append("强烈建议将返程航班延后一天，或提前一天结束行程")
+        dark_days = [i for i, r in enumerate(results, 1) if r["天黑后到达概率"] >= DARK_PROBABILITY_LIMIT]
+        if dark_days:
+            issues.append(f"Day {', '.join(map(str, dark_days))} 有一半以上的概率在天黑后才能到达")
+            recommendations.append("建议这些天在日出后尽早出发，或拆分行程避免冬季夜间驾驶")
+    else:
+        # 检查最后一天
+        last_day = results[-1]
+        if last_day["实际时间(小时)"] >= 10:
+            issues.append(f"最后一天行程 {last_day['实际时间(小时)']} 小时，存在误机风险")
+            recommendations.append("强烈建议将返程航班延后一天，或提前一天结束行程")
+    
+    return {
+        "total_distance": total_distance,
+        "total_time": total_time,
+        "avg_distance": avg_distance,
+        "avg_time": avg_time,
+        "max_time": max_time,
+        "max_distance": max_distance,
+        "risk_days": risk_days,
+        "long_days": long_days,
+        "max_drive_hours": limit,
+        "buffer_hours": sum(r["缓冲时间(小时)"] for r in results) if simulated else None,
+        "issues": issues,
+        "recommendations": recommendations
+    }
+
+
+def feasibility_analysis(results, max_drive_hours=None):
+    """
+    分析行程可行性
+    
+    Args:
+        results: analyze_itinerary 的结果
+        max_drive_hours: 长途驾驶日的单日驾驶时间上限（默认 stop_finder.MAX_DRIVE_HOURS）
+    """
+    from elevation import HIGH_ALTITUDE_M
+    from stop_finder import format_split
+    
+    print("=" * 80)
+    print("行程可行性分析")
+    print("=" * 80)
+    print()
+    
+    assessment = assess_feasibility(results, max_drive_hours)
+    total_time = assessment["total_time"]
+    
+    print(f"📊 总体数据:")
+    print(f"  总行程距离: {assessment['total_distance']:.1f} 公里")
+    print(f"  总行车时间: {total_time:.1f} 小时 ({total_time/24:.1f} 天)")
+    print(f"  平均每日距离: {assessment['avg_distance']:.1f} 公里")
+    print(f"  平均每日时间: {assessment['avg_time']:.1f} 小时")
+    print()
     
-    if issues:
+    print(f"⚠️  关键风险点:")
+    
+    for day in assessment["risk_days"]:
+        print(f"  • Day {day['day']} ({day['date']}): {day['risk']}")
+        print(f"    实际时间: {day['hours']} 小时")
+    
+    if assessment["long_days"]:
+        print()
+        print(f"  • 超过{assessment['max_drive_hours']:g}小时的长途驾驶日: {len(assessment['long_days'])} 天")
+        for day in assessment["long_days"]:
+            print(f"    - Day {day['day']}: {day['hours']} 小时 ({day['route']})")
+            plan = results[day["day"] - 1].get("拆分建议")
+            if plan:
+                print(f"      拆分: {format_split(plan)}")
+    
+    if any("最高海拔(m)" in r for r in results):
+        print()
+        print(f"🏔️  海拔 (最高点 / {HIGH_ALTITUDE_M}米以上时间 / 住宿):")
+        for i, r in enumerate(results, 1):
+            if "最高海拔(m)" in r:
+                sleep = f"{r['住宿海拔(m)']} 米" if r["住宿海拔(m)"] is not None else "未知"
+                print(f"  Day {i}: {r['最高海拔(m)']} 米 / {r['4500米以上时间(小时)']:.1f} 小时 / {sleep}")
+    
+    if assessment["buffer_hours"] is not None:
+        print()
+        print(f"🎲 冬季延误模拟 (P50 / P90 耗时，含停留):")
+        for i, r in enumerate(results, 1):
+            line = (f"  Day {i}: {r['P50时间(小时)']:.1f} / {r['P90时间(小时)']:.1f} 小时，"
+                    f"日落 {r['日落时间']}，天黑后到达概率 {r['天黑后到达概率']:.0%}")
+            if r["误机概率"] is not None:
+                line += f"，{r['截止时间']} 前未到达概率 {r['误机概率']:.0%}"
+            print(line)
+    
+    print()
+    print(f"💡 可行性评估:")
+    
+    if assessment["issues"]:
         print("  ❌ 存在的问题:")
-        for issue in issues:
+        for issue in assessment["issues"]:
             print(f"    • {issue}")
         print()
         print("  ✅ 建议措施:")
-        for rec in recommendations:
+        for rec in assessment["recommendations"]:
             print(f"    • {rec}")
     else:
         print("  ✅ 行程整体可行，但需注意:")
         print("    • 冬季路况可能影响实际行驶时间")
         print("    • 高海拔地区需要适应时间")
-        print("    • 建议预留20-30%的缓冲时间")
+        if assessment["buffer_hours"] is not None:
+            print(f"    • 按模拟P90，全程需预留约 {assessment['buffer_hours']:.1f} 小时缓冲时间")
+        else:
+            print("    • 建议预留20-30%的缓冲时间")
     
     print()
     print("=" * 80)
 
 
-def main():
+def main(profiler=None, interactive=None, trials=None, router=None, prefilter=None, budget=None,
+         strategies=None, policy=None, flight_time=None, max_drive_hours=None):
     """
     主函数
+    
+    Args:
+        profiler: profiling.Profiler，启用时按阶段剖析（可选）
+        interactive: 是否允许等待用户输入，默认仅在终端中运行时允许
+        trials: 延误模拟的试验次数（默认 delay_simulation.DEFAULT_TRIALS）
+        router: 路线规划后端名称（默认 ROUTING_BACKEND）
+        prefilter: 是否启用离线估算预筛选（默认 PREFILTER）
+        budget: API调用次数预算，超出预算的天暂用离线估算（默认不限制）
+        strategies: 高德路线策略列表或逗号分隔的字符串（默认 ROUTE_STRATEGIES）
+        policy: 多个路线策略时每天选择路线的规则（默认 ROUTE_POLICY）
+        flight_time: 返程航班起飞时间 "HH:MM"，不指定时不模拟误机概率
+        max_drive_hours: 单日驾驶时间上限，超过时生成拆分方案（默认 stop_finder.MAX_DRIVE_HOURS）
     """
+    from closures import attach_closures
+    from delay_simulation import DEFAULT_TRIALS, attach_delay_risk
+    from elevation import attach_elevation
+    from stop_finder import MAX_DRIVE_HOURS, split_long_days
+    
+    max_drive_hours = max_drive_hours or MAX_DRIVE_HOURS
+    itinerary = with_flight_time(ITINERARY, flight_time)
+    profiler = profiler or Profiler("travel_analyzer")
+    if interactive is None:
+        interactive = sys.stdin.isatty()
+    if router:
+        use_backend(router)
+    if prefilter is not None:
+        use_prefilter(prefilter)
+    if strategies or policy:
+        use_strategies(strategies or ROUTE_STRATEGIES, policy)
+    
     print("\n")
     print("🚗 西藏行程分析工具")
     print("=" * 80)
     print()
     
-    if AMAP_API_KEY == "YOUR_API_KEY_HERE":
+    if ROUTING_BACKEND == "amap" and AMAP_API_KEY == "YOUR_API_KEY_HERE":
         print("⚠️  注意: 未配置高德地图API Key")
-        print("   请在 config.py 中设置 AMAP_API_KEY")
-        print("   当前将使用行程表中的估算值进行分析")
+        print("   请在 config.py 中设置 AMAP_API_KEY（或用 AMAP_API_KEYS 配置多个 Key）")
+        print("   当前将使用离线估算模型进行分析（不访问网络）")
         print()
-        input("按回车键继续...")
+        if interactive:
+            input("按回车键继续...")
+            print()
+    
+    deferred = set()
+    if budget is not None and active_backend().remote:
+        from call_planner import plan_calls, print_plan
+        # 设置显式传入：直接运行本文件时本模块是 __main__，call_planner 读到的是另一份 travel_analyzer
+        plan = plan_calls([("行程", itinerary)], budget, ROUTING_BACKEND, PREFILTER, ROUTE_STRATEGIES)
+        print_plan(plan)
         print()
+        deferred = plan["deferred"][0]
     
     # 分析行程
-    results = analyze_itinerary()
+    with profiler.phase("analyze"):
+        results = analyze_itinerary(itinerary, deferred=deferred)
+    
+    # 按日期检查封路和季节性通行限制
+    with profiler.phase("closures"), span("check closures", "closures"):
+        attach_closures(results, itinerary)
+    
+    # 海拔剖面（需要 DEM 数据）
+    with profiler.phase("elevation"), span("elevation profiles", "elevation"):
+        attach_elevation(results, itinerary)
+    
+    # 冬季延误模拟
+    with profiler.phase("simulate"), span("simulate delays", "simulation"):
+        attach_delay_risk(results, itinerary, trials=trials or DEFAULT_TRIALS)
+    
+    # 超过上限的长途日自动生成拆分方案
+    with profiler.phase("split"), span("split long days", "split"):
+        split_long_days(results, itinerary, max_drive_hours)
     
     # 可行性分析
-    feasibility_analysis(results)
+    with profiler.phase("feasibility"):
+        feasibility_analysis(results, max_drive_hours)
+    
+    # API调用统计
+    METRICS.print_summary()
+    prom_file, json_file = METRICS.write_reports()
+    print(f"📈 调用统计已保存到 {prom_file} 和 {json_file}")
+    trace_file = export_if_enabled()
+    if trace_file:
+        print(f"🧭 分段耗时追踪已保存到 {trace_file}")
+    profiler.report()
     
     print(f"\n✅ 分析完成！数据已准备就绪，可以生成HTML报告。\n")
     print(f"💡 提示: 运行 python3 generate_html_report.py 生成HTML报告\n")
@@ -516,5 +965,37 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    from delay_simulation import DEFAULT_TRIALS
+    from profiling import add_profile_arguments, profiler_from_args
+    from route_strategies import POLICIES, parse_strategies
+    from routing import backend_names
+    from stop_finder import MAX_DRIVE_HOURS
+    
+    parser = argparse.ArgumentParser(description="西藏行程分析工具")
+    parser.add_argument("--no-input", action="store_true", help="不等待用户输入（用于定时任务）")
+    parser.add_argument("--trials", type=int, default=DEFAULT_TRIALS, help="延误模拟的试验次数")
+    parser.add_argument("--router", choices=backend_names(), default=ROUTING_BACKEND,
+                        help="路线规划后端：amap（高德地图API）、local（本地路网）或 offline（离线估算模型）")
+    parser.add_argument("--prefilter", action="store_true", default=None,
+                        help="先离线估算，只对估算结果可能影响可行性判断的天调用API")
+    parser.add_argument("--plan", action="store_true", help="只输出API调用计划和配额估算，不访问网络")
+    parser.add_argument("--budget", type=int, help="API调用次数预算，超出预算的天暂用离线估算")
+    parser.add_argument("--strategies", type=parse_strategies, help="逗号分隔的高德路线策略，例如 0,2,3（多个策略时同时请求）")
+    parser.add_argument("--policy", choices=list(POLICIES), help="多个路线策略时每天选择路线的规则")
+    parser.add_argument("--flight-time", help="返程航班起飞时间 HH:MM，用于模拟最后一天的误机概率")
+    parser.add_argument("--max-drive-hours", type=float, default=MAX_DRIVE_HOURS,
+                        help="单日行车时间上限，超过时自动生成拆分方案，并按此判断长途驾驶日")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.strategies or args.policy:
+        use_strategies(args.strategies or ROUTE_STRATEGIES, args.policy)
+    if args.plan:
+        from call_planner import plan_calls, print_plan
+        prefilter = PREFILTER if args.prefilter is None else args.prefilter
+        print_plan(plan_calls([("行程", with_flight_time(ITINERARY, args.flight_time))], args.budget, args.router,
+                              prefilter, ROUTE_STRATEGIES))
+        sys.exit(0)
+    main(profiler_from_args(args, "travel_analyzer"), interactive=False if args.no_input else None,
+         trials=args.trials, router=args.router, prefilter=args.prefilter, budget=args.budget,
+         flight_time=args.flight_time, max_drive_hours=args.max_drive_hours)
 
@@ -7,65 +7,64 @@
 2. 运行此脚本：python update_xhs_images.py
 """
 
+import argparse
 import json
-import re
 import os
+import sys
 from urllib.parse import quote
 
+from html_patcher import patch_html_file
+from image_validator import filter_valid_images
+from profiling import Profiler, add_profile_arguments, profiler_from_args
+
 def update_html_with_images(html_file, images_config):
     """
     使用配置文件中的图片URL更新HTML
     """
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
     # 图片代理服务（避免防盗链）
     # 使用多个代理服务作为备选
     proxy_base = "https://images.weserv.nl/?url="
     
-    updated_count = 0
+    # 占位图依赖 Pillow，用到时才导入
+    from image_placeholders import build_image_metas, placeholder_attrs
+
+    # 预先并发获取所有图片的原始尺寸和模糊占位图
+    metas = build_image_metas([
+        proxy_base + quote(img, safe='')
+        for images in images_config.values()
+        for img in [img for img in images if img and 'placeholder' not in img][:5]
+    ])
+    
+    galleries = {}
     
     for attraction, images in images_config.items():
         if not images or all('placeholder' in img for img in images):
             print(f"跳过 {attraction}（未配置图片URL）")
             continue
         
-        # 查找对应的图片区域
-        # 匹配景点标题后的image-slider区域
-        pattern = rf'(<h4>.*?{re.escape(attraction)}.*?</h4>.*?<div class="gallery-label">.*?</div>.*?<div class="image-gallery">.*?<div class="image-slider">)(.*?)(</div>.*?<div class="image-note">)'
+        # 构建新的图片HTML
+        new_images_html = []
+        valid_images = [img for img in images if img and 'placeholder' not in img]
         
-        def replace_slider(match):
-            nonlocal updated_count
-            header = match.group(1)
-            old_slider_content = match.group(2)
-            footer = match.group(3)
-            
-            # 构建新的图片HTML
-            new_images_html = []
-            valid_images = [img for img in images if img and 'placeholder' not in img]
-            
-            if not valid_images:
-                return match.group(0)  # 如果没有有效图片，保持原样
+        if not valid_images:
+            continue  # 如果没有有效图片，保持原样
+        
+        for i, img_url in enumerate(valid_images[:5], 1):
+            # 使用代理服务避免防盗链
+            proxy_url = proxy_base + quote(img_url, safe='')
+            xhs_keyword = quote(f"{attraction} 冬季", safe='')
             
-            for i, img_url in enumerate(valid_images[:5], 1):
-                # 使用代理服务避免防盗链
-                proxy_url = proxy_base + quote(img_url, safe='')
-                xhs_keyword = quote(f"{attraction} 冬季", safe='')
-                
-                new_images_html.append(f'''                                    <div class="image-item" data-label="冬季实景" onclick="window.open('https://www.xiaohongshu.com/search_result?keyword={xhs_keyword}', '_blank')">
-                                        <img src="{proxy_url}" alt="{attraction}冬季{i}" loading="lazy" onerror="this.onerror=null; this.src='https://via.placeholder.com/800x600/667eea/ffffff?text=图片加载失败，点击查看小红书'; this.style.cursor='pointer';" style="cursor: pointer;">
+            new_images_html.append(f'''                                    <div class="image-item" data-label="冬季实景" onclick="window.open('https://www.xiaohongshu.com/search_result?keyword={xhs_keyword}', '_blank')">
+                                        <img src="{proxy_url}" alt="{attraction}冬季{i}" loading="lazy"{placeholder_attrs(metas.get(proxy_url), 'cursor: pointer;')} onerror="this.onerror=null; this.src='https://via.placeholder.com/800x600/667eea/ffffff?text=图片加载失败，点击查看小红书'; this.style.cursor='pointer';">
                                     </div>''')
-            
-            updated_count += 1
-            return header + '\n'.join(new_images_html) + footer
         
-        content = re.sub(pattern, replace_slider, content, flags=re.DOTALL)
+        galleries[attraction] = '\n'.join(new_images_html)
     
-    # 保存文件
-    if updated_count > 0:
-        with open(html_file, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"\n✅ 成功更新 {updated_count} 个景点的图片！")
+    # 一次扫描页面，替换所有景点的图片区域并保存文件
+    updated = patch_html_file(html_file, galleries) if galleries else []
+    
+    if updated:
+        print(f"\n✅ 成功更新 {len(updated)} 个景点的图片！")
         return True
     else:
         print("\n⚠️  未找到有效的图片URL，请先编辑配置文件")
@@ -115,7 +114,15 @@ def get_image_urls_guide():
     print(guide)
 
 
-if __name__ == "__main__":
+def main(profiler=None):
+    """
+    主函数
+    
+    Args:
+        profiler: profiling.Profiler，启用时按阶段剖析（可选）
+    """
+    profiler = profiler or Profiler("update_xhs_images")
+    
     print("=" * 60)
     print("小红书图片更新工具")
     print("=" * 60)
@@ -141,11 +148,11 @@ if __name__ == "__main__":
             json.dump(default_config, f, ensure_ascii=False, indent=2)
         print(f"✅ 已创建配置文件 {config_file}")
         get_image_urls_guide()
-        exit(0)
+        return 0
     
     if not os.path.exists(html_file):
         print(f"\n❌ HTML文件 {html_file} 不存在")
-        exit(1)
+        return 1
     
     # 读取配置
     print(f"\n📖 读取配置文件 {config_file}...")
@@ -165,13 +172,33 @@ if __name__ == "__main__":
     if not has_images:
         print("\n⚠️  配置文件中没有有效的图片URL")
         get_image_urls_guide()
-        exit(0)
+        return 0
+    
+    # 检查图片URL是否可用，剔除失效图片
+    print(f"\n🔍 正在检查图片URL...")
+    with profiler.phase("validate"):
+        filtered = filter_valid_images(images_config)
+    # 配置了图片但全部检查失败的景点单独提示，保持页面上原有的图片
+    for attraction, images in images_config.items():
+        if not filtered.get(attraction) and any(img and 'placeholder' not in img.lower() for img in images):
+            print(f"  ❌ {attraction}: 所有图片均无效，保持原有图片")
+            filtered.pop(attraction, None)
+    images_config = filtered
     
     # 更新HTML
     print(f"\n🔄 正在更新 {html_file}...")
-    success = update_html_with_images(html_file, images_config)
+    with profiler.phase("update"):
+        success = update_html_with_images(html_file, images_config)
     
     if success:
         print("\n✨ 完成！请在浏览器中打开HTML文件查看效果")
     else:
         print("\n💡 提示：请按照上面的指南获取图片URL并更新配置文件")
+    profiler.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="小红书图片更新工具")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    sys.exit(main(profiler_from_args(args, "update_xhs_images")))
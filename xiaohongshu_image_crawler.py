@@ -5,12 +5,17 @@
 用于爬取小红书笔记中的图片并更新HTML文件
 """
 
+import argparse
 import requests
 import json
-import re
-import time
 from urllib.parse import quote
 import os
+import sys
+
+from api_metrics import METRICS, instrumented_get, timed_sleep
+from html_patcher import patch_html_file
+from image_validator import filter_valid_images
+from profiling import Profiler, add_profile_arguments, profiler_from_args
 
 class XiaohongshuImageCrawler:
     def __init__(self):
@@ -39,7 +44,7 @@ class XiaohongshuImageCrawler:
                 'note_type': 0,
             }
             
-            response = self.session.get(search_url, params=params, timeout=10)
+            response = instrumented_get("xhs_search", self.session.get, search_url, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -61,7 +66,7 @@ class XiaohongshuImageCrawler:
                 'image_formats': 'jpg,webp,avif',
             }
             
-            response = self.session.get(note_url, params=params, timeout=10)
+            response = instrumented_get("xhs_feed", self.session.get, note_url, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -97,7 +102,7 @@ class XiaohongshuImageCrawler:
                 print(f"  获取笔记 {note_id} 的图片...")
                 images = self.get_note_images(note_id)
                 all_images.extend(images)
-                time.sleep(1)  # 避免请求过快
+                timed_sleep(1, "xhs_throttle")  # 避免请求过快
         
         return all_images[:max_images]
     
@@ -164,66 +169,64 @@ class XiaohongshuImageCrawler:
             for keyword in keywords[:2]:  # 每个景点使用前2个关键词
                 img_list = self.crawl_images_by_keyword(keyword, max_images=2)
                 images.extend(img_list)
-                time.sleep(2)  # 避免请求过快
+                timed_sleep(2, "xhs_throttle")  # 避免请求过快
             
-            # 去重并限制数量
-            images = list(dict.fromkeys(images))[:5]
             results[attraction] = images
             print(f"  获取到 {len(images)} 张图片")
         
-        return results
+        # 去重和占位图依赖 Pillow，用到时才导入，没有安装 Pillow 时手动配置流程仍可使用
+        from image_dedup import dedupe_images
+
+        # 跨景点、跨关键词去重（同一照片的不同域名和尺寸只保留一张），并限制数量
+        return dedupe_images(results, max_images=5)
 
 
 def update_html_with_images(html_file, images_dict):
     """
     更新HTML文件中的图片URL
     """
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # 映射景点名称到HTML中的标识
-    attraction_map = {
-        "克拉美丽沙漠公园": "克拉美丽沙漠公园",
-        "海上魔鬼城": "海上魔鬼城",
-        "将军山滑雪场": "将军山滑雪场",
-        "禾木村": "禾木村",
-        "禾木吉克普林滑雪场": "禾木吉克普林滑雪场",
-        "喀纳斯景区": "喀纳斯景区",
-        "白哈巴": "白哈巴"
-    }
+    from image_placeholders import build_image_metas, placeholder_attrs
+
+    # 预先并发获取所有图片的原始尺寸和模糊占位图
+    metas = build_image_metas([
+        f"https://images.weserv.nl/?url={quote(img_url, safe='')}"
+        for images in images_dict.values()
+        for img_url in images[:5]
+    ])
     
+    galleries = {}
     for attraction, images in images_dict.items():
         if not images:
             continue
         
-        # 查找对应的图片区域
-        pattern = rf'<h4>.*?{re.escape(attraction)}.*?</h4>.*?<div class="image-slider">(.*?)</div>'
-        match = re.search(pattern, content, re.DOTALL)
+        # 构建新的图片HTML
+        new_images = []
+        for i, img_url in enumerate(images[:5], 1):
+            # 使用图片代理服务避免防盗链
+            proxy_url = f"https://images.weserv.nl/?url={quote(img_url, safe='')}"
+            new_images.append(f'''                                    <div class="image-item" data-label="冬季实景" onclick="window.open('https://www.xiaohongshu.com/search_result?keyword={quote(attraction + " 冬季", safe="")}', '_blank')">
+                                        <img src="{proxy_url}" alt="{attraction}冬季{i}" loading="lazy"{placeholder_attrs(metas.get(proxy_url))} onerror="this.src='https://via.placeholder.com/800x600/667eea/ffffff?text=图片加载失败'">
+                                    </div>''')
         
-        if match:
-            # 构建新的图片HTML
-            new_images_html = ""
-            for i, img_url in enumerate(images[:5], 1):
-                # 使用图片代理服务避免防盗链
-                proxy_url = f"https://images.weserv.nl/?url={quote(img_url, safe='')}"
-                new_images_html += f'''
-                                    <div class="image-item" data-label="冬季实景" onclick="window.open('https://www.xiaohongshu.com/search_result?keyword={quote(attraction + " 冬季", safe="")}', '_blank')">
-                                        <img src="{proxy_url}" alt="{attraction}冬季{i}" loading="lazy" onerror="this.src='https://via.placeholder.com/800x600/667eea/ffffff?text=图片加载失败'">
-                                    </div>
-                '''
-            
-            # 替换图片区域
-            old_slider = match.group(1)
-            content = content.replace(old_slider, new_images_html.strip())
-            print(f"已更新 {attraction} 的图片")
+        galleries[attraction] = '\n'.join(new_images)
+    
+    # 一次扫描页面，只替换各景点自己的图片区域并保存文件
+    updated = patch_html_file(html_file, galleries)
+    for attraction in updated:
+        print(f"已更新 {attraction} 的图片")
     
-    # 保存文件
-    with open(html_file, 'w', encoding='utf-8') as f:
-        f.write(content)
     print("\nHTML文件已更新！")
 
 
-if __name__ == "__main__":
+def main(profiler=None):
+    """
+    主函数
+    
+    Args:
+        profiler: profiling.Profiler，启用时按阶段剖析（可选）
+    """
+    profiler = profiler or Profiler("xiaohongshu_image_crawler")
+    
     print("=" * 50)
     print("小红书图片爬取工具")
     print("=" * 50)
@@ -232,7 +235,8 @@ if __name__ == "__main__":
     
     # 获取图片
     print("\n开始爬取图片...")
-    images_dict = crawler.get_images_for_attractions()
+    with profiler.phase("crawl"):
+        images_dict = crawler.get_images_for_attractions()
     
     # 保存结果
     output_file = "xiaohongshu_images.json"
@@ -244,6 +248,21 @@ if __name__ == "__main__":
     html_file = "新疆冬季行程规划.html"
     if os.path.exists(html_file):
         print(f"\n正在更新 {html_file}...")
-        update_html_with_images(html_file, images_dict)
+        with profiler.phase("validate"):
+            images_dict = filter_valid_images(images_dict)
+        with profiler.phase("update"):
+            update_html_with_images(html_file, images_dict)
     else:
         print(f"\n警告: 未找到 {html_file}，请确保文件存在")
+    
+    # 请求统计
+    METRICS.print_summary()
+    METRICS.write_reports()
+    profiler.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="小红书图片爬取工具")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    sys.exit(main(profiler_from_args(args, "xiaohongshu_image_crawler")))